@@ -25,6 +25,73 @@ declare global {
   }
 }
 
+// Replace this with your actual API endpoint
+const API_BASE = 'https://intro-voice-bot.onrender.com';
+
+// One conversation per page load, so the server can keep follow-up context
+const SESSION_ID = crypto.randomUUID();
+// const API_BASE = 'http://127.0.0.1:5000';
+
+// Convert base64 audio data to blob, letting the browser decode it natively
+const base64ToBlob = async (base64: string, type = 'audio/mpeg'): Promise<Blob> => {
+  const response = await fetch(`data:${type};base64,${base64}`);
+  return response.blob();
+};
+
+// Opus is about half the size of the voice MP3; ask for it where the browser plays it
+const BINARY_ACCEPT = typeof Audio !== 'undefined' && new Audio().canPlayType('audio/ogg; codecs=opus')
+  ? 'audio/ogg; codecs=opus, audio/mpeg;q=0.9'
+  : 'audio/mpeg';
+
+// Non-streaming fallback: raw audio body (Opus or MP3), reply text in a header
+const fetchBinaryReply = async (message: string): Promise<{ text: string; audioBlob: Blob }> => {
+  const response = await fetch(`${API_BASE}/api/chat`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': BINARY_ACCEPT,
+    },
+    body: JSON.stringify({ message, session_id: SESSION_ID }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to get response');
+  }
+  const text = decodeURIComponent(response.headers.get('X-Reply-Text') ?? '');
+  const audioBlob = await response.blob();
+  return { text, audioBlob };
+};
+
+interface StreamEvent {
+  event: string;
+  data: {
+    delta?: string;
+    text?: string;
+    audio_base64?: string;
+    audio_type?: string;
+    error?: string;
+  };
+}
+
+// Parse one Server-Sent Events block ("event: x\ndata: {...}")
+const parseSseEvent = (block: string): StreamEvent | null => {
+  let event = 'message';
+  const dataLines: string[] = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+  if (dataLines.length === 0) return null;
+  try {
+    return { event, data: JSON.parse(dataLines.join('\n')) };
+  } catch (error) {
+    console.error('Error parsing stream event:', error);
+    return null;
+  }
+};
+
 function App() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [inputText, setInputText] = useState('');
@@ -36,6 +103,8 @@ function App() {
   
   const recognitionRef = useRef<SpeechRecognition | null>(null);
   const audioRef = useRef<HTMLAudioElement | null>(null);
+  const audioQueueRef = useRef<Blob[]>([]);
+  const isQueuePlayingRef = useRef(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
@@ -95,67 +164,129 @@ function App() {
     setInputText('');
     setIsLoading(true);
 
+    const botMessageId = (Date.now() + 1).toString();
+    const audioSegments: Blob[] = [];
+    let replyText = '';
+
     try {
-      // Replace this with your actual API endpoint
-      const response = await fetch('https://intro-voice-bot.onrender.com/api/chat', {
-      // const response = await fetch('http://127.0.0.1:5000/api/chat', {
+      const response = await fetch(`${API_BASE}/api/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ message: inputText }),
+        body: JSON.stringify({ message: inputText, session_id: SESSION_ID }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        
-        // Handle audio blob from your API response format
-        let audioBlob = null;
-        if (data.audio_base64) {
-          try {
-            // Convert base64 audio data to blob
-            const audioData = atob(data.audio_base64);
-            const audioArray = new Uint8Array(audioData.length);
-            for (let i = 0; i < audioData.length; i++) {
-              audioArray[i] = audioData.charCodeAt(i);
-            }
-            audioBlob = new Blob([audioArray], { type: 'audio/mpeg' });
-          } catch (error) {
-            console.error('Error converting base64 audio:', error);
-          }
-        }
-
-        const botMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          text: data.text || "I received your message and I'm processing it.",
+      if (!response.ok || !response.body) {
+        const reply = await fetchBinaryReply(inputText);
+        setMessages(prev => [...prev, {
+          id: botMessageId,
+          text: reply.text || "I received your message and I'm processing it.",
           sender: 'bot',
           timestamp: new Date(),
-          audioBlob: audioBlob
-        };
+          audioBlob: reply.audioBlob
+        }]);
+        playAudio(reply.audioBlob, botMessageId);
+        return;
+      }
 
-        setMessages(prev => [...prev, botMessage]);
+      setMessages(prev => [...prev, {
+        id: botMessageId,
+        text: '',
+        sender: 'bot',
+        timestamp: new Date()
+      }]);
+
+      const updateBotMessage = (changes: Partial<Message>) => {
+        setMessages(prev => prev.map(message =>
+          message.id === botMessageId ? { ...message, ...changes } : message
+        ));
+      };
 
-        // Auto-play audio if available
-        if (audioBlob) {
-          playAudio(audioBlob, botMessage.id);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      // Events are separated by a blank line; keep any partial event in the buffer
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let separator = buffer.indexOf('\n\n');
+        while (separator !== -1) {
+          const parsed = parseSseEvent(buffer.slice(0, separator));
+          buffer = buffer.slice(separator + 2);
+          separator = buffer.indexOf('\n\n');
+          if (!parsed) continue;
+
+          if (parsed.event === 'text') {
+            replyText += parsed.data.delta ?? '';
+            updateBotMessage({ text: replyText });
+          } else if (parsed.event === 'audio' && parsed.data.audio_base64) {
+            try {
+              // Streams stay MP3 (the server default) so the segments join into one replay blob
+              const segment = await base64ToBlob(parsed.data.audio_base64, parsed.data.audio_type);
+              audioSegments.push(segment);
+              enqueueAudio(segment, botMessageId);
+            } catch (error) {
+              console.error('Error converting base64 audio:', error);
+            }
+          } else if (parsed.event === 'done') {
+            replyText = parsed.data.text || replyText;
+          } else if (parsed.event === 'error') {
+            throw new Error(parsed.data.error || 'Failed to get response');
+          }
         }
-      } else {
-        throw new Error('Failed to get response');
       }
+
+      // Keep the whole reply for replay once every segment has arrived
+      updateBotMessage({
+        text: replyText || "I received your message and I'm processing it.",
+        audioBlob: audioSegments.length > 0
+          ? new Blob(audioSegments, { type: 'audio/mpeg' })
+          : undefined
+      });
     } catch (error) {
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: botMessageId,
         text: "I'm having trouble connecting right now. Please try again.",
         sender: 'bot',
         timestamp: new Date()
       };
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => [...prev.filter(message => message.id !== botMessageId), errorMessage]);
     } finally {
       setIsLoading(false);
     }
   };
 
-  const playAudio = (audioBlob: Blob, messageId: string) => {
+  const playNextQueued = (messageId: string) => {
+    const next = audioQueueRef.current.shift();
+    if (!next) {
+      isQueuePlayingRef.current = false;
+      setIsPlayingAudio(false);
+      setAudioProgress(0);
+      setCurrentPlayingId(null);
+      return;
+    }
+    isQueuePlayingRef.current = true;
+    playAudio(next, messageId, () => playNextQueued(messageId));
+  };
+
+  // Streamed segments play back to back in arrival order
+  const enqueueAudio = (audioBlob: Blob, messageId: string) => {
+    audioQueueRef.current.push(audioBlob);
+    if (!isQueuePlayingRef.current) {
+      playNextQueued(messageId);
+    }
+  };
+
+  const clearAudioQueue = () => {
+    audioQueueRef.current = [];
+    isQueuePlayingRef.current = false;
+  };
+
+  const playAudio = (audioBlob: Blob, messageId: string, onEnded?: () => void) => {
     if (audioRef.current) {
       audioRef.current.pause();
     }
@@ -168,10 +299,14 @@ function App() {
     setAudioProgress(0);
 
     audioRef.current.onended = () => {
+      URL.revokeObjectURL(audioUrl);
+      if (onEnded) {
+        onEnded();
+        return;
+      }
       setIsPlayingAudio(false);
       setAudioProgress(0);
       setCurrentPlayingId(null);
-      URL.revokeObjectURL(audioUrl);
     };
 
     audioRef.current.ontimeupdate = () => {
@@ -183,12 +318,14 @@ function App() {
 
     audioRef.current.play().catch(error => {
       console.error('Error playing audio:', error);
+      clearAudioQueue();
       setIsPlayingAudio(false);
       setCurrentPlayingId(null);
     });
   };
 
   const stopAudio = () => {
+    clearAudioQueue();
     if (audioRef.current) {
       audioRef.current.pause();
       setIsPlayingAudio(false);
@@ -342,7 +479,10 @@ function App() {
                       </p>
                       {message.audioBlob && (
                         <button
-                          onClick={() => playAudio(message.audioBlob!, message.id)}
+                          onClick={() => {
+                            clearAudioQueue();
+                            playAudio(message.audioBlob!, message.id);
+                          }}
                           className={`mt-2 flex items-center space-x-2 text-xs rounded-full px-3 py-1 transition-colors ${
                             currentPlayingId === message.id
                               ? 'bg-gray-200 text-gray-800'
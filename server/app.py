@@ -1,51 +1,180 @@
-import base64
-from flask import Flask,request, send_file,jsonify,after_this_request
+import io
+import json
+import logging
+from urllib.parse import quote
+from flask import Flask,request,jsonify,after_this_request,Response,stream_with_context,g
 from flask_cors import CORS
-from openai_client import get_response
-from elevenlabs_tts import elevenlabs_tts
-from gtts_tts import google_tts
+from openai_client import get_response, remember
+from tts_router import synthesize
+from streaming import stream_chat
+from batch import run_batch, validate
+from audio_buffer import AudioJSON
+from audio_profiles import negotiate, render, wants_binary
+from sessions import get_session
+import metrics
+import startup
+import warmup
 import os
-import traceback
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app, origins=["https://intro-voice-bot.vercel.app","http://localhost:5173"], supports_credentials=True)
+CORS(app, origins=["https://intro-voice-bot.vercel.app","http://localhost:5173"], supports_credentials=True,
+     expose_headers=["X-Reply-Text", "Server-Timing"])
+
+# Anchor answers: load prebuilt audio, synthesize the rest in the background
+warmup.start()
+# Provider libraries, clients and local voice models load before the first request needs them
+startup.start()
+
+
+@app.before_request
+def _start_timing():
+    g.timing = metrics.start_request()
+
+
+@app.after_request
+def _finish_timing(response):
+    timing = g.get('timing')
+    if timing is not None and request.url_rule is not None:
+        response.headers["Server-Timing"] = timing.server_timing()
+        metrics.finish_request(timing, request.url_rule.rule, response.status_code)
+    startup.served()
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms, byte counters and cache/pool statistics for Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _json_object() -> dict:
+    """The request's JSON body if it is an object, else an empty one (the handlers then reject it)"""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
 
-import traceback  # add at the top if not already
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        data = request.json
-        print("Received JSON:", data)  # Debug: log the input
+        with metrics.span("parse"):
+            data = _json_object()
 
         user_input = data.get('message', '')
         if not user_input:
             return jsonify({'error': 'No message provided'}), 400
+        # Output format: an explicit audio_format, else the audio types in Accept
+        try:
+            profile = negotiate(request.headers.get('Accept', ''),
+                                data.get('audio_format') or request.args.get('audio_format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Optional: callers that send a session_id get follow-up context
+        session = get_session(data.get('session_id'))
 
-        print("User input:", user_input)  # Debug
-
-        bot_reply = get_response(user_input)
-        print("Bot reply:", bot_reply)  # Debug
+        # Anchor questions are answered from precomputed text and audio
+        warm = warmup.lookup(user_input)
+        if warm:
+            bot_reply = warm.text
+            remember(session, user_input, bot_reply)
+        else:
+            bot_reply = get_response(user_input, session)
 
-        # audio_stream = elevenlabs_tts(bot_reply)
-        audio_stream = google_tts(text = bot_reply)
-        print("TTS audio stream generated")  # Debug
+        if warm and warm.audio is not None:
+            audio_stream = io.BytesIO(warm.audio)
+        else:
+            audio_stream = synthesize(bot_reply)
+        audio, mimetype, extension = render(audio_stream.getvalue(), profile)
 
-        # Convert audio stream to base64
-        audio_base64 = base64.b64encode(audio_stream.getvalue()).decode("utf-8")
-        print("Audio base64 encoded")  # Debug
+        # Binary mode: send the audio as-is, reply text goes in a header
+        if _wants_binary_audio():
+            # The audio bytes are the body; Response sends them without copying
+            response = Response(audio, mimetype=mimetype, headers={
+                "X-Reply-Text": quote(bot_reply),
+                "Content-Disposition": f"inline; filename=reply.{extension}",
+                "Vary": "Accept",
+            })
+            metrics.record_bytes("response", len(audio))
+            return response
 
-        return jsonify({
-            "text": bot_reply,
-            "audio_base64": audio_base64
-        })
+        # The audio is base64-encoded into the JSON body as it is sent, after
+        # Server-Timing is set, so that work is not in the header
+        body = AudioJSON({"text": bot_reply, "audio_type": mimetype}, audio)
+        metrics.record_bytes("response", len(body))
+        return Response(body, mimetype="application/json", headers={"Content-Length": str(len(body))})
 
     except Exception as e:
-        print("Exception occurred in /api/chat:")
-        traceback.print_exc()  # <- This prints full stack trace in Render logs
+        logger.exception("Exception occurred in /api/chat")
         return jsonify({'error': str(e)}), 500
 
-    
+
+def _wants_binary_audio():
+    """True when the client asked for raw audio instead of base64-in-JSON"""
+    if request.args.get('format') == 'binary':
+        return True
+    return wants_binary(request.headers.get('Accept', ''))
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Server-Sent Events version of /api/chat: text deltas, then audio segments as they are ready"""
+    data = _json_object()
+    user_input = data.get('message', '')
+    if not user_input:
+        return jsonify({'error': 'No message provided'}), 400
+    try:
+        profile = negotiate(request.headers.get('Accept', ''),
+                            data.get('audio_format') or request.args.get('audio_format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    session = get_session(data.get('session_id'))
+
+    def events():
+        try:
+            for event in stream_chat(user_input, session=session, profile=profile):
+                name = event.pop("event")
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.exception("Exception occurred in /api/chat/stream")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of questions; results stream back as NDJSON lines as each one is ready"""
+    data = _json_object()
+    try:
+        questions = validate(data.get('questions'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    audio = data.get('audio', True) is not False
+    try:
+        profile = negotiate(request.headers.get('Accept', ''),
+                            data.get('audio_format') or request.args.get('audio_format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def lines():
+        try:
+            for item in run_batch(questions, audio=audio, profile=profile):
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            logger.exception("Exception occurred in /api/chat/batch")
+            yield json.dumps({'error': str(e)}) + "\n"
+
+    return Response(
+        stream_with_context(lines()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
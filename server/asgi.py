@@ -0,0 +1,220 @@
+"""
+ASGI entry point for the voice bot.
+
+Serves the same /api/chat and /api/chat/stream contract as the Flask app
+in app.py, but the LLM and TTS calls are awaited instead of blocking a
+worker, so one process can hold hundreds of conversations open while they
+wait on upstreams. Run with:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import io
+import asyncio
+import json
+import logging
+import traceback
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from tts_router import synthesize_async
+from http_clients import close_async_client
+from openai_client import close_async_client as close_openai_client, get_response_async, remember
+from sessions import get_session
+from streaming import stream_chat_async
+from batch import run_batch_async, validate
+from audio_buffer import AudioJSON
+from audio_profiles import negotiate, render, wants_binary
+import metrics
+import startup
+import warmup
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(route: str):
+    """Collect stage spans for an endpoint and return them in a Server-Timing header"""
+    def decorator(endpoint):
+        async def wrapper(request: Request):
+            timing = metrics.start_request()
+            response = await endpoint(request)
+            response.headers["Server-Timing"] = timing.server_timing()
+            metrics.finish_request(timing, route, response.status_code)
+            startup.served()
+            return response
+        return wrapper
+    return decorator
+
+
+async def _json_object(request: Request) -> dict:
+    """The request's JSON body if it is an object, else an empty one (the handlers then reject it)"""
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def prometheus_metrics(request: Request):
+    """Stage latency histograms, byte counters and cache/pool statistics for Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+@_timed('/api/chat')
+async def chat(request: Request):
+    try:
+        with metrics.span("parse"):
+            data = await _json_object(request)
+
+        user_input = data.get('message', '')
+        if not user_input:
+            return JSONResponse({'error': 'No message provided'}, status_code=400)
+        # Output format: an explicit audio_format, else the audio types in Accept
+        try:
+            profile = negotiate(request.headers.get('accept', ''),
+                                data.get('audio_format') or request.query_params.get('audio_format'))
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        # Optional: callers that send a session_id get follow-up context
+        session = get_session(data.get('session_id'))
+
+        # Anchor questions are answered from precomputed text and audio
+        warm = warmup.lookup(user_input)
+        if warm:
+            bot_reply = warm.text
+            remember(session, user_input, bot_reply)
+        else:
+            bot_reply = await get_response_async(user_input, session)
+
+        if warm and warm.audio is not None:
+            audio_stream = io.BytesIO(warm.audio)
+        else:
+            audio_stream = await synthesize_async(bot_reply)
+        # Transcoding runs ffmpeg; keep it off the event loop
+        audio, mimetype, extension = await asyncio.to_thread(render, audio_stream.getvalue(), profile)
+
+        # Binary mode: send the audio as-is, reply text goes in a header
+        if _wants_binary_audio(request):
+            metrics.record_bytes("response", len(audio))
+            return Response(
+                audio,
+                media_type=mimetype,
+                headers={
+                    "X-Reply-Text": quote(bot_reply),
+                    "Content-Disposition": f'inline; filename="reply.{extension}"',
+                    "Vary": "Accept",
+                },
+            )
+
+        # The audio is base64-encoded into the JSON body as it is sent, after
+        # Server-Timing is set, so that work is not in the header
+        body = AudioJSON({"text": bot_reply, "audio_type": mimetype}, audio)
+        metrics.record_bytes("response", len(body))
+        return StreamingResponse(body, media_type="application/json", headers={"Content-Length": str(len(body))})
+
+    except Exception as e:
+        logger.error(f"Exception occurred in /api/chat:\n{traceback.format_exc()}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+def _wants_binary_audio(request: Request) -> bool:
+    """True when the client asked for raw audio instead of base64-in-JSON"""
+    if request.query_params.get('format') == 'binary':
+        return True
+    return wants_binary(request.headers.get('accept', ''))
+
+
+@_timed('/api/chat/stream')
+async def chat_stream(request: Request):
+    """Server-Sent Events version of /api/chat: text deltas, then audio segments as they are ready"""
+    data = await _json_object(request)
+    user_input = data.get('message', '')
+    if not user_input:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+    try:
+        profile = negotiate(request.headers.get('accept', ''),
+                            data.get('audio_format') or request.query_params.get('audio_format'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    session = get_session(data.get('session_id'))
+
+    async def events():
+        try:
+            async for event in stream_chat_async(user_input, session=session, profile=profile):
+                name = event.pop("event")
+                yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.error(f"Exception occurred in /api/chat/stream:\n{traceback.format_exc()}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@_timed('/api/chat/batch')
+async def chat_batch(request: Request):
+    """Answer a list of questions; results stream back as NDJSON lines as each one is ready"""
+    data = await _json_object(request)
+    try:
+        questions = validate(data.get('questions'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    audio = data.get('audio', True) is not False
+    try:
+        profile = negotiate(request.headers.get('accept', ''),
+                            data.get('audio_format') or request.query_params.get('audio_format'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    async def lines():
+        try:
+            async for item in run_batch_async(questions, audio=audio, profile=profile):
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            logger.error(f"Exception occurred in /api/chat/batch:\n{traceback.format_exc()}")
+            yield json.dumps({'error': str(e)}) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warmup.start()
+    startup.start(asgi=True)
+    yield
+    await close_async_client()
+    await close_openai_client()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/chat/batch', chat_batch, methods=['POST']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["https://intro-voice-bot.vercel.app", "http://localhost:5173"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["X-Reply-Text", "Server-Timing"],
+        ),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,82 @@
+"""
+Audio assembled from many parts with one copy.
+
+A long reply's audio is put together from pieces: gTTS response parts
+make a chunk, chunks (and the silent frames between them) make a reply,
+and a JSON body wraps the reply in base64. Growing a bytearray re-copies
+it each time it outgrows its allocation, ``bytes(bytearray)`` copies it
+once more, and ``+=`` on bytes or pydub segments copies everything so far
+on every part.
+
+SegmentBuffer instead keeps each appended part as a memoryview of the
+caller's bytes and copies all of them once, into a bytes object of the
+exact final size, when the value is asked for. That bytes object is what
+the response writer sends: BytesIO wrappers, the TTS cache and the
+Flask/Starlette responses share it rather than copying it.
+
+JSON replies carry the audio as base64. AudioJSON encodes it a slice at a
+time while the body is written, so the base64 text is never held whole.
+"""
+import math
+import base64
+import json
+from typing import Iterator, List
+
+
+class SegmentBuffer:
+    """Parts of a byte string, held as zero-copy views until joined once"""
+
+    def __init__(self):
+        self._parts: List = []
+        self._length = 0
+
+    def append(self, data) -> None:
+        """Add a bytes-like part; it is referenced, not copied, so it must not change afterwards"""
+        view = memoryview(data)
+        if view.nbytes:
+            self._parts.append(view)
+            self._length += view.nbytes
+
+    def __len__(self) -> int:
+        return self._length
+
+    def getvalue(self) -> bytes:
+        """
+        The parts as one bytes object
+
+        The first call copies every part once; the parts are then released
+        and later calls return the same object.
+        """
+        if len(self._parts) == 1 and isinstance(self._parts[0], bytes):
+            return self._parts[0]
+        value = b"".join(self._parts)
+        self._parts = [value]
+        return value
+
+
+class AudioJSON:
+    """
+    A JSON object body with ``fields`` plus the audio as ``audio_base64``
+
+    Iterating yields the body in pieces, base64-encoding one slice of the
+    audio per piece, so a response can be sent with an exact Content-Length
+    (``len``) and without the whole base64 text, or the str and JSON
+    copies of it that json.dumps makes, ever existing.
+    """
+
+    # A multiple of 3, so no slice but the last gets base64 padding
+    SLICE = 3 * 64 * 1024
+
+    def __init__(self, fields: dict, audio: bytes):
+        head = json.dumps(fields)[:-1] + (', ' if fields else '') + '"audio_base64": "'
+        self._head = head.encode("utf-8")
+        self._audio = memoryview(audio)
+
+    def __len__(self) -> int:
+        return len(self._head) + 4 * math.ceil(self._audio.nbytes / 3) + 2
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        for start in range(0, self._audio.nbytes, self.SLICE):
+            yield base64.b64encode(self._audio[start:start + self.SLICE])
+        yield b'"}'
@@ -0,0 +1,193 @@
+"""
+Output audio formats for replies, chosen from the client's Accept header.
+
+Every TTS engine produces MP3, at whatever bitrate the engine (or a pydub
+re-export) picked. Speech needs far less, so replies can be sent in one of
+these profiles:
+
+- ``mp3`` (audio/mpeg, the default): mono MP3 at AUDIO_MP3_BITRATE.
+  Audio already at or below that bitrate (gTTS, Google Cloud) is passed
+  through untouched.
+- ``opus`` (audio/ogg; codecs=opus): Opus in Ogg at AUDIO_OPUS_BITRATE,
+  tuned for voice. About half the size of the MP3 profile.
+- ``pcm`` (audio/L16): raw 16-bit mono samples at AUDIO_PCM_RATE, for
+  clients that feed streamed segments straight to an audio device.
+- ``original``: the engine's MP3 as produced.
+
+Transcoding runs once per distinct audio and profile through ffmpeg; the
+result is kept in the TTS cache next to the source audio, and concurrent
+requests for the same conversion share one ffmpeg run. Without ffmpeg,
+only ``mp3`` (passed through) and ``original`` are offered.
+"""
+import io
+import hashlib
+import logging
+import subprocess
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from config import AUDIO_DEFAULT_PROFILE, AUDIO_MP3_BITRATE, AUDIO_OPUS_BITRATE, AUDIO_PCM_RATE
+from metrics import record_bytes, span
+from mp3_frames import iter_frames
+from tts_cache import cached_audio
+import providers
+
+logger = logging.getLogger(__name__)
+
+
+class AudioProfile(NamedTuple):
+    """An output format: how it is served and the ffmpeg output options that produce it"""
+    name: str
+    mimetype: str
+    extension: str
+    # Media types in an Accept header that select this profile
+    accepts: Tuple[str, ...]
+    ffmpeg_args: Tuple[str, ...]
+
+
+PROFILES: Dict[str, AudioProfile] = {
+    profile.name: profile for profile in (
+        AudioProfile("opus", "audio/ogg; codecs=opus", "ogg", ("audio/ogg", "audio/opus", "audio/webm"), (
+            "-ac", "1", "-c:a", "libopus", "-b:a", f"{AUDIO_OPUS_BITRATE}k", "-application", "voip", "-f", "ogg",
+        )),
+        AudioProfile("mp3", "audio/mpeg", "mp3", ("audio/mpeg", "audio/mp3"), (
+            "-ac", "1", "-ar", "24000", "-c:a", "libmp3lame", "-b:a", f"{AUDIO_MP3_BITRATE}k", "-f", "mp3",
+        )),
+        AudioProfile("pcm", f"audio/L16; rate={AUDIO_PCM_RATE}; channels=1", "pcm", ("audio/l16", "audio/pcm"), (
+            "-ac", "1", "-ar", str(AUDIO_PCM_RATE), "-f", "s16le",
+        )),
+        AudioProfile("original", "audio/mpeg", "mp3", (), ()),
+    )
+}
+# Accept ties go to the smaller format
+_PREFERENCE = ("opus", "mp3", "pcm")
+
+
+def ffmpeg_available() -> bool:
+    return providers.which("ffmpeg") is not None
+
+
+def available(name: str) -> bool:
+    """Profiles other than mp3 and original need ffmpeg"""
+    return name in ("mp3", "original") or (name in PROFILES and ffmpeg_available())
+
+
+def accept_quality(accept: str, mimetype: str) -> float:
+    """Quality the Accept header gives a mimetype, taken from its most specific matching range"""
+    if not accept.strip():
+        return 1.0
+    mimetype = mimetype.split(";")[0].strip().lower()
+    major = mimetype.split('/')[0]
+    ranges = {mimetype: 2, f"{major}/*": 1, "*/*": 0}
+    best_rank, quality = -1, 0.0
+    for item in accept.split(','):
+        media, _, params = item.partition(';')
+        rank = ranges.get(media.strip().lower())
+        if rank is None or rank < best_rank:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best_rank, quality = rank, q
+    return quality
+
+
+def _named_quality(accept: str, profile: AudioProfile) -> float:
+    """Quality of the profile's media types when the Accept header names one of them"""
+    named = [item.split(';')[0].strip().lower() for item in accept.split(',')]
+    return max((accept_quality(accept, media) for media in profile.accepts if media in named), default=0.0)
+
+
+def negotiate(accept: str, requested: Optional[str] = None) -> AudioProfile:
+    """
+    Pick the output profile for a request
+
+    An explicit profile name (``audio_format`` in the body or query) wins.
+    Otherwise the audio types the Accept header names decide, the smaller
+    format winning ties; wildcards and no audio type get AUDIO_DEFAULT_PROFILE.
+
+    Raises:
+        ValueError: If the requested profile does not exist or cannot be produced here
+    """
+    if requested:
+        if requested not in PROFILES:
+            raise ValueError(f"Unknown audio format '{requested}' (choose from {', '.join(PROFILES)})")
+        if not available(requested):
+            raise ValueError(f"Audio format '{requested}' is not available on this server")
+        return PROFILES[requested]
+
+    best, best_quality = None, 0.0
+    for name in _PREFERENCE:
+        quality = _named_quality(accept or "", PROFILES[name])
+        if quality > best_quality and available(name):
+            best, best_quality = PROFILES[name], quality
+    return best or PROFILES[AUDIO_DEFAULT_PROFILE]
+
+
+def wants_binary(accept: str) -> bool:
+    """True when the Accept header prefers some audio type to JSON"""
+    audio = max(accept_quality(accept, media) for profile in PROFILES.values() for media in profile.accepts)
+    # Same outcome as Flask's best_match: JSON wins ties
+    return audio > accept_quality(accept, 'application/json')
+
+
+def _fits_mp3_profile(audio: bytes) -> bool:
+    """True if MP3 audio is mono and no higher in bitrate than the mp3 profile"""
+    try:
+        return all(header.channel_mode == 3 and header.bitrate <= AUDIO_MP3_BITRATE
+                   for _, header in iter_frames(audio))
+    except ValueError:
+        return False
+
+
+def _transcode(audio: bytes, profile: AudioProfile) -> bytes:
+    with span("transcode"):
+        result = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "mp3", "-i", "pipe:0", *profile.ffmpeg_args, "pipe:1"],
+            input=audio, capture_output=True, check=False,
+        )
+    if result.returncode != 0 or not result.stdout:
+        raise Exception(f"ffmpeg {profile.name} transcoding failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+
+def convert(audio: bytes, profile: AudioProfile) -> bytes:
+    """
+    MP3 reply audio in the given profile
+
+    Conversions are cached per (audio, profile). If transcoding fails, the
+    MP3 is returned as it is (``render`` labels it accordingly).
+
+    Returns:
+        bytes: Audio in the profile's format
+    """
+    if profile.name == "original" or (profile.name == "mp3" and (_fits_mp3_profile(audio) or not ffmpeg_available())):
+        return audio
+    digest = hashlib.blake2b(audio, digest_size=16).hexdigest()
+    try:
+        converted = cached_audio(
+            f"profile:{profile.name}", digest, lambda: io.BytesIO(_transcode(audio, profile)),
+            args=" ".join(profile.ffmpeg_args),
+        ).getvalue()
+    except Exception as e:
+        logger.warning(f"Serving MP3 instead of {profile.name}: {e}")
+        return audio
+    record_bytes(f"audio_{profile.name}", len(converted))
+    return converted
+
+
+def render(audio: bytes, profile: AudioProfile) -> Tuple[bytes, str, str]:
+    """
+    Audio ready to send in the profile, with its mimetype and file extension
+
+    When the conversion fails the MP3 is sent, labelled as such.
+    """
+    converted = convert(audio, profile)
+    if converted is audio and profile.name != "mp3":
+        original = PROFILES["original"]
+        return audio, original.mimetype, original.extension
+    return converted, profile.mimetype, profile.extension
@@ -0,0 +1,302 @@
+"""
+Answers for a whole list of questions at once.
+
+Interview-prep and QA regression sets are pre-generated by asking every
+question in a list. Calling /api/chat once per question pays the HTTP,
+LLM and TTS round trips one after another; a batch runs them side by side,
+at most BATCH_CONCURRENCY LLM or TTS calls at a time, so a batch takes
+about ceil(unique questions / concurrency) round trips whatever its size.
+Its upstream calls run at background priority (see upstream), so a batch
+fills the providers' spare rate without holding up live conversations.
+
+Work is deduplicated across the batch: questions that normalize the same
+way (see response_cache.normalize_question) share one LLM call, replies
+with the same text share one synthesis, and identical chunks of different
+replies are synthesized once (see gtts_tts._synthesize_chunks).
+
+Results are produced as each answer is ready, not in question order, as
+dicts that serialize to NDJSON lines:
+
+    {"index": 3, "question": "...", "text": "...", "audio_base64": "...", "audio_type": "audio/mpeg"}
+    {"index": 4, "question": "...", "error": "..."}
+    {"done": true, "questions": 40, "unique_questions": 31, "syntheses": 29, "errors": 0, "seconds": 4.2}
+
+Served as POST /api/chat/batch, or run from the command line:
+
+    python batch.py questions.txt --out answers.ndjson --audio-dir answers
+"""
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from audio_profiles import AudioProfile, PROFILES, negotiate, render
+from config import BATCH_CONCURRENCY, BATCH_MAX_QUESTIONS
+from gtts_tts import _clean_text
+from openai_client import get_response, get_response_async
+from response_cache import normalize_question
+from tts_router import synthesize, synthesize_async
+import upstream
+import warmup
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    """Bookkeeping shared by the sync and async runners: who waits for which result"""
+
+    def __init__(self, questions: List[str], audio: bool, profile: Optional[AudioProfile]):
+        self.questions = questions
+        self.audio = audio
+        self.profile = profile or negotiate("")
+        self.started = time.perf_counter()
+        # normalized question -> indexes asking it
+        self.askers: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            self.askers.setdefault(normalize_question(question), []).append(index)
+        # cleaned reply text -> (reply as the LLM wrote it, indexes answered with it)
+        self.listeners: Dict[str, Tuple[str, List[int]]] = {}
+        self.syntheses = 0
+        self.errors = 0
+
+    def unique_questions(self) -> List[Tuple[str, str]]:
+        """(key, question) for each distinct question, in first-asked order"""
+        return [(key, self.questions[indexes[0]]) for key, indexes in self.askers.items()]
+
+    def answered(self, key: str, reply: str, audio: Optional[tuple]) -> Tuple[List[dict], Optional[str]]:
+        """
+        Record a question's reply, and its rendered audio if it came with some
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: Items that are complete now, and
+            the text to synthesize if nobody has asked for it yet
+        """
+        indexes = self.askers[key]
+        if not self.audio or audio is not None:
+            return [self._item(index, reply, audio) for index in indexes], None
+        text = _clean_text(reply)
+        if not text.strip():
+            return self.failed(key, Exception("Empty reply from the LLM")), None
+        listener = self.listeners.get(text)
+        if listener is not None:
+            listener[1].extend(indexes)
+            return [], None
+        self.listeners[text] = (reply, list(indexes))
+        self.syntheses += 1
+        return [], text
+
+    def synthesized(self, text: str, audio: tuple) -> List[dict]:
+        reply, indexes = self.listeners.pop(text)
+        return [self._item(index, reply, audio) for index in indexes]
+
+    def failed(self, key: str, error: Exception) -> List[dict]:
+        """Error items for everyone who asked the question"""
+        return self._errors(self.askers[key], {}, error)
+
+    def synthesis_failed(self, text: str, error: Exception) -> List[dict]:
+        reply, indexes = self.listeners.pop(text)
+        return self._errors(indexes, {"text": reply}, error)
+
+    def _errors(self, indexes: List[int], fields: dict, error: Exception) -> List[dict]:
+        self.errors += len(indexes)
+        return [{"index": index, "question": self.questions[index], **fields, "error": str(error)}
+                for index in indexes]
+
+    def _item(self, index: int, reply: str, audio: Optional[tuple]) -> dict:
+        """An answer item; audio is (bytes, mimetype, extension) as returned by render"""
+        item = {"index": index, "question": self.questions[index], "text": reply}
+        if self.audio and audio is not None:
+            item["audio_base64"] = base64.b64encode(audio[0]).decode("utf-8")
+            item["audio_type"] = audio[1]
+        return item
+
+    def speak(self, text: str) -> tuple:
+        with upstream.priority(upstream.BACKGROUND):
+            return render(synthesize(text).getvalue(), self.profile)
+
+    def summary(self) -> dict:
+        return {
+            "done": True,
+            "questions": len(self.questions),
+            "unique_questions": len(self.askers),
+            "syntheses": self.syntheses,
+            "errors": self.errors,
+            "seconds": round(time.perf_counter() - self.started, 3),
+        }
+
+
+def validate(questions) -> List[str]:
+    """
+    Check a batch request's question list
+
+    Raises:
+        ValueError: If it is not a non-empty list of strings within BATCH_MAX_QUESTIONS
+    """
+    if not isinstance(questions, list) or not questions:
+        raise ValueError("No questions provided")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        raise ValueError("Every question must be a non-empty string")
+    return questions
+
+
+def _ask(question: str, batch: _Batch) -> Tuple[str, Optional[tuple]]:
+    # Anchor questions are answered from precomputed text and audio
+    warm = warmup.lookup(question)
+    if warm:
+        audio = None if warm.audio is None or not batch.audio else render(warm.audio, batch.profile)
+        return warm.text, audio
+    with upstream.priority(upstream.BACKGROUND):
+        return get_response(question), None
+
+
+def run_batch(questions: List[str], audio: bool = True, concurrency: Optional[int] = None,
+              profile: Optional[AudioProfile] = None) -> Iterator[dict]:
+    """
+    Answer a list of questions with bounded concurrency
+
+    Questions are stateless: no session history is used or kept.
+
+    Args:
+        questions (List[str]): Questions, validated with ``validate``
+        audio (bool): Synthesize the replies (default: True)
+        concurrency (int, optional): LLM and TTS calls in flight at once (default: BATCH_CONCURRENCY)
+        profile (AudioProfile, optional): Audio format (default: AUDIO_DEFAULT_PROFILE)
+
+    Yields:
+        dict: One item per question as soon as it is answered, then the summary
+    """
+    concurrency = BATCH_CONCURRENCY if concurrency is None else concurrency
+    batch = _Batch(questions, audio, profile)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        pending = {pool.submit(_ask, question, batch): ("ask", key) for key, question in batch.unique_questions()}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(f"Batch {stage} failed: {e}")
+                        yield from batch.failed(key, e) if stage == "ask" else batch.synthesis_failed(key, e)
+                        continue
+                    if stage == "ask":
+                        items, text = batch.answered(key, *result)
+                        if text is not None:
+                            pending[pool.submit(batch.speak, text)] = ("tts", text)
+                    else:
+                        items = batch.synthesized(key, result)
+                    yield from items
+        finally:
+            # The client went away: don't start calls for nobody
+            for future in pending:
+                future.cancel()
+    yield batch.summary()
+
+
+async def run_batch_async(questions: List[str], audio: bool = True, concurrency: Optional[int] = None,
+                          profile: Optional[AudioProfile] = None) -> AsyncIterator[dict]:
+    """Async version of run_batch for the ASGI app"""
+    concurrency = BATCH_CONCURRENCY if concurrency is None else concurrency
+    batch = _Batch(questions, audio, profile)
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def ask(question: str) -> Tuple[str, Optional[tuple]]:
+        async with slots:
+            warm = warmup.lookup(question)
+            if warm:
+                if warm.audio is None or not batch.audio:
+                    return warm.text, None
+                return warm.text, await asyncio.to_thread(render, warm.audio, batch.profile)
+            with upstream.priority(upstream.BACKGROUND):
+                return await get_response_async(question), None
+
+    async def speak(text: str) -> tuple:
+        async with slots:
+            with upstream.priority(upstream.BACKGROUND):
+                audio = (await synthesize_async(text)).getvalue()
+            # Transcoding runs ffmpeg; keep it off the event loop
+            return await asyncio.to_thread(render, audio, batch.profile)
+
+    pending = {asyncio.ensure_future(ask(question)): ("ask", key) for key, question in batch.unique_questions()}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage, key = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"Batch {stage} failed: {e}")
+                    for item in batch.failed(key, e) if stage == "ask" else batch.synthesis_failed(key, e):
+                        yield item
+                    continue
+                if stage == "ask":
+                    items, text = batch.answered(key, *result)
+                    if text is not None:
+                        pending[asyncio.ensure_future(speak(text))] = ("tts", text)
+                else:
+                    items = batch.synthesized(key, result)
+                for item in items:
+                    yield item
+    finally:
+        # The client went away: don't leave calls running for nobody
+        for task in pending:
+            task.cancel()
+    yield batch.summary()
+
+
+def read_questions(path: str) -> List[str]:
+    """Questions from a JSON list, or one per line of a text file ("-" reads stdin)"""
+    if path == "-":
+        content = sys.stdin.read()
+    else:
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+    if content.lstrip().startswith("["):
+        return json.loads(content)
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+_EXTENSIONS = {profile.mimetype: profile.extension for profile in PROFILES.values() if profile.name != "original"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a list of questions, writing NDJSON results")
+    parser.add_argument("questions", help="text file with one question per line, a JSON list, or - for stdin")
+    parser.add_argument("--out", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--audio-dir", help="write each answer's MP3 here instead of base64 in the output")
+    parser.add_argument("--no-audio", action="store_true", help="text replies only")
+    parser.add_argument("--audio-format", choices=list(PROFILES), help="audio profile (default: AUDIO_DEFAULT_PROFILE)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="LLM and TTS calls at once")
+    args = parser.parse_args()
+
+    questions = validate(read_questions(args.questions))
+    profile = negotiate("", args.audio_format)
+    if args.audio_dir:
+        os.makedirs(args.audio_dir, exist_ok=True)
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        for item in run_batch(questions, audio=not args.no_audio, concurrency=args.concurrency, profile=profile):
+            if args.audio_dir and "audio_base64" in item:
+                name = f"{item['index']:04d}.{_EXTENSIONS.get(item['audio_type'], 'mp3')}"
+                with open(os.path.join(args.audio_dir, name), "wb") as f:
+                    f.write(base64.b64decode(item.pop("audio_base64")))
+                item["audio"] = name
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
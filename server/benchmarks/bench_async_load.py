@@ -0,0 +1,150 @@
+"""
+Load test /api/chat: ASGI app (asgi.py) vs. Flask app with N sync workers.
+
+Both apps run in-process against the local OpenAI and gTTS stand-ins, with
+the TTS cache disabled so every request goes upstream. The Flask app gets a
+fixed number of concurrent requests, like gunicorn sync workers; the ASGI
+app runs in a single uvicorn event loop. Run from the server directory:
+
+    python -m benchmarks.bench_async_load --concurrency 10 50 200 --sync-workers 4
+"""
+import os
+
+# Every request must reach the stand-ins, and the OpenAI client needs some key
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ["WARMUP_ON_START"] = "0"
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import asyncio
+import io
+import logging
+import socket
+import statistics
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+
+import aiohttp
+import uvicorn
+from werkzeug.serving import make_server
+
+from benchmarks.stubs import gtts_stub, openai_stub
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_asgi():
+    """Run asgi.app under uvicorn in a background thread"""
+    import asgi
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        asgi.app, host="127.0.0.1", port=port, log_level="warning",
+        backlog=4096, limit_concurrency=None,
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+@contextmanager
+def serve_wsgi(workers: int):
+    """Run the Flask app, admitting ``workers`` requests at a time like gunicorn sync workers"""
+    import app as app_module
+
+    slots = threading.BoundedSemaphore(workers)
+
+    def limited(environ, start_response):
+        with slots:
+            return list(app_module.app(environ, start_response))
+
+    port = _free_port()
+    server = make_server("127.0.0.1", port, limited, threaded=True)
+    server.socket.listen(4096)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+async def run_load(base_url: str, concurrency: int, requests_per_client: int) -> dict:
+    """Send requests from ``concurrency`` clients at once; return latency and throughput"""
+    latencies = []
+    errors = 0
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=300)
+
+    async with aiohttp.ClientSession(base_url, connector=connector, timeout=timeout) as client:
+        async def one_client():
+            nonlocal errors
+            for _ in range(requests_per_client):
+                started = time.perf_counter()
+                async with client.post("/api/chat", json={"message": "What did you build at AiRotor?"}) as response:
+                    body = await response.json() if response.status == 200 else {}
+                latencies.append(time.perf_counter() - started)
+                if "audio_base64" not in body:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=2, help="requests per client")
+    parser.add_argument("--sync-workers", type=int, default=4, help="Flask concurrent request limit")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with openai_stub(args.llm_latency, args.jitter), gtts_stub(args.tts_latency, args.jitter):
+        print(f"{'server':>14} {'clients':>8} {'reqs':>6} {'errors':>7} {'req/s':>8} {'p50':>8} {'p95':>8}")
+        servers = [
+            (f"flask x{args.sync_workers}", lambda: serve_wsgi(args.sync_workers)),
+            ("asgi x1", serve_asgi),
+        ]
+        for name, serve in servers:
+            with serve() as base_url:
+                for concurrency in args.concurrency:
+                    # app.py still prints debug output per request
+                    with redirect_stdout(io.StringIO()):
+                        result = asyncio.run(run_load(base_url, concurrency, args.requests))
+                    print(
+                        f"{name:>14} {concurrency:>8} {result['requests']:>6} {result['errors']:>7} "
+                        f"{result['throughput']:>8.1f} {result['p50']:>7.2f}s {result['p95']:>7.2f}s"
+                    )
+
+
+if __name__ == "__main__":
+    main()
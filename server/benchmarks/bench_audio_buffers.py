@@ -0,0 +1,101 @@
+"""
+Peak memory of a long spoken reply, from gTTS chunks to the response body.
+
+The gTTS stand-in returns about as much audio per character as Google
+does, so a reply of a few thousand characters is minutes of 32 kbps MP3
+in dozens of chunks. For each reply length, the report shows the traced
+(tracemalloc) peak above the resting heap and the time of joining the
+chunks, of google_tts, and of a whole /api/chat request (Flask with JSON
+and binary bodies, and ASGI with JSON), next to the size of the audio.
+Response bodies are read piece by piece and dropped, as a server writing
+them to a socket would. Run from the server directory:
+
+    python -m benchmarks.bench_audio_buffers --chars 1000 3000 6000
+"""
+import os
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ["WARMUP_ON_START"] = "0"
+os.environ["TTS_ENGINES"] = "gtts"
+os.environ["TTS_FALLBACK_ENGINES"] = ""
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ["RESPONSE_CACHE_SHARED_MB"] = "0"
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import contextlib
+import io
+import logging
+import time
+import tracemalloc
+
+from benchmarks.bench_chunk_planner import reply
+from benchmarks.stubs import gtts_stub, openai_stub
+from gtts_tts import _clean_text, _concatenate_audio_segments, _split_text_smart, _synthesize_gtts_chunk, google_tts
+
+# Seconds of speech per character at about 160 words per minute
+CHAR_AUDIO = 0.06
+
+
+def traced(call) -> tuple:
+    """(peak bytes above the heap at the start, seconds) of one call"""
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    call()
+    seconds = time.perf_counter() - started
+    return tracemalloc.get_traced_memory()[1] - before, seconds
+
+
+def drain(chunks) -> int:
+    """Consume a response body the way a server sends it, keeping nothing"""
+    return sum(len(chunk) for chunk in chunks)
+
+
+def asgi_stream(client, text: str) -> int:
+    with client.stream("POST", "/api/chat", json={"message": text}) as response:
+        return drain(response.iter_raw())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chars", type=int, nargs="+", default=[1000, 3000, 6000], help="reply lengths")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app as app_module
+    import asgi
+    from starlette.testclient import TestClient
+
+    flask_client = app_module.app.test_client()
+    print(f"{'chars':>6} {'audio':>8} {'case':<20} {'peak':>9} {'x audio':>8} {'time':>9}")
+    with openai_stub(0.0, token_delay=0, echo=True), gtts_stub(0.0) as tts, TestClient(asgi.app) as asgi_client:
+        tts.char_audio = CHAR_AUDIO
+        tracemalloc.start()
+        for chars in args.chars:
+            text = reply(chars, 0)
+            segments = [_synthesize_gtts_chunk(chunk, "en", False) for chunk in _split_text_smart(_clean_text(text), 100)]
+            audio_size = sum(map(len, segments))
+            cases = {
+                "join chunks": lambda: _concatenate_audio_segments(segments),
+                "google_tts": lambda: google_tts(text),
+                "flask /api/chat json": lambda: drain(flask_client.post(
+                    "/api/chat", json={"message": text}, buffered=False).response),
+                "flask /api/chat mp3": lambda: drain(flask_client.post(
+                    "/api/chat", json={"message": text}, headers={"Accept": "audio/mpeg"}, buffered=False).response),
+                "asgi /api/chat json": lambda: asgi_stream(asgi_client, text),
+            }
+            for name, call in cases.items():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    call()
+                    peak, seconds = traced(call)
+                print(f"{chars:>6} {audio_size // 1024:>6}KB {name:<20} {peak // 1024:>7}KB "
+                      f"{peak / audio_size:>8.1f} {seconds * 1000:>7.1f}ms")
+            print()
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
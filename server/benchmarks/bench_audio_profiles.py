@@ -0,0 +1,82 @@
+"""
+Reply audio size and download time per output profile.
+
+Two source MP3s are generated with ffmpeg: a 128 kbps 44.1 kHz stereo one,
+as ElevenLabs and pydub exports used to be, and a 32 kbps 24 kHz mono one,
+as gTTS produces. The signal is a pitched tone with a syllable-rate
+envelope over noise, so the encoders have something speech-like to code.
+Each source is rendered in every profile; the report shows the bytes sent
+(raw and base64, as JSON and streamed replies carry it), the first,
+transcoding render against a cached one, and the download time at a few
+mobile bandwidths. Needs ffmpeg. Run from the server directory:
+
+    python -m benchmarks.bench_audio_profiles --seconds 5 15 --bandwidth 400 1600
+"""
+import os
+
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import base64
+import logging
+import subprocess
+import sys
+import time
+
+from audio_profiles import PROFILES, ffmpeg_available, render
+
+SOURCES = {
+    "128k stereo 44.1k": ("-ac", "2", "-ar", "44100", "-b:a", "128k"),
+    "32k mono 24k": ("-ac", "1", "-ar", "24000", "-b:a", "32k"),
+}
+
+
+def source_audio(seconds: float, encoder_args: tuple) -> bytes:
+    """Speech-like MP3 of the given length"""
+    signal = (
+        f"aevalsrc=0.5*sin(2*PI*(140+30*sin(2*PI*0.5*t))*t)*(0.6+0.4*sin(2*PI*4*t))"
+        f"+0.05*(random(0)-0.5):s=44100:d={seconds}"
+    )
+    result = subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", signal, *encoder_args, "-c:a", "libmp3lame",
+         "-f", "mp3", "pipe:1"],
+        capture_output=True, check=True,
+    )
+    return result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 15], help="reply lengths")
+    parser.add_argument("--bandwidth", type=int, nargs="+", default=[400, 1600], help="link speeds (kbit/s)")
+    args = parser.parse_args()
+
+    if not ffmpeg_available():
+        sys.exit("ffmpeg is needed to transcode")
+    logging.disable(logging.WARNING)
+
+    header = f"{'source':<18} {'secs':>5} {'profile':<9} {'bytes':>8} {'base64':>8} {'first':>8} {'cached':>8}"
+    print(header + "".join(f" {f'@{kbps}k':>8}" for kbps in args.bandwidth))
+    for label, encoder_args in SOURCES.items():
+        for seconds in args.seconds:
+            audio = source_audio(seconds, encoder_args)
+            for name in ("original", "mp3", "opus", "pcm"):
+                profile = PROFILES[name]
+                started = time.perf_counter()
+                data, _, _ = render(audio, profile)
+                first = time.perf_counter() - started
+                started = time.perf_counter()
+                render(audio, profile)
+                cached = time.perf_counter() - started
+                downloads = "".join(f" {len(data) * 8 / (kbps * 1000) * 1000:>6.0f}ms" for kbps in args.bandwidth)
+                print(
+                    f"{label:<18} {seconds:>5.0f} {name:<9} {len(data):>8} {len(base64.b64encode(data)):>8} "
+                    f"{first * 1000:>6.1f}ms {cached * 1000:>6.2f}ms{downloads}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
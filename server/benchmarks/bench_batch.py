@@ -0,0 +1,87 @@
+"""
+A question set answered one /api/chat call at a time vs. through /api/chat/batch.
+
+The OpenAI stand-in opens each reply with the question, so replies differ
+but share most of their chunks, as answers from one persona do. Part of
+the set repeats earlier questions. Reports wall time, questions per
+second and the calls that reached the LLM and TTS stand-ins, first for
+sequential /api/chat calls and then for batches at several concurrency
+limits. Run from the server directory:
+
+    python -m benchmarks.bench_batch --questions 48 --repeat-rate 0.25 --concurrency 1 4 16
+"""
+import os
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ["WARMUP_ON_START"] = "0"
+os.environ["TTS_ENGINES"] = "gtts"
+os.environ["TTS_FALLBACK_ENGINES"] = ""
+# Exact matches only, so distinct questions are never answered from each other's replies
+os.environ["RESPONSE_CACHE_SIMILARITY"] = "1.0"
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import random
+import time
+
+from benchmarks.stubs import gtts_stub, openai_stub
+
+
+def question_set(count: int, repeat_rate: float, run: int) -> list:
+    """Questions unique to this run, with repeat_rate of them asked again"""
+    rnd = random.Random(run)
+    questions = []
+    for i in range(count):
+        if questions and rnd.random() < repeat_rate:
+            questions.append(rnd.choice(questions))
+        else:
+            questions.append(f"Run {run}: what did you take away from project {i}?")
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=48)
+    parser.add_argument("--repeat-rate", type=float, default=0.25, help="share of questions asked twice")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--tts-latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app as app_module
+    import batch
+
+    client = app_module.app.test_client()
+    print(f"{'mode':<22} {'wall':>8} {'q/s':>7} {'llm calls':>10} {'tts calls':>10}")
+    with openai_stub(args.llm_latency, token_delay=0, echo=True) as llm, gtts_stub(args.tts_latency) as tts:
+        modes = [("sequential /api/chat", None)] + [(f"batch x{c}", c) for c in args.concurrency]
+        for run, (name, concurrency) in enumerate(modes):
+            questions = question_set(args.questions, args.repeat_rate, run)
+            llm_before, tts_before = llm.requests, tts.requests
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if concurrency is None:
+                    for question in questions:
+                        assert client.post("/api/chat", json={"message": question}).status_code == 200
+                else:
+                    batch.BATCH_CONCURRENCY = concurrency
+                    response = client.post("/api/chat/batch", json={"questions": questions})
+                    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+                    assert lines[-1]["done"] and not lines[-1]["errors"], lines[-1]
+                    assert sorted(item["index"] for item in lines[:-1]) == list(range(len(questions)))
+            wall = time.perf_counter() - started
+            print(
+                f"{name:<22} {wall:>7.2f}s {len(questions) / wall:>7.1f} "
+                f"{llm.requests - llm_before:>10} {tts.requests - tts_before:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
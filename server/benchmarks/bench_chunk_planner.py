@@ -0,0 +1,115 @@
+"""
+Long-text gTTS with fixed 100-character chunks vs. chunks planned from measured costs.
+
+The gTTS stand-in charges a fixed latency per request plus a latency per
+character, as the real service does. Replies of several lengths are
+synthesized on TTS_MAX_WORKERS workers, first with the fixed split and
+then with the chunk planner once it has fitted its cost model from a few
+requests. Reports the chunk count, total latency, latency of the first
+chunk's audio, the planner's prediction, and the time to first audio of a
+streamed reply (fixed first chunk vs. the planner's short one). Run from
+the server directory:
+
+    python -m benchmarks.bench_chunk_planner --fixed-latency 0.3 --char-latency 0.004
+"""
+import os
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import logging
+import statistics
+import time
+
+from benchmarks.stubs import gtts_stub
+from chunk_planner import planner
+from gtts_tts import _split_text_smart, _synthesize_chunks, _synthesize_gtts_chunk
+from text_segmenter import TextSegmenter
+
+SENTENCES = [
+    "I can take chaotic data, tools, and problems and distill them into an engineered solution.",
+    "At AiRotor I built a defect detection system using YOLO on twenty thousand drone images.",
+    "I also created React, Flask and MongoDB dashboards for real-time defect reporting.",
+    "Voice bots, LLM pipelines and drone vision all come down to the same habit of mind.",
+]
+
+
+def reply(length: int, seed: int) -> str:
+    """About ``length`` characters of reply text, different for each seed"""
+    words = []
+    i = seed
+    while len(" ".join(words)) < length:
+        words.append(SENTENCES[i % len(SENTENCES)])
+        i += 1
+    return " ".join(words)[:length].rsplit(" ", 1)[0] + "."
+
+
+def synthesize(chunk: str) -> bytes:
+    return _synthesize_gtts_chunk(chunk, "en", False)
+
+
+def run(text: str, adaptive: bool) -> dict:
+    planner.enabled = adaptive
+    plan = planner.plan("gtts", text, _split_text_smart)
+    started = time.perf_counter()
+    results = _synthesize_chunks(plan.chunks, synthesize, max_workers=plan.workers)
+    total = time.perf_counter() - started
+    planner.record(plan, total)
+    return {"chunks": len(plan.chunks), "total": total, "first": results[0].latency, "predicted": plan.predicted}
+
+
+def first_audio(text: str, adaptive: bool) -> float:
+    """Seconds from the first streamed chunk's boundary to its audio"""
+    planner.enabled = adaptive
+    first_length, max_length = planner.stream_lengths("gtts", len(text))
+    segmenter = TextSegmenter(max_length=max_length, first_length=first_length, eager=True)
+    chunks = segmenter.feed(text) + segmenter.flush()
+    started = time.perf_counter()
+    synthesize(chunks[0])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixed-latency", type=float, default=0.3, help="stub latency per request (s)")
+    parser.add_argument("--char-latency", type=float, default=0.004, help="stub latency per character (s)")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[150, 400, 1000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with gtts_stub(args.fixed_latency) as stub:
+        stub.char_latency = args.char_latency
+        # Let the planner fit the stand-in's costs from requests of varied length
+        for i in range(4):
+            for length in (30, 60, 100):
+                synthesize(reply(length, i))
+        fixed, per_char = planner.model("gtts").estimate()
+        print(f"stub: {args.fixed_latency:.3f}s + {args.char_latency * 1000:.2f}ms/char; "
+              f"fitted: {fixed:.3f}s + {per_char * 1000:.2f}ms/char\n")
+
+        print(f"{'chars':>6} {'mode':<9} {'chunks':>7} {'total':>9} {'first':>9} {'predicted':>10}")
+        for length in args.lengths:
+            for mode, adaptive in (("fixed", False), ("adaptive", True)):
+                runs = [run(reply(length, seed), adaptive) for seed in range(args.repeats)]
+                print(
+                    f"{length:>6} {mode:<9} {runs[0]['chunks']:>7} "
+                    f"{statistics.median(r['total'] for r in runs) * 1000:>7.0f}ms "
+                    f"{statistics.median(r['first'] for r in runs) * 1000:>7.0f}ms "
+                    f"{statistics.median(r['predicted'] for r in runs) * 1000:>8.0f}ms"
+                )
+
+        print()
+        for mode, adaptive in (("fixed", False), ("adaptive", True)):
+            seconds = statistics.median(first_audio(reply(400, seed), adaptive) for seed in range(args.repeats))
+            print(f"streamed reply, first chunk to audio ({mode}): {seconds * 1000:.0f}ms")
+
+    stats = planner.stats()["gtts"]
+    print(f"\nplanned syntheses: predicted {stats['predicted_seconds']:.2f}s, took {stats['actual_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
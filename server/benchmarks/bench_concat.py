@@ -0,0 +1,80 @@
+"""
+Benchmark MP3 concatenation: frame-level join vs. pydub decode/re-encode.
+
+Segments are generated with ffmpeg (tones in gTTS's format: 24 kHz mono
+32 kbps). Without ffmpeg only the frame join runs, on synthetic silent
+frames; the pydub column needs both ffmpeg and ffprobe. Run from the server
+directory:
+
+    python -m benchmarks.bench_concat --segments 5 20 50
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.stubs import STUB_AUDIO
+from gtts_tts import _reencode_audio_segments
+from mp3_frames import iter_frames, join_mp3
+
+
+def make_segments(count: int, seconds: float = 2.0):
+    """Generate ``count`` MP3 tone segments with ffmpeg, or None without ffmpeg"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    segments = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(count):
+            path = os.path.join(tmp, f"{i}.mp3")
+            subprocess.run(
+                [ffmpeg, "-loglevel", "error", "-y", "-f", "lavfi",
+                 "-i", f"sine=frequency={300 + 20 * i}:duration={seconds}",
+                 "-ar", "24000", "-ac", "1", "-b:a", "32k", path],
+                check=True,
+            )
+            with open(path, "rb") as f:
+                segments.append(f.read())
+    return segments
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def duration(data: bytes) -> float:
+    return sum(header.samples / header.sample_rate for _, header in iter_frames(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--segments", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'segments':>8} {'frame join':>11} {'pydub':>10} {'speedup':>8} {'duration':>9}")
+    for count in args.segments:
+        segments = make_segments(count)
+        if segments is None:
+            segments = [STUB_AUDIO] * count
+
+        join_time, joined = timed(lambda: join_mp3(segments), args.repeat)
+        if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+            pydub_time, _ = timed(lambda: _reencode_audio_segments(segments), args.repeat)
+            pydub_ms = f"{pydub_time * 1000:>8.1f}ms"
+            speedup = f"{pydub_time / join_time:>7.0f}x"
+        else:
+            pydub_ms, speedup = f"{'n/a':>10}", f"{'':>8}"
+        print(f"{count:>8} {join_time * 1000:>9.2f}ms {pydub_ms} {speedup} {duration(joined):>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
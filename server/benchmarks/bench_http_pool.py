@@ -0,0 +1,76 @@
+"""
+Connections opened per upstream request: one-off clients vs. the shared pools.
+
+gTTS and OpenAI requests go to local stand-ins, which count the TCP
+connections they accept. Against the real services every new connection
+is also a TLS handshake. Run from the server directory:
+
+    python -m benchmarks.bench_http_pool --requests 50
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import io
+import json
+import logging
+import time
+
+import openai
+
+from benchmarks.stubs import gtts_stub, openai_stub
+
+
+def measure(server, fn, count: int):
+    """Run ``fn`` ``count`` times; return (connections per request, mean latency)"""
+    before = server.connections
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - started
+    return (server.connections - before) / count, elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    from gtts import gTTS
+    from gtts_tts import _synthesize_gtts_chunk
+    from http_clients import pool_stats
+    import openai_client
+
+    def gtts_one_off():
+        gTTS(text="Hello there, this is one chunk.", lang="en").write_to_fp(io.BytesIO())
+
+    def gtts_pooled():
+        _synthesize_gtts_chunk("Hello there, this is one chunk.", "en", False)
+
+    with gtts_stub(args.latency) as gtts_server, openai_stub(args.latency) as openai_server:
+        def openai_one_off():
+            client = openai.OpenAI(api_key="stub-key", base_url=f"{openai_server.url}/v1")
+            client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+            client.close()
+
+        def openai_pooled():
+            openai_client.client().chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}])
+
+        print(f"{'upstream':>10} {'client':>10} {'conn/req':>9} {'latency':>9}")
+        for upstream, server, one_off, pooled in (
+            ("gtts", gtts_server, gtts_one_off, gtts_pooled),
+            ("openai", openai_server, openai_one_off, openai_pooled),
+        ):
+            for name, fn in (("one-off", one_off), ("pooled", pooled)):
+                per_request, latency = measure(server, fn, args.requests)
+                print(f"{upstream:>10} {name:>10} {per_request:>9.2f} {latency * 1000:>7.1f}ms")
+
+        print(json.dumps(pool_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark sequential vs. parallel chunk synthesis for long-text gTTS.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_parallel_tts --latency 0.3 --jitter 0.1
+"""
+import argparse
+import time
+
+from benchmarks.stubs import gtts_stub
+from gtts_tts import _split_text_smart, _synthesize_chunks, _synthesize_gtts_chunk
+
+SAMPLE_REPLY = (
+    "Integrative thinking. I can take chaotic data, tools, and problems, whether it's drone "
+    "vision, LLM pipelines, or voice bots, and distill it into an engineered solution that works "
+    "in the real world. At AiRotor I built a defect detection system using YOLO and Roboflow on "
+    "more than twenty thousand aerial drone images. I also created React, Flask and MongoDB "
+    "dashboards for real-time defect reporting and operational insights. "
+) * 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="uniform jitter (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    chunks = _split_text_smart(SAMPLE_REPLY, max_length=100)
+    print(f"{len(chunks)} chunks, {len(SAMPLE_REPLY)} characters")
+
+    with gtts_stub(args.latency, args.jitter):
+        for workers in args.workers:
+            started = time.perf_counter()
+            results = _synthesize_chunks(
+                chunks, lambda chunk: _synthesize_gtts_chunk(chunk, "en", False), max_workers=workers
+            )
+            wall = time.perf_counter() - started
+            latencies = [r.latency for r in results]
+            print(
+                f"workers={workers:<3} wall={wall:6.3f}s  sum={sum(latencies):6.3f}s  "
+                f"slowest={max(latencies):6.3f}s  failed={sum(r.audio is None for r in results)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Replay interview questions against get_response with and without the reply cache.
+
+The question log mixes repeats and near-duplicates of a few questions, the
+way real visitors ask them. The LLM is the local OpenAI stand-in. Run from
+the server directory:
+
+    python -m benchmarks.bench_response_cache --latency 0.5
+"""
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import contextlib
+import io
+import logging
+import statistics
+import time
+
+from benchmarks.stubs import openai_stub
+
+QUESTIONS = [
+    "What's your #1 superpower?",
+    "what is your number one superpower",
+    "What’s your #1 superpower",
+    "What is your superpower?",
+    "Tell me about your life story in a few sentences.",
+    "What should we know about your life story in a few sentences?",
+    "What are the top 3 areas you'd like to grow in?",
+    "What are the top three areas you would like to grow in?",
+    "What misconception do your coworkers have about you?",
+    "what misconceptions do your coworkers have about you",
+    "How do you push your boundaries and limits?",
+    "How do you push your limits and boundaries?",
+    "What did you build at AiRotor?",
+    "What did you do at Tatvasoft?",
+    "What's your #1 superpower?",
+    "How do you push your boundaries and limits?",
+]
+
+
+def replay(get_response, rounds: int):
+    latencies = []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            started = time.perf_counter()
+            get_response(question)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.5, help="LLM stand-in latency")
+    parser.add_argument("--rounds", type=int, default=2, help="times the question log is replayed")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    import openai_client
+    from response_cache import response_cache
+
+    with openai_stub(args.latency) as server:
+        print(f"{'cache':>6} {'llm calls':>10} {'mean':>9} {'p50':>9} {'hit ratio':>10}")
+        for enabled in (False, True):
+            response_cache.clear()
+            response_cache.max_entries = 512 if enabled else 0
+            before = server.requests
+            # get_response still prints each reply
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies = replay(openai_client.get_response, args.rounds)
+            hit_ratio = response_cache.stats()["hit_ratio"] if enabled else 0.0
+            print(
+                f"{'on' if enabled else 'off':>6} {server.requests - before:>10} "
+                f"{statistics.mean(latencies) * 1000:>7.1f}ms {statistics.median(latencies) * 1000:>7.1f}ms "
+                f"{hit_ratio:>10.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare /api/chat response modes: base64-in-JSON vs. raw audio/mpeg.
+
+The LLM and TTS calls are replaced by fixed results so only response
+building is measured. Run from the server directory:
+
+    python -m benchmarks.bench_response_mode --audio-kb 200
+"""
+import os
+
+os.environ.setdefault("WARMUP_ON_START", "0")
+
+import argparse
+import io
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import app as app_module
+from benchmarks.stubs import STUB_REPLY
+
+# Client-side decode, as App.tsx did it for base64 (atob + charCodeAt loop)
+_NODE_DECODE = r"""
+const fs = require('fs');
+const b64 = fs.readFileSync(process.argv[1], 'utf8');
+const runs = 20;
+let started = process.hrtime.bigint();
+for (let r = 0; r < runs; r++) {
+  const data = atob(JSON.parse(b64).audio_base64);
+  const arr = new Uint8Array(data.length);
+  for (let i = 0; i < data.length; i++) arr[i] = data.charCodeAt(i);
+}
+const base64Ms = Number(process.hrtime.bigint() - started) / 1e6 / runs;
+const raw = fs.readFileSync(process.argv[2]);
+started = process.hrtime.bigint();
+for (let r = 0; r < runs; r++) new Blob([raw], { type: 'audio/mpeg' });
+const binaryMs = Number(process.hrtime.bigint() - started) / 1e6 / runs;
+console.log(base64Ms.toFixed(3) + ' ' + binaryMs.toFixed(3));
+"""
+
+
+def measure(client, headers: dict, repeat: int):
+    """Return (body bytes, best wall time, peak traced memory) for one mode"""
+    best = float("inf")
+    peak = 0
+    body = b""
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = client.post("/api/chat", json={"message": "What did you build at AiRotor?"}, headers=headers)
+        body = response.get_data()
+        best = min(best, time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return body, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--audio-kb", type=int, default=200, help="size of the fake MP3 reply")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    audio = os.urandom(args.audio_kb * 1024)
+    app_module.get_response = lambda user_input: STUB_REPLY
+    app_module.google_tts = lambda text: io.BytesIO(audio)
+    client = app_module.app.test_client()
+
+    json_body, json_time, json_peak = measure(client, {"Accept": "application/json"}, args.repeat)
+    raw_body, raw_time, raw_peak = measure(client, {"Accept": "audio/mpeg"}, args.repeat)
+
+    print(f"{'mode':<8} {'payload':>10} {'server':>9} {'peak mem':>10}")
+    print(f"{'json':<8} {len(json_body):>9}B {json_time * 1000:>7.2f}ms {json_peak / 1024:>8.0f}KB")
+    print(f"{'binary':<8} {len(raw_body):>9}B {raw_time * 1000:>7.2f}ms {raw_peak / 1024:>8.0f}KB")
+
+    node = shutil.which("node")
+    if node:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "reply.json")
+            raw_path = os.path.join(tmp, "reply.mp3")
+            with open(json_path, "wb") as f:
+                f.write(json_body)
+            with open(raw_path, "wb") as f:
+                f.write(raw_body)
+            result = subprocess.run([node, "-e", _NODE_DECODE, json_path, raw_path],
+                                    capture_output=True, text=True, check=True)
+            base64_ms, binary_ms = result.stdout.split()
+            print(f"client decode (node): base64 {base64_ms}ms, binary {binary_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Microbenchmark: _split_text_smart vs. the incremental TextSegmenter.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_segmenter --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from gtts_tts import _clean_text, _split_text_smart
+from text_segmenter import TextSegmenter, segment_text
+
+WORDS = (
+    "I built a defect detection system using YOLO and Roboflow on aerial drone images "
+    "the dashboard shows real-time reports but the pipeline runs on constrained hardware "
+    "so every stage matters yet nothing is wasted for or nor"
+).split()
+
+
+def make_text(size: int, seed: int = 0) -> str:
+    """LLM-like prose with a mix of short, long and run-on sentences"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.choice([4, 12, 30, 80])))
+        if rng.random() < 0.3:
+            sentence = sentence.replace(" the ", ", the ", 2)
+        sentence = sentence[0].upper() + sentence[1:] + rng.choice([".", ".", "!", "?"])
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return _clean_text(" ".join(parts))[:size]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def stream(text: str, max_length: int, delta: int):
+    segmenter = TextSegmenter(max_length)
+    chunks = []
+    for i in range(0, len(text), delta):
+        chunks.extend(segmenter.feed(text[i:i + delta]))
+    chunks.extend(segmenter.flush())
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--max-length", type=int, nargs="+", default=[100, 4500])
+    parser.add_argument("--delta", type=int, default=4, help="characters per streamed delta")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'chars':>9} {'max':>5} {'split_smart':>12} {'segmenter':>10} {'streamed':>10}  same")
+    for size in args.sizes:
+        text = make_text(size)
+        for max_length in args.max_length:
+            expected = _split_text_smart(text, max_length)
+            same = (segment_text(text, max_length) == expected
+                    and stream(text, max_length, args.delta) == expected)
+            old = timed(lambda: _split_text_smart(text, max_length), args.repeat)
+            new = timed(lambda: segment_text(text, max_length), args.repeat)
+            streamed = timed(lambda: stream(text, max_length, args.delta), args.repeat)
+            print(f"{size:>9} {max_length:>5} {old * 1000:>10.1f}ms {new * 1000:>8.1f}ms "
+                  f"{streamed * 1000:>8.1f}ms  {same}")
+
+
+if __name__ == "__main__":
+    main()
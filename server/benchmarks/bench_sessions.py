@@ -0,0 +1,76 @@
+"""
+Per-turn prompt size of a long conversation: session history vs. resending everything.
+
+Plays a conversation through get_response against the local OpenAI
+stand-in and estimates the input tokens of each turn's messages, with the
+session's bounded, summarized history and with the naive full history.
+Then fills the store with many sessions to show the memory cap. Run from
+the server directory:
+
+    python -m benchmarks.bench_sessions --turns 40 --sessions 5000
+"""
+import os
+
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ["WARMUP_ON_START"] = "0"
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import logging
+import time
+
+import openai_client
+from benchmarks.stubs import STUB_REPLY, openai_stub
+from sessions import SessionStore, estimate_tokens
+
+QUESTIONS = [
+    "Tell me about the drone defect detection work.",
+    "How big was the dataset?",
+    "What did the dashboard show?",
+    "Which of your projects cut costs the most?",
+    "How did you fine-tune it?",
+    "Why that approach over full fine-tuning?",
+]
+
+
+def message_tokens(messages) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    store = SessionStore(max_sessions=1000, max_bytes=4 * 1024 * 1024, idle_ttl=1800)
+    openai_client.session_store = store
+    session = store.get("bench")
+    naive_history = []
+
+    print(f"{'turn':>5} {'session tokens':>15} {'full history tokens':>20}")
+    with openai_stub(args.latency, token_delay=0):
+        for turn in range(1, args.turns + 1):
+            question = QUESTIONS[(turn - 1) % len(QUESTIONS)]
+            session_tokens = message_tokens(openai_client._build_messages(question, session))
+            naive_tokens = message_tokens(openai_client._build_messages(question)) + message_tokens(naive_history)
+            openai_client.get_response(question, session)
+            naive_history += [{"role": "user", "content": question}, {"role": "assistant", "content": STUB_REPLY}]
+            if turn in (1, 2, 5) or turn % 10 == 0:
+                print(f"{turn:>5} {session_tokens:>15} {naive_tokens:>20}")
+            # let the background roll-up finish, as it would between spoken turns
+            while session.rolling_up:
+                time.sleep(0.005)
+
+    for i in range(args.sessions):
+        store.get(f"client-{i}").add_turn(QUESTIONS[i % len(QUESTIONS)], STUB_REPLY)
+    stats = store.stats()
+    print(f"\n{args.sessions} clients: {stats['sessions']} sessions held, "
+          f"{stats['bytes'] / 1024:.0f} KB (cap {store.max_bytes // 1024} KB), "
+          f"{stats['evicted']} evicted, {stats['roll_ups']} roll-ups")
+
+
+if __name__ == "__main__":
+    main()
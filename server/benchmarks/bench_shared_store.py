@@ -0,0 +1,117 @@
+"""
+TTS cache across worker processes: per-process memory vs. the shared mmap store.
+
+Several worker processes (spawned, like gunicorn workers) each serve the
+same mix of reply sentences through ``cached_audio``, with a synthesis
+stand-in that sleeps and returns MP3-sized bytes. Each mode is run twice,
+the second time in fresh processes, as after a restart. Reports the
+syntheses made, the hit ratio and the memory the cache costs (private
+RSS summed over workers; the shared store sits in the page cache once).
+Run from the server directory:
+
+    python -m benchmarks.bench_shared_store --workers 4 --sentences 200
+"""
+import io
+import os
+import argparse
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+
+AUDIO_BYTES = 24 * 1024
+
+
+def _private_kb() -> int:
+    """Private (unshared) resident memory of this process"""
+    total = 0
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total
+
+
+def _worker(env: dict, sentences: int, requests: int, synth_delay: float, seed: int, results) -> None:
+    os.environ.update(env)
+    import logging
+    import random
+
+    logging.disable(logging.WARNING)
+    from tts_cache import cached_audio, tts_cache
+
+    rnd = random.Random(seed)
+    baseline = _private_kb()
+    syntheses = 0
+    latencies = []
+
+    def synthesize(index: int):
+        nonlocal syntheses
+        syntheses += 1
+        time.sleep(synth_delay)
+        return io.BytesIO(index.to_bytes(4, "little") * (AUDIO_BYTES // 4))
+
+    for _ in range(requests):
+        # Skewed like real traffic: a few replies are asked for far more often
+        index = min(int(rnd.paretovariate(1.2)) - 1, sentences - 1)
+        started = time.perf_counter()
+        audio = cached_audio("bench", f"sentence {index}", lambda: synthesize(index))
+        latencies.append(time.perf_counter() - started)
+        assert audio.getbuffer().nbytes == AUDIO_BYTES // 4 * 4
+    stats = tts_cache.stats()
+    results.append({
+        "syntheses": syntheses,
+        "hits": stats["memory_hits"] + stats["disk_hits"],
+        "lookups": stats["memory_hits"] + stats["disk_hits"] + stats["misses"],
+        "latency": statistics.median(latencies),
+        "private_kb": _private_kb() - baseline,
+    })
+
+
+def run(env: dict, workers: int, sentences: int, requests: int, synth_delay: float, seed: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.list()
+        processes = [context.Process(target=_worker, args=(env, sentences, requests, synth_delay, seed + i, results))
+                     for i in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        results = list(results)
+    return {
+        "syntheses": sum(r["syntheses"] for r in results),
+        "hit_ratio": sum(r["hits"] for r in results) / sum(r["lookups"] for r in results),
+        "p50_ms": statistics.median(r["latency"] for r in results) * 1000,
+        "private_mb": sum(r["private_kb"] for r in results) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sentences", type=int, default=200, help="distinct reply sentences")
+    parser.add_argument("--requests", type=int, default=400, help="lookups per worker")
+    parser.add_argument("--synth-delay", type=float, default=0.02, help="seconds per synthesis")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="voicebot-shared-")
+    modes = [
+        ("per-process memory", {"TTS_CACHE_MEMORY_MB": "64", "TTS_CACHE_DIR": ""}),
+        ("shared store", {"TTS_CACHE_MEMORY_MB": "0", "TTS_CACHE_DIR": cache_dir, "TTS_CACHE_DISK_MB": "64"}),
+    ]
+    print(f"{'mode':<20} {'run':<9} {'syntheses':>10} {'hit ratio':>10} {'p50':>9} {'private MB':>11}")
+    try:
+        for name, env in modes:
+            env = {**env, "OPENAI_API_KEY": "stub-key", "SINGLEFLIGHT_DIR": ""}
+            for run_name, seed in (("cold", 0), ("restart", 100)):
+                result = run(env, args.workers, args.sentences, args.requests, args.synth_delay, seed)
+                print(f"{name:<20} {run_name:<9} {result['syntheses']:>10} {result['hit_ratio']:>10.0%} "
+                      f"{result['p50_ms']:>7.2f}ms {result['private_mb']:>11.1f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
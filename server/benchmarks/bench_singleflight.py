@@ -0,0 +1,138 @@
+"""
+Upstream calls for a burst of identical /api/chat requests, with and without coalescing.
+
+A shared demo link makes many clients ask the same question within
+seconds. Each mode fires the same question from many clients at once at
+the Flask app, with the OpenAI and gTTS stand-ins behind it, and counts
+the requests that reached them: without coalescing, with single-flight
+in one process, and with single-flight across several worker processes
+sharing a flight directory (as gunicorn workers do). Run from the server
+directory:
+
+    python -m benchmarks.bench_singleflight --clients 32 --workers 4
+"""
+import os
+import tempfile
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["WARMUP_ON_START"] = "0"
+os.environ["TTS_ENGINES"] = "gtts"
+os.environ["TTS_FALLBACK_ENGINES"] = ""
+os.environ.setdefault("SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "voicebot-bench-flights"))
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+
+from benchmarks.stubs import gtts_stub, openai_stub
+
+
+class _Uncoalesced:
+    """Stands in for a SingleFlight: every caller makes its own call"""
+
+    name = "off"
+
+    def do(self, key, fn):
+        return fn()
+
+    async def do_async(self, key, fn):
+        return await fn()
+
+
+def burst(client, question: str, clients: int, start_at: float) -> list:
+    """Send ``question`` from ``clients`` threads at ``start_at``; return latencies"""
+    latencies = []
+    lock = threading.Lock()
+
+    def send():
+        time.sleep(max(0.0, start_at - time.time()))
+        started = time.perf_counter()
+        response = client.post("/api/chat", json={"message": question})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=send) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def _worker(openai_url: str, gtts_url: str, question: str, clients: int, start_at: float, results) -> None:
+    logging.disable(logging.WARNING)
+    import gtts.tts
+    import app as app_module
+    import openai_client
+
+    for c in (openai_client.client(), openai_client.async_client()):
+        c.base_url = f"{openai_url}/v1"
+    gtts.tts._translate_url = lambda tld="com", path="": f"{gtts_url}/{path}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.extend(burst(app_module.app.test_client(), question, clients, start_at))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32, help="identical requests per burst")
+    parser.add_argument("--workers", type=int, default=4, help="processes in the multi-worker mode")
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app as app_module
+    import openai_client
+    import tts_router
+    from response_cache import response_cache
+    from singleflight import chat_flight, tts_flight
+
+    client = app_module.app.test_client()
+    print(f"{'mode':<22} {'llm calls':>10} {'tts calls':>10} {'p50':>9} {'max':>9}")
+    with openai_stub(args.llm_latency, token_delay=0) as llm, gtts_stub(args.tts_latency) as tts:
+        modes = [("off", 1), ("single-flight", 1), (f"single-flight x{args.workers}", args.workers)]
+        for index, (name, workers) in enumerate(modes):
+            response_cache.clear()
+            coalesce = name != "off"
+            openai_client.chat_flight = chat_flight if coalesce else _Uncoalesced()
+            tts_router.tts_flight = tts_flight if coalesce else _Uncoalesced()
+            # A fresh question per mode, so no mode is served from another's results
+            question = f"What did you learn from project number {index + 1}?"
+            llm_before, tts_before = llm.requests, tts.requests
+            # Spawned workers need time to import the app before the burst
+            start_at = time.time() + (1.5 * workers if workers > 1 else 0.2)
+            if workers == 1:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    latencies = burst(client, question, args.clients, start_at)
+            else:
+                context = multiprocessing.get_context("spawn")
+                with context.Manager() as manager:
+                    results = manager.list()
+                    processes = [
+                        context.Process(target=_worker, args=(llm.url, tts.url, question,
+                                                              args.clients // workers, start_at, results))
+                        for _ in range(workers)
+                    ]
+                    for process in processes:
+                        process.start()
+                    for process in processes:
+                        process.join()
+                    latencies = list(results)
+            print(
+                f"{name:<22} {llm.requests - llm_before:>10} {tts.requests - tts_before:>10} "
+                f"{statistics.median(latencies) * 1000:>7.0f}ms {max(latencies) * 1000:>7.0f}ms"
+            )
+    stats = chat_flight.stats()
+    print(f"\nin-process chat flights: {stats['leaders']} leaders, {stats['coalesced']} coalesced")
+
+
+if __name__ == "__main__":
+    main()
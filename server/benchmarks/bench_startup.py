@@ -0,0 +1,131 @@
+"""
+Time from process start to the first served request, as on a cold-starting host.
+
+Each run starts a fresh server process (the Flask app on Werkzeug's
+threaded server, or the ASGI app on uvicorn) pointed at local OpenAI and
+ElevenLabs stand-ins, then polls its port. Once the port accepts, the
+first /api/chat request is sent after ``--delay`` seconds (the time a
+host takes to route traffic to a new instance), then a second one.
+Reports, as medians over the runs: seconds from spawning the process to
+the port accepting, to the first reply arriving, that first request's own
+latency and the second request's. ElevenLabs stands in for TTS because
+gTTS's endpoint cannot be redirected from outside the process. Run from
+the server directory:
+
+    python -m benchmarks.bench_startup --runs 5 --delay 0 1 --preflight background block off
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import statistics
+import subprocess
+import time
+import urllib.request
+
+from benchmarks.stubs import ElevenLabsHandler, OpenAIHandler, StubServer
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(entry: str, port: int, elevenlabs_url: str) -> None:
+    """Run the app in this process (called in the spawned child)"""
+    import elevenlabs_tts
+
+    elevenlabs_tts.ELEVENLABS_API_URL = elevenlabs_url
+    if entry == "asgi":
+        import uvicorn
+
+        uvicorn.run("asgi:app", host="127.0.0.1", port=port, log_level="error")
+    else:
+        from werkzeug.serving import run_simple
+
+        import app
+
+        run_simple("127.0.0.1", port, app.app, threaded=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def chat(port: int, message: str) -> float:
+    """Seconds for one /api/chat request"""
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/chat", data=json.dumps({"message": message}).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Accept": "audio/mpeg"},
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def run(entry: str, preflight: str, delay: float, openai_url: str, elevenlabs_url: str) -> dict:
+    port = free_port()
+    env = dict(
+        os.environ, PREFLIGHT=preflight, OPENAI_API_KEY="stub-key", OPENAI_BASE_URL=f"{openai_url}/v1",
+        TTS_ENGINES="elevenlabs", TTS_FALLBACK_ENGINES="", ELEVENLABS_API_KEY="stub-key", VOICE_ID="stub-voice",
+        TTS_CACHE_MEMORY_MB="0", TTS_CACHE_DIR="", SINGLEFLIGHT_DIR="", RESPONSE_CACHE_MAX_ENTRIES="0",
+        RESPONSE_CACHE_SHARED_MB="0", WARMUP_ON_START="0", WARMUP_DIR="",
+    )
+    code = f"from benchmarks.bench_startup import serve; serve({entry!r}, {port}, {elevenlabs_url + '/v1'!r})"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=SERVER_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise Exception(f"{entry} server exited with {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.005)
+        listening = time.perf_counter() - started
+        time.sleep(delay)
+        # Questions unlike the canned answers, so both go to the LLM and TTS
+        first = chat(port, "Describe the tides on a planet with two moons.")
+        served = time.perf_counter() - started
+        second = chat(port, "Plan a picnic for a rainy afternoon.")
+    finally:
+        process.terminate()
+        process.wait()
+    return {"listening": listening, "served": served, "first": first, "second": second}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entry", nargs="+", default=["app", "asgi"], choices=["app", "asgi"])
+    parser.add_argument("--preflight", nargs="+", default=["background", "block", "off"],
+                        help="PREFLIGHT settings to compare")
+    parser.add_argument("--delay", type=float, nargs="+", default=[0.0, 1.0],
+                        help="seconds between the port accepting and the first request")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    llm = StubServer(OpenAIHandler, latency=0.05).start()
+    llm.token_delay = 0
+    llm.echo = False
+    tts = StubServer(ElevenLabsHandler, latency=0.05).start()
+    print(f"{'entry':<6} {'preflight':<11} {'delay':>6} {'listening':>10} {'served':>8} {'first req':>10} "
+          f"{'second req':>11}")
+    try:
+        for entry in args.entry:
+            for preflight in args.preflight:
+                for delay in args.delay:
+                    runs = [run(entry, preflight, delay, llm.url, tts.url) for _ in range(args.runs)]
+                    median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+                    print(f"{entry:<6} {preflight:<11} {delay:>5.1f}s {median['listening']:>9.2f}s "
+                          f"{median['served']:>7.2f}s {median['first'] * 1000:>8.0f}ms "
+                          f"{median['second'] * 1000:>9.0f}ms")
+    finally:
+        llm.stop()
+        tts.stop()
+
+
+if __name__ == "__main__":
+    main()
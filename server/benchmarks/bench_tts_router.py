@@ -0,0 +1,94 @@
+"""
+TTS tail latency with a throttled gTTS: gTTS alone vs. routing vs. routing with hedging.
+
+gTTS is stood in by a stub where some requests are slow or answered with
+429, as when Google rate-limits us; ElevenLabs by a steady stub. Each mode
+synthesizes the same reply sentences from several threads. Run from the
+server directory:
+
+    python -m benchmarks.bench_tts_router --requests 300 --slow-rate 0.1 --error-rate 0.05
+"""
+import os
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ.setdefault("ELEVENLABS_API_KEY", "stub-key")
+os.environ.setdefault("VOICE_ID", "stub-voice")
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import logging
+import threading
+import time
+
+import tts_router
+from benchmarks.stubs import STUB_REPLY, elevenlabs_stub, gtts_stub
+
+SENTENCES = [s.strip() + "." for s in STUB_REPLY.split(".") if s.strip()]
+
+
+def run(requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                tts_router.synthesize(f"{SENTENCES[i % len(SENTENCES)]} ({i})")
+                failed = False
+            except Exception:
+                failed = True
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                errors += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--gtts-latency", type=float, default=0.15)
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="share of gTTS requests that are throttled")
+    parser.add_argument("--slow-latency", type=float, default=1.5, help="extra seconds for a throttled request")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of gTTS requests answered 429")
+    parser.add_argument("--elevenlabs-latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    modes = [
+        ("gtts only", ["gtts"], False),
+        ("router", ["gtts", "elevenlabs"], False),
+        ("router+hedge", ["gtts", "elevenlabs"], True),
+    ]
+    with gtts_stub(args.gtts_latency, 0.03) as gtts, elevenlabs_stub(args.elevenlabs_latency, 0.03):
+        gtts.slow_rate, gtts.slow_latency, gtts.error_rate = args.slow_rate, args.slow_latency, args.error_rate
+        print(f"{'mode':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} {'fallbacks':>10} {'hedges':>7} "
+              f"{'hedge wins':>11} {'elevenlabs':>11}")
+        for name, engines, hedge in modes:
+            router = tts_router.TTSRouter(preference=engines, hedge=hedge)
+            for engine in tts_router.router._engines.values():
+                router.register(engine)
+            tts_router.router = router
+            result = run(args.requests, args.concurrency)
+            stats = router.stats()
+            print(
+                f"{name:<14} {result['p50']:>6.0f}ms {result['p95']:>6.0f}ms {result['p99']:>6.0f}ms "
+                f"{result['errors']:>7} {stats['fallbacks']:>10} {stats['hedges']:>7} {stats['hedge_wins']:>11} "
+                f"{stats['engines']['elevenlabs']['requests']:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
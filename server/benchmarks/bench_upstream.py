@@ -0,0 +1,76 @@
+"""
+Long replies in bursts against a rate-limited gTTS.
+
+The gTTS stand-in allows ``--rate`` requests per second (with a burst of
+``--burst``) and answers anything beyond that with 429 and a Retry-After,
+like the real service under load. Each round, ``--replies`` long replies
+arrive at once and their chunks are synthesized on TTS_MAX_WORKERS
+workers each. Reports the wall time, chunks delivered per second, the
+429s received, chunks missing from the replies, replies with a gap, and
+how long the first chunk of a reply took (the audio playback waits for).
+Set UPSTREAM_RATE_LIMITS=gtts=<rate> to start from a known limit instead
+of learning it from the 429s. Run from the server directory:
+
+    python -m benchmarks.bench_upstream --rate 10 --burst 5 --replies 8 --rounds 3
+"""
+import os
+
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_chunk_planner import reply
+from benchmarks.stubs import gtts_stub
+from gtts_tts import _split_text_smart, _synthesize_chunks, _synthesize_gtts_chunk
+
+
+def synthesize(chunk: str) -> bytes:
+    return _synthesize_gtts_chunk(chunk, "en", False)
+
+
+def one_reply(text: str) -> list:
+    return _synthesize_chunks(_split_text_smart(text, 100), synthesize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=10, help="requests per second the stub allows")
+    parser.add_argument("--burst", type=float, default=5, help="requests the stub allows at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency per request (s)")
+    parser.add_argument("--replies", type=int, default=8, help="replies arriving at once per round")
+    parser.add_argument("--chars", type=int, default=600, help="characters per reply")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'round':>5} {'wall':>7} {'chunks/s':>9} {'429s':>6} {'missing':>8} {'gaps':>5} "
+          f"{'first p50':>10} {'first p95':>10}")
+    with gtts_stub(args.latency) as stub:
+        stub.rate_limit = (args.rate, args.burst)
+        for round_ in range(args.rounds):
+            texts = [reply(args.chars, round_ * args.replies + i) for i in range(args.replies)]
+            rejected = stub.rejected
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.replies) as pool:
+                replies = list(pool.map(one_reply, texts))
+            wall = time.perf_counter() - started
+            delivered = sum(result.audio is not None for results in replies for result in results)
+            missing = sum(result.audio is None for results in replies for result in results)
+            gaps = sum(any(result.audio is None for result in results) for results in replies)
+            firsts = sorted(results[0].latency for results in replies)
+            p95 = firsts[min(len(firsts) - 1, int(0.95 * len(firsts)))]
+            print(f"{round_ + 1:>5} {wall:>6.2f}s {delivered / wall:>9.1f} {stub.rejected - rejected:>6} "
+                  f"{missing:>8} {gaps:>5} {statistics.median(firsts):>9.2f}s {p95:>9.2f}s")
+            # Let the stub's bucket refill between bursts
+            time.sleep(args.burst / args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+/api/chat latency for anchor questions: cold pipeline vs. precomputed answers.
+
+Uses the OpenAI and gTTS stand-ins and a temporary warm-answer directory
+built with warmup.build. Caches are disabled so the cold numbers include
+the LLM and TTS calls. Run from the server directory:
+
+    python -m benchmarks.bench_warmup --llm-latency 0.8 --tts-latency 0.3
+"""
+import os
+import tempfile
+
+_WARM_DIR = tempfile.mkdtemp(prefix="voicebot-warm-")
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ["WARMUP_ON_START"] = "0"
+os.environ["WARMUP_DIR"] = _WARM_DIR
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import contextlib
+import io
+import logging
+import shutil
+import statistics
+import time
+
+from benchmarks.stubs import gtts_stub, openai_stub
+
+
+def replay(client, questions, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        for question in questions:
+            started = time.perf_counter()
+            response = client.post("/api/chat", json={"message": question})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.get_data(as_text=True)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    import app as app_module
+    import warmup
+
+    questions = [question for question, _ in warmup.anchor_responses()]
+    client = app_module.app.test_client()
+    try:
+        with openai_stub(args.llm_latency), gtts_stub(args.tts_latency), \
+                contextlib.redirect_stdout(io.StringIO()):
+            # Cold: nothing indexed, every question goes through the LLM and TTS
+            warmup.warm_index = warmup.WarmIndex()
+            cold = replay(client, questions, args.repeat)
+
+            warmup.build(_WARM_DIR)
+            warmup.warm_index = warmup.WarmIndex()
+            warmup.load(_WARM_DIR)
+            warm = replay(client, questions, args.repeat)
+    finally:
+        shutil.rmtree(_WARM_DIR, ignore_errors=True)
+
+    print(f"{'mode':>6} {'requests':>9} {'p50':>9} {'max':>9}")
+    for name, latencies in (("cold", cold), ("warm", warm)):
+        print(f"{name:>6} {len(latencies):>9} {statistics.median(latencies) * 1000:>7.1f}ms {max(latencies) * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
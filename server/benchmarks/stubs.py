@@ -0,0 +1,298 @@
+"""
+Local stand-ins for the upstream services used by the voice pipeline.
+
+The servers run on 127.0.0.1 in a background thread and answer with fixed
+payloads after an injected delay, so benchmarks measure our own overhead and
+concurrency rather than the public internet.
+"""
+import base64
+import json
+import math
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+from urllib.parse import parse_qs
+
+# Audio returned for every synthesized chunk: 0.24s of silent MPEG-2 Layer III
+# frames (24 kHz mono 32 kbps), the same format gTTS produces
+STUB_AUDIO = (b"\xff\xf3\x44\xc4" + b"\x00" * 92) * 10
+
+# Reply returned by the OpenAI stand-in
+STUB_REPLY = (
+    "Integrative thinking. I can take chaotic data, tools, and problems, whether it's drone "
+    "vision, LLM pipelines, or voice bots, and distill it into an engineered solution that works "
+    "in the real world. That's what I did at AiRotor with YOLO on twenty thousand drone images."
+)
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load tests
+    request_queue_size = 1024
+
+
+class StubServer:
+    """
+    A threaded HTTP server with configurable latency and jitter
+
+    ``slow_rate`` of the requests take ``slow_latency`` longer and
+    ``error_rate`` of them are answered with 429, like a throttled upstream.
+    ``char_latency`` adds time per character of text, where the handler
+    reports it, and the gTTS stand-in returns ``char_audio`` seconds of
+    audio per character when set (otherwise the fixed STUB_AUDIO clip).
+    ``rate_limit`` is a (requests per second, burst) token bucket: requests
+    beyond it are answered with 429 and a Retry-After right away, where
+    the handler supports it, and counted in ``rejected``.
+    """
+
+    def __init__(self, handler_class, latency: float = 0.2, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = 0.0
+        self.slow_latency = 0.0
+        self.error_rate = 0.0
+        self.char_latency = 0.0
+        self.char_audio = 0.0
+        self.rate_limit: Optional[tuple] = None
+        self.rejected = 0
+        self._tokens: Optional[float] = None
+        self._refilled = 0.0
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), handler_class)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def delay(self, chars: int = 0) -> None:
+        """Sleep for the configured latency plus uniform jitter"""
+        with self._lock:
+            self.requests += 1
+        latency = self.latency + self.char_latency * chars + random.uniform(-self.jitter, self.jitter)
+        if random.random() < self.slow_rate:
+            latency += self.slow_latency
+        time.sleep(max(0.0, latency))
+
+    def throttled(self) -> bool:
+        return random.random() < self.error_rate
+
+    def rate_limited(self) -> Optional[int]:
+        """Seconds for the Retry-After of a request over ``rate_limit``; None if it is allowed"""
+        if not self.rate_limit:
+            return None
+        rate, burst = self.rate_limit
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens = burst
+            self._tokens = min(burst, self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            self.rejected += 1
+            return max(1, math.ceil((1 - self._tokens) / rate))
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs add ~40 ms to every request on a kept-alive connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.stub.connected()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class GTTSHandler(_QuietHandler):
+    """Answers the translate batchexecute RPC the way gTTS expects"""
+
+    def do_POST(self):
+        text = self._text(self._read_body())
+        stub = self.server.stub
+        retry_after = stub.rate_limited()
+        if retry_after is not None:
+            self._send(429, b"Too Many Requests", "text/plain", {"Retry-After": str(retry_after)})
+            return
+        stub.delay(len(text))
+        if stub.throttled():
+            self._send(429, b"Too Many Requests", "text/plain")
+            return
+        clip = STUB_AUDIO
+        if stub.char_audio:
+            # STUB_AUDIO is ten 24 ms frames
+            clip = STUB_AUDIO[:96] * max(1, round(len(text) * stub.char_audio / 0.024))
+        audio = base64.b64encode(clip).decode("ascii")
+        body = (
+            ")]}'\n\n"
+            f'[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'
+        ).encode("utf-8")
+        self._send(200, body, "application/json; charset=utf-8")
+
+    @staticmethod
+    def _text(body: bytes) -> str:
+        """The text to speak, from the form-encoded ``f.req`` RPC payload"""
+        try:
+            rpc = json.loads(parse_qs(body.decode("utf-8"))["f.req"][0])
+            return json.loads(rpc[0][0][1])[0]
+        except (KeyError, IndexError, TypeError, ValueError):
+            return ""
+
+
+class OpenAIHandler(_QuietHandler):
+    """Answers /v1/chat/completions, streamed (SSE) or not"""
+
+    def _reply(self, request: dict) -> str:
+        """STUB_REPLY, opened with the user's question when the stub echoes"""
+        if not self.server.stub.echo:
+            return STUB_REPLY
+        question = next((m["content"] for m in reversed(request.get("messages", [])) if m.get("role") == "user"), "")
+        return f"You asked: {question} {STUB_REPLY}"
+
+    def do_POST(self):
+        request = json.loads(self._read_body() or b"{}")
+        stub = self.server.stub
+        stub.delay()
+        reply = self._reply(request)
+        if not request.get("stream"):
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self._send(200, body, "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            delta = word if i == 0 else " " + word
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(stub.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class ElevenLabsHandler(_QuietHandler):
+    """Answers /v1/text-to-speech/<voice_id> with MP3 bytes"""
+
+    def do_POST(self):
+        self._read_body()
+        retry_after = self.server.stub.rate_limited()
+        if retry_after is not None:
+            self._send(429, b'{"detail": "too_many_concurrent_requests"}', "application/json",
+                       {"Retry-After": str(retry_after)})
+            return
+        self.server.stub.delay()
+        if self.server.stub.throttled():
+            self._send(429, b'{"detail": "too_many_concurrent_requests"}', "application/json")
+            return
+        self._send(200, STUB_AUDIO, "audio/mpeg")
+
+
+@contextmanager
+def openai_stub(latency: float = 0.5, jitter: float = 0.0, token_delay: float = 0.01,
+                echo: bool = False) -> Iterator[StubServer]:
+    """Run an OpenAI stand-in and point the shared clients in openai_client at it; ``echo`` varies the reply"""
+    import openai_client
+
+    server = StubServer(OpenAIHandler, latency, jitter).start()
+    server.token_delay = token_delay
+    server.echo = echo
+    clients = (openai_client.client(), openai_client.async_client())
+    originals = [c.base_url for c in clients]
+    for c in clients:
+        c.base_url = f"{server.url}/v1"
+    try:
+        yield server
+    finally:
+        for c, original in zip(clients, originals):
+            c.base_url = original
+        server.stop()
+
+
+@contextmanager
+def gtts_stub(latency: float = 0.2, jitter: float = 0.0) -> Iterator[StubServer]:
+    """Run a gTTS stand-in and point the gtts library at it"""
+    import gtts.tts
+
+    server = StubServer(GTTSHandler, latency, jitter).start()
+    original = gtts.tts._translate_url
+    gtts.tts._translate_url = lambda tld="com", path="": f"{server.url}/{path}"
+    try:
+        yield server
+    finally:
+        gtts.tts._translate_url = original
+        server.stop()
+
+
+@contextmanager
+def elevenlabs_stub(latency: float = 0.3, jitter: float = 0.0) -> Iterator[StubServer]:
+    """Run an ElevenLabs stand-in and point elevenlabs_tts at it"""
+    import elevenlabs_tts
+
+    server = StubServer(ElevenLabsHandler, latency, jitter).start()
+    original = elevenlabs_tts.ELEVENLABS_API_URL
+    elevenlabs_tts.ELEVENLABS_API_URL = f"{server.url}/v1"
+    try:
+        yield server
+    finally:
+        elevenlabs_tts.ELEVENLABS_API_URL = original
+        server.stop()
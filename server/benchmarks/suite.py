@@ -0,0 +1,266 @@
+"""
+Offline benchmark suite for the whole voice pipeline.
+
+Runs /api/chat, google_tts, elevenlabs_tts, _split_text_smart and
+_concatenate_audio_segments against the local OpenAI, gTTS and ElevenLabs
+stand-ins, with injected latency and jitter. Caches and warm-up are
+disabled so every call does the full work. Each case runs in its own
+process so its peak RSS is its own. Results are written as sorted,
+rounded JSON, so two runs can be diffed or compared:
+
+    python -m benchmarks.suite --concurrency 1 8 32 --out results.json
+    python -m benchmarks.suite --concurrency 1 8 32 --compare results.json
+
+With --compare, the run exits non-zero if p95 latency or throughput of any
+case is worse than the baseline by more than --tolerance (and by at least a
+millisecond, so sub-millisecond cases do not flag timer noise).
+"""
+import os
+
+# Every call must do the full work, and the OpenAI client needs some key
+os.environ["TTS_CACHE_MEMORY_MB"] = "0"
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+os.environ["WARMUP_ON_START"] = "0"
+os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from typing import Callable, Dict, List
+
+from benchmarks.stubs import STUB_AUDIO, STUB_REPLY, elevenlabs_stub, gtts_stub, openai_stub
+
+# Not an anchor question, so /api/chat goes through the LLM and TTS
+QUESTION = "What did you build at AiRotor?"
+LONG_TEXT = " ".join([STUB_REPLY] * 8)
+CONCAT_SEGMENTS = 20
+# Latency changes smaller than this are timer noise, not regressions
+NOISE_FLOOR_MS = 1.0
+
+# Stand-ins each case needs, and whether it is worth running concurrently
+CASES = {
+    "api_chat": {"stubs": ("openai", "gtts"), "concurrent": True},
+    "google_tts": {"stubs": ("gtts",), "concurrent": True},
+    "elevenlabs_tts": {"stubs": ("elevenlabs",), "concurrent": True},
+    "split_text": {"stubs": (), "concurrent": False},
+    "concat_audio": {"stubs": (), "concurrent": False},
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_concurrent(call: Callable[[], None], concurrency: int, requests_per_client: int) -> dict:
+    """Call ``call`` from ``concurrency`` threads; return latency percentiles and throughput"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            try:
+                call()
+                failed = False
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def _case_call(name: str) -> Callable[[], None]:
+    """The operation one request of a case performs"""
+    if name == "api_chat":
+        import app as app_module
+
+        local = threading.local()
+
+        def call():
+            if not hasattr(local, "client"):
+                local.client = app_module.app.test_client()
+            response = local.client.post("/api/chat", json={"message": QUESTION})
+            if response.status_code != 200:
+                raise Exception(f"/api/chat returned {response.status_code}")
+        return call
+
+    if name == "google_tts":
+        from gtts_tts import google_tts
+        return lambda: google_tts(LONG_TEXT)
+
+    if name == "elevenlabs_tts":
+        from elevenlabs_tts import elevenlabs_tts
+        return lambda: elevenlabs_tts(STUB_REPLY)
+
+    if name == "split_text":
+        from gtts_tts import _clean_text, _split_text_smart
+        text = _clean_text(LONG_TEXT)
+        return lambda: _split_text_smart(text, max_length=100)
+
+    if name == "concat_audio":
+        from gtts_tts import _concatenate_audio_segments
+        segments = [STUB_AUDIO] * CONCAT_SEGMENTS
+        return lambda: _concatenate_audio_segments(segments)
+
+    raise Exception(f"Unknown benchmark case: {name}")
+
+
+def run_case(name: str, settings: dict) -> Dict[str, dict]:
+    """Run one case at every concurrency level inside the current process"""
+    logging.disable(logging.WARNING)
+    stubs = {
+        "openai": lambda: openai_stub(settings["llm_latency"], settings["jitter"]),
+        "gtts": lambda: gtts_stub(settings["tts_latency"], settings["jitter"]),
+        "elevenlabs": lambda: elevenlabs_stub(settings["tts_latency"], settings["jitter"]),
+    }
+    case = CASES[name]
+    levels = settings["concurrency"] if case["concurrent"] else [1]
+    requests_per_client = settings["requests"] if case["concurrent"] else settings["iterations"]
+
+    results = {}
+    with ExitStack() as stack:
+        for stub in case["stubs"]:
+            stack.enter_context(stubs[stub]())
+        call = _case_call(name)
+        call()  # warm imports and connections
+        for concurrency in levels:
+            result = run_concurrent(call, concurrency, requests_per_client)
+            result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            results[f"{name}@{concurrency}"] = result
+    return results
+
+
+def _run_case_in_child(name: str, settings: dict, queue) -> None:
+    queue.put(run_case(name, settings))
+
+
+def run_isolated(name: str, settings: dict) -> Dict[str, dict]:
+    """Run a case in a fresh process so peak RSS is not shared between cases"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_case_in_child, args=(name, settings, queue))
+    process.start()
+    results = queue.get()
+    process.join()
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Print changes against a baseline run; return the keys that regressed"""
+    regressions = []
+    print(f"\n{'case':<22} {'p95 before':>11} {'p95 now':>10} {'change':>8} {'rps change':>11}")
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        p95_change = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_change = result["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        slower_ms = max(result["p50_ms"] - before["p50_ms"], result["p95_ms"] - before["p95_ms"])
+        regressed = (p95_change > tolerance or rps_change < -tolerance) and slower_ms >= NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(key)
+        print(
+            f"{key:<22} {before['p95_ms']:>9.1f}ms {result['p95_ms']:>8.1f}ms {p95_change:>+7.0%} "
+            f"{rps_change:>+10.0%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=4, help="requests per client for I/O-bound cases")
+    parser.add_argument("--iterations", type=int, default=200, help="calls for CPU-bound cases")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tts-latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON file from a previous --out")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    settings = {
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "iterations": args.iterations,
+        "llm_latency": args.llm_latency,
+        "tts_latency": args.tts_latency,
+        "jitter": args.jitter,
+    }
+
+    results = {}
+    print(f"{'case':<22} {'reqs':>6} {'errors':>7} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'peak RSS':>9}")
+    for name in args.cases:
+        for key, result in run_isolated(name, settings).items():
+            results[key] = result
+            print(
+                f"{key:<22} {result['requests']:>6} {result['errors']:>7} {result['throughput_rps']:>9.1f} "
+                f"{result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms "
+                f"{result['peak_rss_mb']:>7.1f}MB"
+            )
+
+    if args.out:
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "settings": settings,
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
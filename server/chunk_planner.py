@@ -0,0 +1,297 @@
+"""
+Chunk sizes for long-text TTS, chosen from measured backend costs.
+
+Every TTS request costs a fixed overhead (connection, queueing, model
+start-up) plus time per character. Each backend's recent requests are
+fitted to ``seconds = fixed + per_char * chars``, and long text is split
+into the chunks that the model predicts will finish first on
+TTS_MAX_WORKERS parallel workers: few large chunks when the fixed cost
+dominates, more and smaller ones when characters do. Until a backend has
+enough measurements, its prior (below) is used.
+
+Candidate chunk lengths come from a fixed ladder (CHUNK_SIZES), and a
+backend keeps the length it last chose for texts of about the same length
+unless another is predicted to be clearly faster (TTS_PLAN_STICKINESS). A reply is then split the same way from
+one request to the next while the fitted costs drift, so its chunks keep
+hitting the per-chunk TTS cache and coalesce with identical chunks of
+other replies. The price is a plan up to one ladder step (and that margin)
+away from the best the current model would pick.
+
+Streamed replies start with a small first chunk, so the first audio plays
+sooner, sized so that it keeps playing while the next, larger chunk is
+synthesized.
+
+Each plan's predicted duration is kept next to the measured one; both are
+logged, exported on /metrics and, for the current request, added to the
+Server-Timing header as ``tts_predicted``.
+"""
+import math
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Tuple
+
+from config import (LOCAL_TTS_CONCURRENCY, SPEECH_WORDS_PER_MINUTE, TTS_ADAPTIVE_CHUNKS, TTS_MAX_WORKERS,
+                    TTS_PLAN_STICKINESS, TTS_PLAN_WINDOW)
+from metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+# Longest text per request each backend accepts (gTTS splits longer text into
+# sequential requests itself; Google Cloud rejects more than 5000 characters)
+LIMITS = {"gtts": 100, "google_cloud": 4500}
+DEFAULT_LIMIT = 1000
+# Chunk length of streamed replies when planning is off, whatever the engine
+FIXED_STREAM_LENGTH = 100
+# Requests a backend serves at once, when fewer than TTS_MAX_WORKERS
+PARALLELISM = {"piper": max(1, LOCAL_TTS_CONCURRENCY), "espeak": max(1, LOCAL_TTS_CONCURRENCY)}
+# (fixed seconds, seconds per character) assumed until measured
+PRIORS = {
+    "gtts": (0.25, 0.002),
+    "google_cloud": (0.3, 0.0003),
+    "elevenlabs": (0.4, 0.001),
+    "piper": (0.05, 0.003),
+    "espeak": (0.02, 0.0002),
+}
+DEFAULT_PRIOR = (0.3, 0.001)
+# Shorter chunks sound choppy and cost a request each
+MIN_CHUNK = 40
+# Maximum chunk lengths the planner chooses from (plus each backend's limit);
+# fixed so the same text is split at the same places while the costs drift
+CHUNK_SIZES = (40, 60, 100, 150, 250, 400, 600, 1000, 1500, 2500, 4000)
+MIN_FIRST_CHUNK = 30
+# Measurements, and spread of their lengths, needed before fitting
+MIN_SAMPLES = 8
+MIN_CHAR_SPREAD = 10.0
+# Characters spoken per second (about six per word, space included)
+SPEECH_CHARS_PER_SECOND = SPEECH_WORDS_PER_MINUTE * 6 / 60
+
+
+class CostModel:
+    """Least-squares fit of request latency against text length over a moving window"""
+
+    def __init__(self, prior: Tuple[float, float], window: int = TTS_PLAN_WINDOW):
+        self.prior = prior
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def observe(self, chars: int, seconds: float) -> None:
+        with self._lock:
+            self._samples.append((chars, seconds))
+
+    def estimate(self) -> Tuple[float, float]:
+        """(fixed seconds, seconds per character)"""
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return self.prior
+        n = len(samples)
+        mean_chars = sum(c for c, _ in samples) / n
+        mean_seconds = sum(s for _, s in samples) / n
+        spread = sum((c - mean_chars) ** 2 for c, _ in samples)
+        if spread / n < MIN_CHAR_SPREAD ** 2:
+            # All requests about the same length: keep the prior's slope
+            per_char = self.prior[1]
+        else:
+            per_char = sum((c - mean_chars) * (s - mean_seconds) for c, s in samples) / spread
+            per_char = max(0.0, per_char)
+        return max(0.0, mean_seconds - per_char * mean_chars), per_char
+
+    def predict(self, chars: int) -> float:
+        fixed, per_char = self.estimate()
+        return fixed + per_char * chars
+
+    @property
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class ChunkPlan(NamedTuple):
+    """How a text is split for one backend, and how long that should take"""
+    backend: str
+    max_length: int
+    first_length: int
+    chunks: List[str]
+    workers: int
+    predicted: float
+    predicted_first: float
+
+
+def schedule(durations: List[float], workers: int) -> Tuple[float, float]:
+    """
+    Completion time of jobs run in order on a pool of workers
+
+    Returns:
+        Tuple[float, float]: Seconds until all jobs and until the first job are done
+    """
+    if not durations:
+        return 0.0, 0.0
+    free = [0.0] * max(1, min(workers, len(durations)))
+    finished = 0.0
+    for duration in durations:
+        slot = free.index(min(free))
+        free[slot] += duration
+        finished = max(finished, free[slot])
+    return finished, durations[0]
+
+
+class ChunkPlanner:
+    """Cost models per backend, and the chunk plans made from them"""
+
+    def __init__(self, enabled: bool = TTS_ADAPTIVE_CHUNKS, stickiness: float = TTS_PLAN_STICKINESS):
+        self.enabled = enabled
+        self.stickiness = stickiness
+        self._lock = threading.Lock()
+        self._models: Dict[str, CostModel] = {}
+        self._outcomes: Dict[str, List[float]] = {}
+        self._last: Dict[str, ChunkPlan] = {}
+        # Chunk length last chosen per (backend, text length band)
+        self._kept: Dict[Tuple[str, int], int] = {}
+
+    def model(self, backend: str) -> CostModel:
+        with self._lock:
+            model = self._models.get(backend)
+            if model is None:
+                model = self._models[backend] = CostModel(PRIORS.get(backend, DEFAULT_PRIOR))
+            return model
+
+    def observe(self, backend: str, chars: int, seconds: float) -> None:
+        self.model(backend).observe(chars, seconds)
+
+    @contextmanager
+    def measure(self, backend: str, chars: int) -> Iterator[None]:
+        """Time one upstream request; failed requests are not recorded"""
+        started = time.perf_counter()
+        yield
+        self.observe(backend, chars, time.perf_counter() - started)
+
+    def plan(self, backend: str, text: str, split: Callable[[str, int], List[str]],
+             workers: int = TTS_MAX_WORKERS) -> ChunkPlan:
+        """
+        Split text for a backend into the chunks predicted to finish first
+
+        Args:
+            backend (str): Backend name (gtts, google_cloud, ...)
+            text (str): Cleaned text to synthesize
+            split (Callable[[str, int], List[str]]): Splits text at a maximum chunk length
+            workers (int): Chunks synthesized at once (capped at what the backend can serve)
+
+        Returns:
+            ChunkPlan: The chosen split and its predicted latency
+        """
+        limit = LIMITS.get(backend, DEFAULT_LIMIT)
+        model = self.model(backend)
+        workers = min(workers, PARALLELISM.get(backend, workers))
+        if not self.enabled:
+            return self._make_plan(backend, model, split(text, limit), limit, workers)
+
+        band = (backend, bisect.bisect_left(CHUNK_SIZES, len(text)))
+        with self._lock:
+            last = self._kept.get(band)
+        best = kept = None
+        for max_length in self._candidate_lengths(len(text), limit, workers):
+            plan = self._make_plan(backend, model, split(text, max_length), max_length, workers)
+            # Ties go to fewer chunks: the same latency for fewer upstream requests
+            if best is None or (plan.predicted, len(plan.chunks)) < (best.predicted, len(best.chunks)):
+                best = plan
+            if max_length == last:
+                kept = plan
+        if kept is not None and kept.predicted <= best.predicted * (1 + self.stickiness):
+            best = kept
+        with self._lock:
+            self._last[backend] = best
+            self._kept[band] = best.max_length
+        return best
+
+    @staticmethod
+    def _candidate_lengths(length: int, limit: int, workers: int) -> List[int]:
+        """The limit, plus the CHUNK_SIZES below it that split the text into 2..2*workers chunks"""
+        candidates = {limit}
+        for size in CHUNK_SIZES:
+            if MIN_CHUNK <= size < min(limit, length) and math.ceil(length / size) <= 2 * max(1, workers):
+                candidates.add(size)
+        return sorted(candidates, reverse=True)
+
+    def _make_plan(self, backend: str, model: CostModel, chunks: List[str], max_length: int,
+                   workers: int) -> ChunkPlan:
+        predicted, first = schedule([model.predict(len(chunk)) for chunk in chunks], workers)
+        return ChunkPlan(backend, max_length, max_length, chunks, workers, predicted, first)
+
+    def stream_lengths(self, backend: str, expected_length: int,
+                       workers: int = TTS_MAX_WORKERS) -> Tuple[int, int]:
+        """
+        (first chunk, later chunks) maximum lengths for a reply streamed to TTS
+
+        Later chunks use the length a reply of ``expected_length`` characters
+        would be planned with. The first chunk is as short as it can be while
+        its audio still lasts until the next chunk has been synthesized.
+        """
+        if not self.enabled:
+            return FIXED_STREAM_LENGTH, FIXED_STREAM_LENGTH
+        limit = LIMITS.get(backend, DEFAULT_LIMIT)
+        model = self.model(backend)
+        workers = min(workers, PARALLELISM.get(backend, workers))
+        best_length, best_time = limit, None
+        for max_length in self._candidate_lengths(expected_length, limit, workers):
+            size = min(max_length, expected_length)
+            count = math.ceil(expected_length / size)
+            predicted, _ = schedule([model.predict(size)] * count, workers)
+            if best_time is None or predicted < best_time:
+                best_length, best_time = max_length, predicted
+        next_chunk = model.predict(min(best_length, expected_length))
+        first = math.ceil(next_chunk * SPEECH_CHARS_PER_SECOND)
+        return max(MIN_FIRST_CHUNK, min(first, best_length)), best_length
+
+    def record(self, plan: ChunkPlan, actual: float) -> None:
+        """Keep a plan's measured latency next to its prediction"""
+        logger.info(
+            f"TTS plan {plan.backend}: {len(plan.chunks)} chunks of <= {plan.max_length} chars "
+            f"on {plan.workers} workers, predicted {plan.predicted:.3f}s, took {actual:.3f}s"
+        )
+        with self._lock:
+            outcome = self._outcomes.setdefault(plan.backend, [0, 0.0, 0.0])
+            outcome[0] += 1
+            outcome[1] += plan.predicted
+            outcome[2] += actual
+        timing = current_request()
+        if timing is not None:
+            timing.add_span("tts_predicted", plan.predicted)
+
+    def stats(self) -> dict:
+        """Fitted costs, the last plan and predicted vs. actual seconds per backend"""
+        with self._lock:
+            backends = set(self._models) | set(self._outcomes)
+            outcomes = {name: list(values) for name, values in self._outcomes.items()}
+            last = dict(self._last)
+        result = {}
+        for name in sorted(backends):
+            fixed, per_char = self.model(name).estimate()
+            plans, predicted, actual = outcomes.get(name, (0, 0.0, 0.0))
+            plan = last.get(name)
+            result[name] = {
+                "fixed_seconds": fixed,
+                "char_seconds": per_char,
+                "samples": self.model(name).samples,
+                "plans": plans,
+                "predicted_seconds": predicted,
+                "actual_seconds": actual,
+                "last_plan": None if plan is None else {
+                    "chunks": len(plan.chunks),
+                    "max_length": plan.max_length,
+                    "workers": plan.workers,
+                    "predicted": plan.predicted,
+                },
+            }
+        return result
+
+
+planner = ChunkPlanner()
+
+
+def measure(backend: str, chars: int):
+    """Context manager timing one upstream TTS request for the backend's cost model"""
+    return planner.measure(backend, chars)
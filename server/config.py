@@ -1,7 +1,143 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 VOICE_ID = os.getenv("VOICE_ID")  # You can change to "Domi", "Bella", etc.
+
+# Long-text TTS: number of chunks synthesized concurrently
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+
+# Chunk sizes planned from measured per-request and per-character TTS
+# latency (0 keeps fixed sizes: 100 characters for gTTS, 4500 for Google
+# Cloud), the number of recent requests per backend the model is fitted to, and
+# how much faster (0.25 = 25%) another chunk length must be predicted to be
+# before a backend stops splitting texts of a given length the way it did
+# last time (stable splits keep hitting the per-chunk TTS cache)
+TTS_ADAPTIVE_CHUNKS = os.getenv("TTS_ADAPTIVE_CHUNKS", "1") == "1"
+TTS_PLAN_WINDOW = int(os.getenv("TTS_PLAN_WINDOW", "100"))
+TTS_PLAN_STICKINESS = float(os.getenv("TTS_PLAN_STICKINESS", "0.25"))
+
+# TTS audio cache: per-process in-memory LRU tier and an on-disk tier shared
+# by all worker processes (set TTS_CACHE_DIR="" to disable disk). The
+# directory also holds the shared copy of the LLM reply cache
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "voicebot-tts-cache"))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", "256"))
+
+# Reply audio formats (see audio_profiles.py): the profile used when the
+# client names none, the mono MP3 and Opus voice bitrates (kbps; MP3 audio
+# already at or below AUDIO_MP3_BITRATE is sent as is) and the raw PCM rate
+AUDIO_DEFAULT_PROFILE = os.getenv("AUDIO_DEFAULT_PROFILE", "mp3")
+AUDIO_MP3_BITRATE = int(os.getenv("AUDIO_MP3_BITRATE", "32"))
+AUDIO_OPUS_BITRATE = int(os.getenv("AUDIO_OPUS_BITRATE", "16"))
+AUDIO_PCM_RATE = int(os.getenv("AUDIO_PCM_RATE", "24000"))
+
+# Upstream scheduling (see upstream.py): requests per second per provider,
+# as "provider=rate" or "provider=rate/burst" (unlisted providers have no
+# fixed limit; every provider's rate is lowered by 429s), calls in flight at
+# once across all providers (0 = no limit), and retries of rate-limited or
+# failed calls with jittered exponential backoff (base and cap in seconds)
+# within UPSTREAM_RETRY_DEADLINE seconds. TTS_CHUNK_RETRIES is the old name
+# of UPSTREAM_RETRIES
+UPSTREAM_RATE_LIMITS = {
+    provider.strip(): tuple(float(part) for part in limit.split("/"))
+    for provider, _, limit in (item.partition("=") for item in os.getenv("UPSTREAM_RATE_LIMITS", "").split(","))
+    if provider.strip() and limit.strip()
+}
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "64"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", os.getenv("TTS_CHUNK_RETRIES", "4")))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "5"))
+UPSTREAM_RETRY_DEADLINE = float(os.getenv("UPSTREAM_RETRY_DEADLINE", "20"))
+
+# Upstream HTTP clients: timeouts (seconds; the connect timeout also bounds
+# the wait for a free pooled connection) and kept-alive connections per host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "16"))
+HTTP_ASYNC_POOL_PER_HOST = int(os.getenv("HTTP_ASYNC_POOL_PER_HOST", "100"))
+
+# LLM reply cache keyed on the normalized question (0 entries disables it;
+# similarity is character-trigram Jaccard, 1.0 means exact matches only; below
+# 1.0, near-duplicates must still have the same content words, numbers and
+# negations) and the size of its copy shared by worker processes (0 keeps it
+# per process)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "1.0"))
+RESPONSE_CACHE_SHARED_MB = float(os.getenv("RESPONSE_CACHE_SHARED_MB", "4"))
+
+# Precomputed anchor answers: directory written by `python warmup.py`, and
+# whether to synthesize missing ones in the background at server start
+WARMUP_DIR = os.getenv("WARMUP_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_answers"))
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
+# When provider libraries, clients and voice models are loaded (see
+# startup.py): "background" in a thread once the app is imported, "block"
+# before the import returns, "off" by the first request that needs each
+PREFLIGHT = os.getenv("PREFLIGHT", "background")
+
+
+# Reply length for voice: target speaking time per answer (0 disables the
+# target) and the speaking rate used to turn it into a word budget
+ANSWER_SPEAK_SECONDS = float(os.getenv("ANSWER_SPEAK_SECONDS", "25"))
+SPEECH_WORDS_PER_MINUTE = float(os.getenv("SPEECH_WORDS_PER_MINUTE", "160"))
+
+# Conversation sessions (requests with a session_id): verbatim turns kept per
+# session and their token budget before older turns are summarized, summary
+# length, idle expiry (seconds), caps across all sessions (0 disables
+# sessions) and the size of their copy shared by worker processes in
+# TTS_CACHE_DIR (0 keeps them per process, so follow-up turns need sticky
+# routing to one worker)
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "600"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "200"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_STORE_MB = float(os.getenv("SESSION_STORE_MB", "32"))
+SESSION_SHARED_MB = float(os.getenv("SESSION_SHARED_MB", "32"))
+
+# TTS engines in order of preference (gtts, google_cloud, elevenlabs, piper,
+# espeak; unavailable ones are skipped), last-resort engines tried in order
+# only when every TTS_ENGINES engine fails or is cooling down (never chosen
+# for being fast), latency/error window per engine and the age (seconds) past
+# which its samples no longer count, how much faster (0.2 = 20%) an engine
+# must be to go ahead of one listed before it, seconds after which an engine
+# that served no request is sent the next one to measure it again,
+# consecutive failures before an engine is skipped for TTS_ROUTER_COOLDOWN
+# seconds, and whether to hedge requests slower than the engine's
+# TTS_HEDGE_QUANTILE latency on a second engine
+TTS_ENGINES = [name.strip() for name in os.getenv("TTS_ENGINES", "gtts,google_cloud,elevenlabs").split(",") if name.strip()]
+TTS_FALLBACK_ENGINES = [name.strip() for name in os.getenv("TTS_FALLBACK_ENGINES", "piper,espeak").split(",") if name.strip()]
+TTS_ROUTER_WINDOW = int(os.getenv("TTS_ROUTER_WINDOW", "50"))
+TTS_ROUTER_MAX_AGE = float(os.getenv("TTS_ROUTER_MAX_AGE", "300"))
+TTS_ROUTER_MARGIN = float(os.getenv("TTS_ROUTER_MARGIN", "0.2"))
+TTS_ROUTER_PROBE_SECONDS = float(os.getenv("TTS_ROUTER_PROBE_SECONDS", "60"))
+TTS_ROUTER_FAILURES = int(os.getenv("TTS_ROUTER_FAILURES", "3"))
+TTS_ROUTER_COOLDOWN = float(os.getenv("TTS_ROUTER_COOLDOWN", "30"))
+TTS_HEDGE = os.getenv("TTS_HEDGE", "0") == "1"
+TTS_HEDGE_QUANTILE = float(os.getenv("TTS_HEDGE_QUANTILE", "0.95"))
+
+# Local TTS: Piper voice model (.onnx, with its .onnx.json alongside; empty
+# disables Piper) and speed (< 1 is faster), espeak-ng voice, MP3 bitrate
+# (kbps) and sentences synthesized at once on the CPU
+PIPER_MODEL = os.getenv("PIPER_MODEL", "")
+PIPER_LENGTH_SCALE = float(os.getenv("PIPER_LENGTH_SCALE", "0.9"))
+ESPEAK_VOICE = os.getenv("ESPEAK_VOICE", "en-us")
+LOCAL_TTS_BITRATE = int(os.getenv("LOCAL_TTS_BITRATE", "48"))
+LOCAL_TTS_CONCURRENCY = int(os.getenv("LOCAL_TTS_CONCURRENCY", "1"))
+
+# Identical concurrent chat and TTS requests share one upstream call. Workers
+# of the same server coordinate through files in SINGLEFLIGHT_DIR (empty
+# coalesces within each process only) and wait up to SINGLEFLIGHT_WAIT seconds
+# for another worker's call
+SINGLEFLIGHT_DIR = os.getenv("SINGLEFLIGHT_DIR", os.path.join(tempfile.gettempdir(), "voicebot-flights"))
+SINGLEFLIGHT_WAIT = float(os.getenv("SINGLEFLIGHT_WAIT", "30"))
+
+# Batch answering (/api/chat/batch, batch.py): LLM and TTS calls in flight
+# at once per batch, and the most questions one batch may hold
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
@@ -1,10 +1,39 @@
 import io
-import requests
 import uuid
+from chunk_planner import measure
 from config import ELEVENLABS_API_KEY, VOICE_ID
+from gtts_tts import _clean_text
+from http_clients import async_client, session
+from metrics import span
+from tts_cache import cached_audio, cached_audio_async
+from upstream import UpstreamError, call, call_async, retry_after
+
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75
+}
+
+def cache_params():
+    """Everything besides the text that changes ElevenLabs audio"""
+    return dict(voice_id=VOICE_ID, rate="fast", **VOICE_SETTINGS)
 
 def elevenlabs_tts(text):
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
+    with span("tts"):
+        return cached_audio(
+            "elevenlabs", _clean_text(text), lambda: _generate_elevenlabs_tts(text), **cache_params()
+        )
+
+async def elevenlabs_tts_async(text):
+    """Async version of elevenlabs_tts for the ASGI app"""
+    with span("tts"):
+        return await cached_audio_async(
+            "elevenlabs", _clean_text(text), lambda: _generate_elevenlabs_tts_async(text), **cache_params()
+        )
+
+def _elevenlabs_request(text):
+    url = f"{ELEVENLABS_API_URL}/text-to-speech/{VOICE_ID}"
     headers = {
         "xi-api-key": ELEVENLABS_API_KEY,
         "Content-Type": "application/json"
@@ -12,18 +41,42 @@ def elevenlabs_tts(text):
     text = f"<speak><prosody rate='fast'>{text}</prosody></speak>"
     payload = {
         "text" : text,
-        "voice_settings":{
-            "stability": 0.5,
-            "similarity_boost": 0.75
-        }
+        "voice_settings": VOICE_SETTINGS
     }
+    return url, headers, payload
+
+def _elevenlabs_error(response):
+    """An error the upstream scheduler can retry (429, 5xx) after the Retry-After it carries"""
+    return UpstreamError(
+        f"ElevenLabs TTS API error: {response.status_code} — {response.text}",
+        response.status_code, retry_after(response.headers)
+    )
+
+async def _generate_elevenlabs_tts_async(text):
+    return await call_async("elevenlabs", lambda: _request_elevenlabs_tts_async(text))
+
+async def _request_elevenlabs_tts_async(text):
+    url, headers, payload = _elevenlabs_request(text)
+    # Only successful responses count towards the latency model
+    with measure("elevenlabs", len(text)):
+        response = await async_client().post(url, headers=headers, json=payload)
+        if response.status_code == 200:
+            return io.BytesIO(response.content)
+        raise _elevenlabs_error(response)
+
+def _generate_elevenlabs_tts(text):
+    return call("elevenlabs", lambda: _request_elevenlabs_tts(text))
+
+def _request_elevenlabs_tts(text):
+    url, headers, payload = _elevenlabs_request(text)
 
-    response = requests.post(url,headers=headers,json=payload)
-    if response.status_code == 200:
-        return io.BytesIO(response.content)
-        # filename = f"audio_{uuid.uuid4()}.mp3"
-        # with open(filename,"wb") as f:
-        #     f.write(response.content)
-        # return filename
-    else:
-        raise Exception(f"ElevenLabs TTS API error: {response.status_code} — {response.text}")
\ No newline at end of file
+    with measure("elevenlabs", len(text)):
+        response = session().post(url,headers=headers,json=payload)
+        if response.status_code == 200:
+            return io.BytesIO(response.content)
+            # filename = f"audio_{uuid.uuid4()}.mp3"
+            # with open(filename,"wb") as f:
+            #     f.write(response.content)
+            # return filename
+        else:
+            raise _elevenlabs_error(response)
\ No newline at end of file
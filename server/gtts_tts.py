@@ -1,8 +1,24 @@
 import io
 import os
 import re
+import time
+import base64
+import asyncio
 import logging
-from typing import Optional, List
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, NamedTuple, Optional, List
+
+from chunk_planner import ChunkPlan, measure, planner
+from config import AUDIO_MP3_BITRATE, TTS_MAX_WORKERS
+from http_clients import async_client, cloud_tts_client, session
+from metrics import record_bytes, span
+from audio_buffer import SegmentBuffer
+from mp3_frames import join_mp3
+from singleflight import tts_flight
+from tts_cache import TTSCache, cached_audio, cached_audio_async, tts_cache
+import providers
+import upstream
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,7 +40,7 @@ def google_tts(text: str, lang: str = 'en', slow: bool = False) -> io.BytesIO:
         Exception: If TTS generation fails
     """
     try:
-        from gtts import gTTS
+        providers.load("gtts")
     except ImportError:
         raise Exception("gTTS not installed. Install with: pip install gtts")
     
@@ -34,23 +50,25 @@ def google_tts(text: str, lang: str = 'en', slow: bool = False) -> io.BytesIO:
         raise Exception("Empty text provided for TTS")
     
     try:
-        # Check if text is short enough for single request
-        if len(text) <= 100:
-            logger.info(f"Generating Google TTS for short text: '{text[:50]}...'")
-            tts = gTTS(text=text, lang=lang, slow=slow)
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            return audio_buffer
-        
-        # Handle long text with chunking
-        logger.info(f"Generating Google TTS for long text ({len(text)} characters)")
-        return _generate_long_text_tts(text, lang, slow)
+        with span("tts"):
+            audio_buffer = cached_audio("gtts", text, lambda: _generate_google_tts(text, lang, slow), lang=lang, slow=slow)
+        record_bytes("tts", audio_buffer.getbuffer().nbytes)
+        return audio_buffer
         
     except Exception as e:
         raise Exception(f"Google TTS API error: {str(e)}")
 
 
+def google_tts_cache_key(text: str, lang: str = 'en', slow: bool = False) -> str:
+    """TTS cache key under which google_tts stores audio for already-cleaned text"""
+    return TTSCache.make_key("gtts", text, lang=lang, slow=slow)
+
+
+def cloud_language_code(lang: str) -> str:
+    """Google Cloud voice language for a gTTS-style language code ('en' -> 'en-US')"""
+    return lang if "-" in lang else {"en": "en-US"}.get(lang, lang)
+
+
 def google_cloud_tts(text: str, language_code: str = "en-US", voice_name: Optional[str] = None) -> io.BytesIO:
     """
     Google Cloud Text-to-Speech with support for long text
@@ -67,7 +85,7 @@ def google_cloud_tts(text: str, language_code: str = "en-US", voice_name: Option
         Exception: If TTS generation fails
     """
     try:
-        from google.cloud import texttospeech
+        providers.load("google.cloud.texttospeech")
     except ImportError:
         raise Exception("Google Cloud TTS not installed. Install with: pip install google-cloud-texttospeech")
     
@@ -81,87 +99,482 @@ def google_cloud_tts(text: str, language_code: str = "en-US", voice_name: Option
         raise Exception("Empty text provided for TTS")
     
     try:
-        # Google Cloud TTS has a limit of 5000 characters
-        if len(text) <= 5000:
-            logger.info(f"Generating Google Cloud TTS for text: '{text[:50]}...'")
-            return _generate_single_cloud_tts(text, language_code, voice_name)
+        return cached_audio(
+            "google_cloud", text,
+            lambda: _generate_google_cloud_tts(text, language_code, voice_name),
+            language_code=language_code, voice_name=voice_name, speaking_rate=1.1
+        )
         
+    except Exception as e:
+        raise Exception(f"Google Cloud TTS API error: {str(e)}")
+
+
+def _generate_google_tts(text: str, lang: str, slow: bool) -> io.BytesIO:
+    """Generate gTTS audio for cleaned text, chunking it as the chunk planner decides"""
+    with span("split"):
+        plan = planner.plan("gtts", text, _split_text_smart)
+    started = time.perf_counter()
+    if len(plan.chunks) == 1:
+        logger.info(f"Generating Google TTS for short text: '{text[:50]}...'")
+        audio = io.BytesIO(_synthesize_gtts_chunk(text, lang, slow))
+    else:
+        # Handle long text with chunking
+        logger.info(f"Generating Google TTS for long text ({len(text)} characters)")
+        audio = _generate_long_text_tts(plan, lang, slow)
+    planner.record(plan, time.perf_counter() - started)
+    return audio
+
+
+def _generate_google_cloud_tts(text: str, language_code: str, voice_name: Optional[str]) -> io.BytesIO:
+    """Generate Google Cloud TTS audio for cleaned text, chunking it as the chunk planner decides"""
+    # Google Cloud TTS has a limit of 5000 characters; the planner keeps chunks within it
+    with span("split"):
+        plan = planner.plan("google_cloud", text, _split_text_smart)
+    started = time.perf_counter()
+    if len(plan.chunks) == 1:
+        logger.info(f"Generating Google Cloud TTS for text: '{text[:50]}...'")
+        audio = _generate_single_cloud_tts(text, language_code, voice_name)
+    else:
         # Handle long text with chunking
         logger.info(f"Generating Google Cloud TTS for long text ({len(text)} characters)")
-        return _generate_long_cloud_tts(text, language_code, voice_name)
+        audio = _generate_long_cloud_tts(plan, language_code, voice_name)
+    planner.record(plan, time.perf_counter() - started)
+    return audio
+
+
+def _generate_long_text_tts(plan: ChunkPlan, lang: str, slow: bool) -> io.BytesIO:
+    """Generate TTS for long text by synthesizing the planned chunks and concatenating audio"""
+    chunks = plan.chunks
+    logger.info(f"Split text into {len(chunks)} chunks of up to {plan.max_length} characters")
+    
+    results = _synthesize_chunks(
+        chunks, lambda chunk: _synthesize_gtts_chunk(chunk, lang, slow), max_workers=plan.workers,
+        cache_engine="gtts", cache_params={"lang": lang, "slow": slow}
+    )
+    audio_segments = _complete_audio(results)
+    
+    # Concatenate audio segments
+    with span("concat"):
+        return _concatenate_audio_segments(audio_segments)
+
+
+def _generate_long_cloud_tts(plan: ChunkPlan, language_code: str, voice_name: Optional[str]) -> io.BytesIO:
+    """Generate Google Cloud TTS for long text by synthesizing the planned chunks"""
+    chunks = plan.chunks
+    logger.info(f"Split text into {len(chunks)} chunks of up to {plan.max_length} characters")
+    
+    results = _synthesize_chunks(
+        chunks,
+        lambda chunk: _generate_single_cloud_tts(chunk, language_code, voice_name).getvalue(),
+        max_workers=plan.workers,
+        cache_engine="google_cloud",
+        cache_params={"language_code": language_code, "voice_name": voice_name, "speaking_rate": 1.1}
+    )
+    audio_segments = _complete_audio(results)
+    
+    # Concatenate audio segments
+    with span("concat"):
+        return _concatenate_audio_segments(audio_segments)
+
+
+def _complete_audio(results: List["ChunkResult"]) -> List[bytes]:
+    """
+    Every chunk's audio, in order
+
+    Raises:
+        Exception: If any chunk failed; a reply with a gap in it is not returned
+    """
+    failed = [result.index + 1 for result in results if result.audio is None]
+    if not results or failed:
+        raise Exception(f"Failed to generate audio for chunks {failed} of {len(results)}")
+    return [result.audio for result in results]
+
+
+class ChunkResult(NamedTuple):
+    """Outcome of synthesizing one text chunk"""
+    index: int
+    text: str
+    audio: Optional[bytes]
+    latency: float
+    attempts: int
+    cached: bool = False
+
+
+def _synthesize_chunks(chunks: List[str],
+                       synthesize: Callable[[str], bytes],
+                       max_workers: Optional[int] = None,
+                       cache_engine: Optional[str] = None,
+                       cache_params: Optional[dict] = None) -> List[ChunkResult]:
+    """
+    Synthesize text chunks concurrently on a bounded thread pool
+    
+    Args:
+        chunks (List[str]): Text chunks, in playback order
+        synthesize (Callable[[str], bytes]): Turns one chunk into MP3 bytes
+        max_workers (int, optional): Pool size (default: TTS_MAX_WORKERS)
+        cache_engine (str, optional): When set, chunk audio is looked up in and
+            stored to the TTS cache under this engine name, and a chunk that
+            is already being synthesized (for another reply of a batch, or
+            another request) is waited for instead of requested again
+        cache_params (dict, optional): Audio parameters that are part of the chunk cache key
         
+    Returns:
+        List[ChunkResult]: One result per non-empty chunk, in input order.
+        ``audio`` is None for chunks that failed after the upstream retries.
+    """
+    max_workers = TTS_MAX_WORKERS if max_workers is None else max_workers
+    
+    jobs = [(i, chunk) for i, chunk in enumerate(chunks) if chunk.strip()]
+    if not jobs:
+        return []
+    
+    # Serve chunks we have already synthesized from the cache
+    results = {}
+    keys = {}
+    if cache_engine:
+        for index, chunk in jobs:
+            keys[index] = _chunk_cache_key(cache_engine, chunk, cache_params)
+            audio = tts_cache.get(keys[index])
+            if audio is not None:
+                results[index] = ChunkResult(index, chunk, audio, 0.0, 0, cached=True)
+    pending = [job for job in jobs if job[0] not in results]
+    
+    def run(job) -> ChunkResult:
+        index, chunk = job
+        if cache_engine:
+            return _coalesced_chunk(keys[index], index, len(chunks), chunk, synthesize)
+        return _synthesize_chunk(index, len(chunks), chunk, synthesize)
+    
+    started = time.perf_counter()
+    workers = max(1, min(max_workers, len(pending)))
+    if workers == 1:
+        synthesized = [run(job) for job in pending]
+    else:
+        # Each job runs in a copy of the caller's context so its spans land on the current request
+        contexts = [contextvars.copy_context() for _ in pending]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-chunk") as pool:
+            # map() yields in submission order, so playback order is preserved
+            synthesized = list(pool.map(lambda context, job: context.run(run, job), contexts, pending))
+    
+    for result in synthesized:
+        results[result.index] = result
+        if cache_engine and result.audio is not None and not result.cached:
+            tts_cache.put(keys[result.index], result.audio)
+    
+    elapsed = time.perf_counter() - started
+    if synthesized:
+        slowest = max(result.latency for result in synthesized)
+        logger.info(
+            f"Synthesized {len(synthesized)} chunks with {workers} workers in {elapsed:.3f}s "
+            f"(sum {sum(r.latency for r in synthesized):.3f}s, slowest {slowest:.3f}s)"
+        )
+    if cache_engine:
+        hits = len(jobs) - len(pending)
+        logger.info(f"Chunk cache: {hits}/{len(jobs)} hits ({chunk_hit_ratio(results.values()):.0%})")
+    
+    return [results[index] for index, _ in jobs]
+
+
+def chunk_hit_ratio(results) -> float:
+    """Fraction of chunk results that were served from the chunk cache"""
+    results = list(results)
+    if not results:
+        return 0.0
+    return sum(result.cached for result in results) / len(results)
+
+
+def _chunk_cache_key(engine: str, chunk: str, params: Optional[dict]) -> str:
+    """Cache key for one chunk; kept apart from whole-reply keys by the engine suffix"""
+    return TTSCache.make_key(f"{engine}:chunk", chunk, **(params or {}))
+
+
+def _coalesced_chunk(key: str, index: int, total: int, chunk: str,
+                     synthesize: Callable[[str], bytes]) -> ChunkResult:
+    """
+    Synthesize a chunk once for every caller that needs it at the same time
+
+    The caller whose request went upstream gets its own ChunkResult; the
+    others get the shared audio marked as ``cached``.
+    """
+    led = []
+
+    def lead() -> bytes:
+        result = _synthesize_chunk(index, total, chunk, synthesize)
+        led.append(result)
+        if result.audio is None:
+            raise Exception(f"Failed to generate TTS for chunk {index+1}")
+        return result.audio
+
+    started = time.perf_counter()
+    try:
+        audio = tts_flight.do(key, lead)
+    except Exception:
+        return led[0] if led else ChunkResult(index, chunk, None, time.perf_counter() - started, 0)
+    return led[0] if led else ChunkResult(index, chunk, audio, time.perf_counter() - started, 0, cached=True)
+
+
+def _synthesize_chunk(index: int, total: int, chunk: str, synthesize: Callable[[str], bytes]) -> ChunkResult:
+    """
+    Synthesize a single chunk
+
+    Retries happen inside ``synthesize``, in the upstream scheduler, which
+    also serves the first chunk (the one playback waits for) ahead of the rest.
+    """
+    logger.info(f"Processing chunk {index+1}/{total}: '{chunk[:30]}...'")
+    
+    started = time.perf_counter()
+    try:
+        if index == 0:
+            with upstream.first_audio():
+                audio = synthesize(chunk)
+        else:
+            audio = synthesize(chunk)
     except Exception as e:
-        raise Exception(f"Google Cloud TTS API error: {str(e)}")
+        logger.warning(f"Failed to generate TTS for chunk {index+1}: {e}")
+        return ChunkResult(index, chunk, None, time.perf_counter() - started, 1)
+    latency = time.perf_counter() - started
+    logger.info(f"Chunk {index+1}/{total} done in {latency:.3f}s")
+    return ChunkResult(index, chunk, audio, latency, 1)
+
 
+def _synthesize_gtts_chunk(chunk: str, lang: str, slow: bool) -> bytes:
+    """Synthesize one chunk with gTTS, within its rate limit and retried on failure"""
+    return upstream.call("gtts", lambda: _request_gtts_chunk(chunk, lang, slow))
 
-def _generate_long_text_tts(text: str, lang: str, slow: bool) -> io.BytesIO:
-    """Generate TTS for long text by chunking and concatenating audio"""
-    from gtts import gTTS
+
+def _request_gtts_chunk(chunk: str, lang: str, slow: bool) -> bytes:
+    """Send one chunk's gTTS requests over the shared session and return the MP3 bytes"""
+    tts = providers.load("gtts").gTTS(text=chunk, lang=lang, slow=slow)
+    audio = SegmentBuffer()
+    with span("tts_chunk"), measure("gtts", len(chunk)):
+        # gTTS builds the RPC payload; the pooled session replaces its per-request Session
+        for prepared in tts._prepare_requests():
+            response = session().send(prepared)
+            response.raise_for_status()
+            audio.append(_decode_gtts_response(response.text))
+    return audio.getvalue()
+
+
+async def google_tts_async(text: str, lang: str = 'en', slow: bool = False) -> io.BytesIO:
+    """
+    Async version of google_tts for the ASGI app
     
-    # Split text into chunks
-    chunks = _split_text_smart(text, max_length=100)
-    logger.info(f"Split text into {len(chunks)} chunks")
+    Requests go to the same translate endpoint gTTS uses, but through the
+    shared httpx.AsyncClient, so waiting on Google does not hold a thread.
+    Chunks of long text are synthesized concurrently on the event loop and
+    frame concatenation runs in the default executor.
     
-    audio_segments = []
+    Args:
+        text (str): Text to convert to speech (any length)
+        lang (str): Language code (default: 'en')
+        slow (bool): Speak slowly (default: False)
     
-    for i, chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-            
-        logger.info(f"Processing chunk {i+1}/{len(chunks)}: '{chunk[:30]}...'")
+    Returns:
+        io.BytesIO: Audio content as BytesIO object
         
-        try:
-            tts = gTTS(text=chunk, lang=lang, slow=slow)
-            chunk_buffer = io.BytesIO()
-            tts.write_to_fp(chunk_buffer)
-            chunk_buffer.seek(0)
-            audio_segments.append(chunk_buffer.getvalue())
-            
-        except Exception as e:
-            logger.warning(f"Failed to generate TTS for chunk {i+1}: {e}")
-            continue
+    Raises:
+        Exception: If TTS generation fails
+    """
+    try:
+        providers.load("gtts")
+    except ImportError:
+        raise Exception("gTTS not installed. Install with: pip install gtts")
     
-    if not audio_segments:
-        raise Exception("Failed to generate audio for any text chunks")
+    # Clean text
+    text = _clean_text(text)
+    if not text.strip():
+        raise Exception("Empty text provided for TTS")
     
-    # Concatenate audio segments
-    return _concatenate_audio_segments(audio_segments)
+    try:
+        with span("tts"):
+            audio_buffer = await cached_audio_async(
+                "gtts", text, lambda: _generate_google_tts_async(text, lang, slow), lang=lang, slow=slow
+            )
+        record_bytes("tts", audio_buffer.getbuffer().nbytes)
+        return audio_buffer
+        
+    except Exception as e:
+        raise Exception(f"Google TTS API error: {str(e)}")
 
 
-def _generate_long_cloud_tts(text: str, language_code: str, voice_name: Optional[str]) -> io.BytesIO:
-    """Generate Google Cloud TTS for long text by chunking"""
-    # Split text into chunks (Google Cloud limit is 5000 chars)
-    chunks = _split_text_smart(text, max_length=4500)  # Leave some buffer
-    logger.info(f"Split text into {len(chunks)} chunks")
+async def _generate_google_tts_async(text: str, lang: str, slow: bool) -> io.BytesIO:
+    """Async counterpart of _generate_google_tts"""
+    with span("split"):
+        plan = planner.plan("gtts", text, _split_text_smart)
+    started = time.perf_counter()
+    if len(plan.chunks) == 1:
+        logger.info(f"Generating Google TTS for short text: '{text[:50]}...'")
+        audio = io.BytesIO(await _synthesize_gtts_chunk_async(text, lang, slow))
+    else:
+        logger.info(f"Generating Google TTS for long text ({len(text)} characters)")
+        audio = await _generate_long_text_tts_async(plan, lang, slow)
+    planner.record(plan, time.perf_counter() - started)
+    return audio
+
+
+async def _generate_long_text_tts_async(plan: ChunkPlan, lang: str, slow: bool) -> io.BytesIO:
+    """Async counterpart of _generate_long_text_tts"""
+    chunks = plan.chunks
+    logger.info(f"Split text into {len(chunks)} chunks of up to {plan.max_length} characters")
+    
+    results = await _synthesize_chunks_async(
+        chunks, lambda chunk: _synthesize_gtts_chunk_async(chunk, lang, slow), max_workers=plan.workers,
+        cache_engine="gtts", cache_params={"lang": lang, "slow": slow}
+    )
+    audio_segments = _complete_audio(results)
     
-    audio_segments = []
+    # Frame joining is CPU work; keep it off the event loop
+    loop = asyncio.get_running_loop()
+    with span("concat"):
+        return await loop.run_in_executor(None, _concatenate_audio_segments, audio_segments)
+
+
+async def _synthesize_chunks_async(chunks: List[str],
+                                   synthesize: Callable[[str], Awaitable[bytes]],
+                                   max_workers: Optional[int] = None,
+                                   cache_engine: Optional[str] = None,
+                                   cache_params: Optional[dict] = None) -> List[ChunkResult]:
+    """
+    Async version of _synthesize_chunks
     
-    for i, chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-            
-        logger.info(f"Processing chunk {i+1}/{len(chunks)}: '{chunk[:30]}...'")
-        
-        try:
-            chunk_audio = _generate_single_cloud_tts(chunk, language_code, voice_name)
-            audio_segments.append(chunk_audio.getvalue())
-            
-        except Exception as e:
-            logger.warning(f"Failed to generate TTS for chunk {i+1}: {e}")
-            continue
+    At most ``max_workers`` chunk requests of one reply are in flight at a
+    time, matching the thread pool bound of the sync path.
     
-    if not audio_segments:
-        raise Exception("Failed to generate audio for any text chunks")
+    Returns:
+        List[ChunkResult]: One result per non-empty chunk, in input order.
+        ``audio`` is None for chunks that failed after the upstream retries.
+    """
+    max_workers = TTS_MAX_WORKERS if max_workers is None else max_workers
+    
+    jobs = [(i, chunk) for i, chunk in enumerate(chunks) if chunk.strip()]
+    if not jobs:
+        return []
+    
+    results = {}
+    keys = {}
+    if cache_engine:
+        for index, chunk in jobs:
+            keys[index] = _chunk_cache_key(cache_engine, chunk, cache_params)
+        cached = await asyncio.to_thread(lambda: {index: tts_cache.get(key) for index, key in keys.items()})
+        for index, chunk in jobs:
+            if cached[index] is not None:
+                results[index] = ChunkResult(index, chunk, cached[index], 0.0, 0, cached=True)
+    pending = [job for job in jobs if job[0] not in results]
+    
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+    
+    async def run(job) -> ChunkResult:
+        index, chunk = job
+        async with semaphore:
+            if cache_engine:
+                return await _coalesced_chunk_async(keys[index], index, len(chunks), chunk, synthesize)
+            return await _synthesize_chunk_async(index, len(chunks), chunk, synthesize)
+    
+    started = time.perf_counter()
+    # gather() returns results in argument order, so playback order is preserved
+    synthesized = await asyncio.gather(*(run(job) for job in pending))
+    
+    stored = []
+    for result in synthesized:
+        results[result.index] = result
+        if cache_engine and result.audio is not None and not result.cached:
+            stored.append((keys[result.index], result.audio))
+    if stored:
+        await asyncio.to_thread(lambda: [tts_cache.put(key, audio) for key, audio in stored])
+    
+    elapsed = time.perf_counter() - started
+    if synthesized:
+        slowest = max(result.latency for result in synthesized)
+        logger.info(
+            f"Synthesized {len(synthesized)} chunks concurrently in {elapsed:.3f}s "
+            f"(sum {sum(r.latency for r in synthesized):.3f}s, slowest {slowest:.3f}s)"
+        )
+    if cache_engine:
+        hits = len(jobs) - len(pending)
+        logger.info(f"Chunk cache: {hits}/{len(jobs)} hits ({chunk_hit_ratio(results.values()):.0%})")
+    
+    return [results[index] for index, _ in jobs]
+
+
+async def _coalesced_chunk_async(key: str, index: int, total: int, chunk: str,
+                                 synthesize: Callable[[str], Awaitable[bytes]]) -> ChunkResult:
+    """Async version of _coalesced_chunk"""
+    led = []
+
+    async def lead() -> bytes:
+        result = await _synthesize_chunk_async(index, total, chunk, synthesize)
+        led.append(result)
+        if result.audio is None:
+            raise Exception(f"Failed to generate TTS for chunk {index+1}")
+        return result.audio
+
+    started = time.perf_counter()
+    try:
+        audio = await tts_flight.do_async(key, lead)
+    except Exception:
+        return led[0] if led else ChunkResult(index, chunk, None, time.perf_counter() - started, 0)
+    return led[0] if led else ChunkResult(index, chunk, audio, time.perf_counter() - started, 0, cached=True)
+
+
+async def _synthesize_chunk_async(index: int, total: int, chunk: str,
+                                  synthesize: Callable[[str], Awaitable[bytes]]) -> ChunkResult:
+    """Async version of _synthesize_chunk"""
+    logger.info(f"Processing chunk {index+1}/{total}: '{chunk[:30]}...'")
     
-    # Concatenate audio segments
-    return _concatenate_audio_segments(audio_segments)
+    started = time.perf_counter()
+    try:
+        if index == 0:
+            with upstream.first_audio():
+                audio = await synthesize(chunk)
+        else:
+            audio = await synthesize(chunk)
+    except Exception as e:
+        logger.warning(f"Failed to generate TTS for chunk {index+1}: {e}")
+        return ChunkResult(index, chunk, None, time.perf_counter() - started, 1)
+    latency = time.perf_counter() - started
+    logger.info(f"Chunk {index+1}/{total} done in {latency:.3f}s")
+    return ChunkResult(index, chunk, audio, latency, 1)
+
+
+# Audio payload in gTTS's batchexecute response: the pattern gTTS.stream() uses
+# in the version pinned in requirements.txt (tests/test_gtts_tts.py checks they agree)
+_GTTS_AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+
+async def _synthesize_gtts_chunk_async(chunk: str, lang: str, slow: bool) -> bytes:
+    """Async version of _synthesize_gtts_chunk"""
+    return await upstream.call_async("gtts", lambda: _request_gtts_chunk_async(chunk, lang, slow))
+
+
+async def _request_gtts_chunk_async(chunk: str, lang: str, slow: bool) -> bytes:
+    """Send one chunk's gTTS requests with httpx and return the MP3 bytes"""
+    tts = providers.load("gtts").gTTS(text=chunk, lang=lang, slow=slow)
+    client = async_client()
+    audio = SegmentBuffer()
+    with span("tts_chunk"), measure("gtts", len(chunk)):
+        # gTTS builds the RPC payload; only the transport is replaced
+        for prepared in tts._prepare_requests():
+            response = await client.post(prepared.url, content=prepared.body, headers=dict(prepared.headers))
+            response.raise_for_status()
+            audio.append(_decode_gtts_response(response.text))
+    return audio.getvalue()
+
+
+def _decode_gtts_response(body: str) -> bytes:
+    """Extract the MP3 bytes from a batchexecute response body"""
+    for line in body.splitlines():
+        if "jQ1olc" in line:
+            match = _GTTS_AUDIO.search(line)
+            if match:
+                return base64.b64decode(match.group(1).encode("ascii"))
+    raise Exception("No audio stream in gTTS response")
 
 
 def _generate_single_cloud_tts(text: str, language_code: str, voice_name: Optional[str]) -> io.BytesIO:
     """Generate single Google Cloud TTS request"""
-    from google.cloud import texttospeech
+    texttospeech = providers.load("google.cloud.texttospeech")
     
-    client = texttospeech.TextToSpeechClient()
+    client = cloud_tts_client()
     synthesis_input = texttospeech.SynthesisInput(text=text)
     
     voice_params = {
@@ -179,11 +592,15 @@ def _generate_single_cloud_tts(text: str, language_code: str, voice_name: Option
         speaking_rate=1.1
     )
     
-    response = client.synthesize_speech(
-        input=synthesis_input, 
-        voice=voice, 
-        audio_config=audio_config
-    )
+    def request():
+        with span("tts_chunk"), measure("google_cloud", len(text)):
+            return client.synthesize_speech(
+                input=synthesis_input, 
+                voice=voice, 
+                audio_config=audio_config
+            )
+    
+    response = upstream.call("google_cloud", request)
     
     return io.BytesIO(response.audio_content)
 
@@ -291,6 +708,10 @@ def _concatenate_audio_segments(audio_segments: List[bytes]) -> io.BytesIO:
     """
     Concatenate multiple audio segments into single audio file
     
+    MP3 frames are joined directly, with silent frames for the pause between
+    segments. Re-encoding with pydub is only used when the segments cannot be
+    joined frame by frame (e.g. mixed sample rates).
+    
     Args:
         audio_segments (List[bytes]): List of audio data
         
@@ -298,33 +719,51 @@ def _concatenate_audio_segments(audio_segments: List[bytes]) -> io.BytesIO:
         io.BytesIO: Combined audio
     """
     try:
-        from pydub import AudioSegment
+        combined = join_mp3(audio_segments, pause_ms=50)
+        logger.info(f"Joined {len(audio_segments)} audio segments at the MP3 frame level")
+        return io.BytesIO(combined)
+    except ValueError as e:
+        logger.warning(f"MP3 frame join failed: {e}, re-encoding with pydub")
+    
+    return _reencode_audio_segments(audio_segments)
+
+
+def _reencode_audio_segments(audio_segments: List[bytes]) -> io.BytesIO:
+    """Concatenate audio segments by decoding and re-encoding them with pydub"""
+    try:
+        AudioSegment = providers.load("pydub").AudioSegment
     except ImportError:
         # Fallback: simple concatenation (less optimal but works)
         logger.warning("pydub not available, using simple concatenation")
         return _simple_audio_concatenation(audio_segments)
     
     try:
-        # Use pydub for proper audio concatenation
-        combined = AudioSegment.empty()
-        
+        # Decoded samples are converted to the first segment's format and
+        # joined once; += on AudioSegments copies everything so far each time
+        first = None
+        samples = SegmentBuffer()
         for i, segment_data in enumerate(audio_segments):
             try:
                 audio_segment = AudioSegment.from_mp3(io.BytesIO(segment_data))
-                combined += audio_segment
-                
-                # Add small pause between segments (50ms)
-                if i < len(audio_segments) - 1:
-                    pause = AudioSegment.silent(duration=50)
-                    combined += pause
-                    
             except Exception as e:
                 logger.warning(f"Failed to process audio segment {i}: {e}")
                 continue
+            if first is None:
+                first = audio_segment
+                # Small pause between segments (50ms)
+                pause = AudioSegment.silent(duration=50, frame_rate=first.frame_rate)
+                pause = pause.set_channels(first.channels).set_sample_width(first.sample_width).raw_data
+            else:
+                samples.append(pause)
+                audio_segment = (audio_segment.set_frame_rate(first.frame_rate)
+                                 .set_channels(first.channels)
+                                 .set_sample_width(first.sample_width))
+            samples.append(audio_segment.raw_data)
+        combined = AudioSegment.empty() if first is None else first._spawn(samples.getvalue())
         
-        # Export combined audio
+        # Export combined audio as mono voice MP3 (pydub's default is 128 kbps)
         output_buffer = io.BytesIO()
-        combined.export(output_buffer, format="mp3")
+        combined.set_channels(1).export(output_buffer, format="mp3", bitrate=f"{AUDIO_MP3_BITRATE}k")
         output_buffer.seek(0)
         
         logger.info(f"Successfully concatenated {len(audio_segments)} audio segments")
@@ -362,12 +801,12 @@ def _clean_text(text: str) -> str:
 def get_available_voices(language_code: str = "en-US") -> list:
     """Get available voices for Google Cloud TTS"""
     try:
-        from google.cloud import texttospeech
+        providers.load("google.cloud.texttospeech")
     except ImportError:
         raise Exception("Google Cloud TTS not installed")
     
     try:
-        client = texttospeech.TextToSpeechClient()
+        client = cloud_tts_client()
         voices = client.list_voices(language_code=language_code)
         
         voice_names = []
@@ -378,40 +817,3 @@ def get_available_voices(language_code: str = "en-US") -> list:
         
     except Exception as e:
         raise Exception(f"Failed to get available voices: {str(e)}")
-
-
-def test_google_tts():
-    """Test function with both short and long text"""
-    short_text = "Hello, this is a short test."
-    long_text = """
-    This is a much longer text that will test the chunking functionality of our Google TTS implementation. 
-    It contains multiple sentences and should be split into appropriate chunks for processing. 
-    The system should handle this automatically and concatenate the audio segments back together seamlessly. 
-    This way we can convert any length of text to speech without hitting API limits. 
-    The chunking respects sentence boundaries to maintain natural speech flow.
-    """
-    
-    print("Testing Google TTS with short text...")
-    try:
-        audio1 = google_tts(short_text)
-        print(f"✓ Short text TTS successful - Audio size: {len(audio1.getvalue())} bytes")
-    except Exception as e:
-        print(f"✗ Short text TTS failed: {e}")
-    
-    print("\nTesting Google TTS with long text...")
-    try:
-        audio2 = google_tts(long_text)
-        print(f"✓ Long text TTS successful - Audio size: {len(audio2.getvalue())} bytes")
-    except Exception as e:
-        print(f"✗ Long text TTS failed: {e}")
-    
-    print("\nTesting Google Cloud TTS...")
-    try:
-        audio3 = google_cloud_tts(long_text)
-        print(f"✓ Google Cloud TTS successful - Audio size: {len(audio3.getvalue())} bytes")
-    except Exception as e:
-        print(f"✗ Google Cloud TTS failed: {e}")
-
-
-if __name__ == "__main__":
-    test_google_tts()
\ No newline at end of file
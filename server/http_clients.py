@@ -0,0 +1,307 @@
+"""
+Shared, pooled clients for every upstream provider.
+
+All HTTP traffic to OpenAI, gTTS and ElevenLabs goes through long-lived
+clients with keep-alive, a per-host connection limit and default timeouts,
+so a TCP+TLS handshake is paid once per connection rather than once per
+request. Google Cloud TTS gets a single cached gRPC client. pool_stats()
+reports requests and new connections per client and host.
+"""
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import EmptyPoolError
+
+from config import HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_POOL_PER_HOST, HTTP_ASYNC_POOL_PER_HOST
+import providers
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+# httpx (which imports its CLI's dependencies too) is loaded with the first
+# async or OpenAI client, not when the app starts; see providers
+_async_client: Optional["httpx.AsyncClient"] = None
+_cloud_tts_client = None
+
+
+class PoolStats:
+    """Requests sent and connections opened, per client and upstream host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"requests": 0, "connections": 0})
+        self.cloud_tts_clients_created = 0
+
+    def record_request(self, client: str, host: str) -> None:
+        with self._lock:
+            self._counts[(client, host)]["requests"] += 1
+
+    def record_connection(self, client: str, host: str) -> None:
+        with self._lock:
+            self._counts[(client, host)]["connections"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = {key: dict(value) for key, value in self._counts.items()}
+        return counts
+
+
+_stats = PoolStats()
+
+
+def _bounded_pool(pool_class, pool_timeout: float):
+    """urllib3 pool class that waits at most pool_timeout seconds for a free connection"""
+    class BoundedPool(pool_class):
+        def _get_conn(self, timeout=None):
+            return super()._get_conn(pool_timeout if timeout is None else timeout)
+
+    BoundedPool.__name__ = f"Bounded{pool_class.__name__}"
+    return BoundedPool
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with default connect, read and pool timeouts and request counting"""
+
+    def __init__(self, timeout, pool_timeout: float, **kwargs):
+        self.timeout = timeout
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # requests never passes urllib3 a pool_timeout, so a blocking pool would wait forever
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _bounded_pool(pool_class, self.pool_timeout)
+            for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        host = urlsplit(request.url).hostname
+        _stats.record_request("requests", host)
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            # A connection error, so the upstream scheduler retries it
+            raise requests.ConnectionError(
+                f"No free connection to {host} within {self.pool_timeout}s", request=request
+            ) from e
+
+
+def session() -> requests.Session:
+    """
+    Shared requests.Session for the sync TTS paths (gTTS, ElevenLabs)
+
+    Each host gets a pool of up to HTTP_POOL_PER_HOST kept-alive connections;
+    callers beyond that wait up to HTTP_CONNECT_TIMEOUT seconds for a free
+    connection instead of opening more, then fail with a connection error.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                adapter = _PooledAdapter(
+                    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT),
+                    pool_timeout=HTTP_CONNECT_TIMEOUT,
+                    pool_connections=8,
+                    pool_maxsize=HTTP_POOL_PER_HOST,
+                    pool_block=True,
+                )
+                shared = requests.Session()
+                shared.mount("https://", adapter)
+                shared.mount("http://", adapter)
+                _session = shared
+    return _session
+
+
+def _session_connections() -> dict:
+    """New connections per host, from urllib3's per-host pool counters"""
+    connections = defaultdict(int)
+    if _session is None:
+        return connections
+    for adapter in {id(a): a for a in _session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections[pool.host] += pool.num_connections
+    return connections
+
+
+def _httpx_trace_hook(client: str):
+    """Request hook that counts requests and new TCP connections for a sync httpx client"""
+    def hook(request: "httpx.Request") -> None:
+        host = request.url.host
+        _stats.record_request(client, host)
+
+        def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.complete":
+                _stats.record_connection(client, host)
+
+        request.extensions["trace"] = trace
+    return hook
+
+
+def _httpx_async_trace_hook(client: str):
+    """Async version of _httpx_trace_hook"""
+    async def hook(request: "httpx.Request") -> None:
+        host = request.url.host
+        _stats.record_request(client, host)
+
+        async def trace(event: str, info: dict) -> None:
+            if event == "connection.connect_tcp.complete":
+                _stats.record_connection(client, host)
+
+        request.extensions["trace"] = trace
+    return hook
+
+
+def _aiohttp_transport(client: str, limits: "httpx.Limits"):
+    """
+    httpx transport on aiohttp, counting requests and new connections
+
+    Returns None when httpx-aiohttp is not installed.
+    """
+    try:
+        aiohttp = providers.load("aiohttp")
+        AiohttpTransport = providers.load("httpx_aiohttp").AiohttpTransport
+    except ImportError:
+        return None
+
+    async def on_request_start(session, context, params) -> None:
+        context.host = params.url.host
+        _stats.record_request(client, context.host)
+
+    async def on_connection_create_end(session, context, params) -> None:
+        _stats.record_connection(client, getattr(context, "host", None))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+
+    def make_session():
+        connector = aiohttp.TCPConnector(
+            limit=limits.max_connections,
+            limit_per_host=HTTP_ASYNC_POOL_PER_HOST,
+            keepalive_timeout=limits.keepalive_expiry,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+    # The session is created on first request, inside the running event loop
+    return AiohttpTransport(limits=limits, client=make_session)
+
+
+def async_client() -> "httpx.AsyncClient":
+    """
+    Shared async HTTP client for TTS upstreams in the ASGI app
+
+    httpx's client API on aiohttp's transport when httpx-aiohttp is installed:
+    httpx's own connection pool costs noticeably more CPU per request once
+    hundreds of requests are in flight. Plain httpx is the fallback. Created
+    on first use so it binds to the running event loop.
+    """
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        httpx = providers.load("httpx")
+        # Upstream calls are network-bound; keep connect short, allow slow synthesis
+        timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        limits = httpx.Limits(
+            max_connections=4 * HTTP_ASYNC_POOL_PER_HOST,
+            max_keepalive_connections=HTTP_ASYNC_POOL_PER_HOST,
+        )
+        transport = _aiohttp_transport("tts_async", limits)
+        if transport is not None:
+            _async_client = httpx.AsyncClient(timeout=timeout, transport=transport)
+        else:
+            _async_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=limits,
+                event_hooks={"request": [_httpx_async_trace_hook("tts_async")]},
+            )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared async client (called on ASGI shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def openai_http_client() -> "httpx.Client":
+    """httpx client for the sync OpenAI SDK client, with the SDK's default timeouts"""
+    httpx = providers.load("httpx")
+    openai = providers.load("openai")
+
+    return openai.DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=HTTP_POOL_PER_HOST, max_keepalive_connections=HTTP_POOL_PER_HOST),
+        event_hooks={"request": [_httpx_trace_hook("openai")]},
+    )
+
+
+def openai_async_http_client() -> "httpx.AsyncClient":
+    """Async client for the AsyncOpenAI SDK client (aiohttp transport when available)"""
+    httpx = providers.load("httpx")
+    openai = providers.load("openai")
+
+    limits = httpx.Limits(max_connections=HTTP_ASYNC_POOL_PER_HOST, max_keepalive_connections=HTTP_ASYNC_POOL_PER_HOST)
+    transport = _aiohttp_transport("openai_async", limits)
+    if transport is not None:
+        return openai.DefaultAsyncHttpxClient(transport=transport)
+    return openai.DefaultAsyncHttpxClient(
+        limits=limits,
+        event_hooks={"request": [_httpx_async_trace_hook("openai_async")]},
+    )
+
+
+def cloud_tts_client():
+    """
+    Shared Google Cloud TextToSpeechClient
+
+    The client holds a gRPC channel, so it is built once and reused for every
+    request and chunk.
+
+    Raises:
+        ImportError: If google-cloud-texttospeech is not installed
+    """
+    global _cloud_tts_client
+    if _cloud_tts_client is None:
+        texttospeech = providers.load("google.cloud.texttospeech")
+        with _lock:
+            if _cloud_tts_client is None:
+                _cloud_tts_client = texttospeech.TextToSpeechClient()
+                _stats.cloud_tts_clients_created += 1
+    return _cloud_tts_client
+
+
+def pool_stats() -> dict:
+    """
+    Requests and new connections per client and host
+
+    Returns:
+        dict: ``{"clients": {client: {host: {"requests", "connections",
+        "connections_per_request"}}}, "cloud_tts_clients_created": int}``.
+        A warm pool shows connections_per_request close to zero.
+    """
+    counts = _stats.snapshot()
+    for host, connections in _session_connections().items():
+        counts.setdefault(("requests", host), {"requests": 0, "connections": 0})["connections"] = connections
+
+    clients = defaultdict(dict)
+    for (client, host), entry in sorted(counts.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        entry["connections_per_request"] = (
+            entry["connections"] / entry["requests"] if entry["requests"] else 0.0
+        )
+        clients[client][host] = entry
+    return {
+        "clients": dict(clients),
+        "cloud_tts_clients_created": _stats.cloud_tts_clients_created,
+    }
@@ -0,0 +1,211 @@
+"""
+Local text-to-speech that needs no network.
+
+Two engines, both optional:
+
+- Piper (``pip install piper-tts``): a neural voice run with ONNX Runtime
+  on the CPU, in-process. The voice model named by PIPER_MODEL (an
+  ``.onnx`` file with its ``.onnx.json`` next to it) is loaded once and
+  shared by all requests; LOCAL_TTS_CONCURRENCY bounds how many sentences
+  are synthesized at the same time.
+- espeak-ng (the ``espeak-ng`` binary): formant synthesis, robotic but
+  tiny and fast. Used as a last resort.
+
+Both produce 16-bit mono PCM one sentence at a time. It is encoded to MP3
+as it arrives, in-process with LAME (``pip install lameenc``) or through
+ffmpeg, and returned as one buffer per request, like the cloud engines;
+streamed replies get their audio per segment through the TTS router.
+"""
+import io
+import os
+import time
+import wave
+import logging
+import threading
+import subprocess
+from typing import Iterable, Iterator, NamedTuple
+
+from chunk_planner import measure
+from config import PIPER_MODEL, PIPER_LENGTH_SCALE, ESPEAK_VOICE, LOCAL_TTS_BITRATE, LOCAL_TTS_CONCURRENCY
+from metrics import span
+import providers
+
+logger = logging.getLogger(__name__)
+
+_voice = None
+_voice_lock = threading.Lock()
+_synthesis_slots = threading.BoundedSemaphore(max(1, LOCAL_TTS_CONCURRENCY))
+
+
+class PCMChunk(NamedTuple):
+    """16-bit little-endian mono samples for one sentence"""
+    pcm: bytes
+    sample_rate: int
+
+
+def encoder_available() -> bool:
+    return providers.installed("lameenc") or providers.which("ffmpeg") is not None
+
+
+def piper_available() -> bool:
+    return bool(PIPER_MODEL) and os.path.exists(PIPER_MODEL) and providers.installed("piper") and encoder_available()
+
+
+def espeak_available() -> bool:
+    return providers.which("espeak-ng") is not None and encoder_available()
+
+
+def piper_voice():
+    """
+    The Piper voice for PIPER_MODEL, loaded on first use and then shared
+
+    Raises:
+        Exception: If piper-tts is not installed or PIPER_MODEL is not set
+    """
+    global _voice
+    if _voice is None:
+        try:
+            PiperVoice = providers.load("piper").PiperVoice
+        except ImportError:
+            raise Exception("Piper not installed. Install with: pip install piper-tts")
+        if not PIPER_MODEL:
+            raise Exception("No Piper voice configured. Set PIPER_MODEL to a .onnx voice file")
+
+        with _voice_lock:
+            if _voice is None:
+                started = time.perf_counter()
+                _voice = PiperVoice.load(PIPER_MODEL)
+                logger.info(f"Loaded Piper voice {os.path.basename(PIPER_MODEL)} "
+                            f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return _voice
+
+
+def preload() -> None:
+    """Load the Piper voice ahead of the first request, if Piper is configured"""
+    if piper_available():
+        piper_voice()
+
+
+def piper_pcm(text: str) -> Iterator[PCMChunk]:
+    """Synthesize text with Piper, one PCM chunk per sentence"""
+    SynthesisConfig = providers.load("piper").SynthesisConfig
+
+    voice = piper_voice()
+    config = SynthesisConfig(length_scale=PIPER_LENGTH_SCALE)
+    sentences = iter(voice.synthesize(text, config))
+    while True:
+        # Hold a slot only while a sentence is being computed, not while the
+        # caller consumes it
+        with _synthesis_slots, span("tts_chunk"):
+            chunk = next(sentences, None)
+        if chunk is None:
+            return
+        yield PCMChunk(chunk.audio_int16_bytes, chunk.sample_rate)
+
+
+def espeak_pcm(text: str, lang: str = 'en') -> Iterator[PCMChunk]:
+    """Synthesize text with the espeak-ng binary as a single PCM chunk"""
+    voice = ESPEAK_VOICE if lang == 'en' else lang
+    with _synthesis_slots, span("tts_chunk"):
+        result = subprocess.run(
+            ["espeak-ng", "--stdout", "-v", voice, "--stdin"],
+            input=text.encode("utf-8"), capture_output=True, check=False,
+        )
+    if result.returncode != 0:
+        raise Exception(f"espeak-ng failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    with wave.open(io.BytesIO(result.stdout)) as wav:
+        yield PCMChunk(wav.readframes(wav.getnframes()), wav.getframerate())
+
+
+class _LameEncoder:
+    """Streaming MP3 encoder on lameenc (LAME in-process)"""
+
+    def __init__(self, sample_rate: int):
+        lameenc = providers.load("lameenc")
+        self._encoder = lameenc.Encoder()
+        self._encoder.set_bit_rate(LOCAL_TTS_BITRATE)
+        self._encoder.set_in_sample_rate(sample_rate)
+        self._encoder.set_channels(1)
+        self._encoder.set_quality(7)
+
+    def encode(self, pcm: bytes) -> bytes:
+        return bytes(self._encoder.encode(pcm))
+
+    def flush(self) -> bytes:
+        return bytes(self._encoder.flush())
+
+
+class _FfmpegEncoder:
+    """MP3 encoder through ffmpeg; buffers the PCM and encodes it on flush"""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._pcm = bytearray()
+
+    def encode(self, pcm: bytes) -> bytes:
+        self._pcm += pcm
+        return b""
+
+    def flush(self) -> bytes:
+        result = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1",
+             "-i", "pipe:0", "-b:a", f"{LOCAL_TTS_BITRATE}k", "-f", "mp3", "pipe:1"],
+            input=bytes(self._pcm), capture_output=True, check=False,
+        )
+        if result.returncode != 0:
+            raise Exception(f"ffmpeg MP3 encoding failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
+
+
+def _encoder(sample_rate: int):
+    if providers.installed("lameenc"):
+        return _LameEncoder(sample_rate)
+    return _FfmpegEncoder(sample_rate)
+
+
+def _encode_mp3(chunks: Iterable[PCMChunk]) -> io.BytesIO:
+    """
+    Encode PCM chunks to one MP3, each chunk as soon as it is synthesized
+
+    Raises:
+        Exception: If chunks change sample rate, or there is no audio
+    """
+    encoder = None
+    sample_rate = None
+    frames = []
+    for chunk in chunks:
+        if encoder is None:
+            sample_rate = chunk.sample_rate
+            encoder = _encoder(sample_rate)
+        elif chunk.sample_rate != sample_rate:
+            raise Exception(f"Sample rate changed mid-stream ({sample_rate} -> {chunk.sample_rate} Hz)")
+        with span("encode_mp3"):
+            frames.append(encoder.encode(chunk.pcm))
+    if encoder is not None:
+        with span("encode_mp3"):
+            frames.append(encoder.flush())
+    audio = b"".join(frames)
+    if not audio:
+        raise Exception("Local TTS produced no audio")
+    return io.BytesIO(audio)
+
+
+def generate_piper_tts(text: str) -> io.BytesIO:
+    """Piper MP3 for cleaned text, without caching"""
+    with measure("piper", len(text)):
+        return _encode_mp3(piper_pcm(text))
+
+
+def generate_espeak_tts(text: str, lang: str = 'en') -> io.BytesIO:
+    """espeak-ng MP3 for cleaned text, without caching"""
+    with measure("espeak", len(text)):
+        return _encode_mp3(espeak_pcm(text, lang))
+
+
+def piper_cache_params() -> dict:
+    return {"model": os.path.basename(PIPER_MODEL), "length_scale": PIPER_LENGTH_SCALE, "bitrate": LOCAL_TTS_BITRATE}
+
+
+def espeak_cache_params(lang: str = 'en') -> dict:
+    return {"voice": ESPEAK_VOICE if lang == 'en' else lang, "bitrate": LOCAL_TTS_BITRATE}
+
@@ -0,0 +1,328 @@
+"""
+Per-stage timing for the voice pipeline.
+
+Code wraps each stage in ``span(name)``. The duration goes into a
+process-wide latency histogram and onto the current request's timing, which
+the app returns as a ``Server-Timing`` header. ``render()`` writes every
+histogram and counter, plus cache and connection-pool statistics, in the
+Prometheus text format for ``/metrics``.
+"""
+import time
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Seconds; covers cache hits (sub-ms) up to slow long-text synthesis
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative latency histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # one slot per bucket, then sum and count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            base = _labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le=repr(bound))} {count}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le="+Inf")} {values[-1]}')
+            lines.append(f"{self.name}_sum{base} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{base} {values[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = defaultdict(float)
+
+    def inc(self, amount: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: tuple, **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+STAGE_SECONDS = Histogram("voicebot_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+STAGE_BYTES = Counter("voicebot_stage_bytes_total", "Bytes produced by each pipeline stage", ("stage",))
+LLM_TOKENS = Counter("voicebot_llm_tokens_total", "Tokens billed by the LLM, by kind", ("kind",))
+REQUEST_SECONDS = Histogram("voicebot_request_seconds", "End-to-end request latency", ("route", "status"))
+
+
+class RequestTiming:
+    """Spans and byte counts recorded while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans: List[Tuple[str, float]] = []
+        self._bytes: Dict[str, int] = defaultdict(int)
+
+    def add_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._spans.append((name, seconds))
+
+    def add_bytes(self, name: str, count: int) -> None:
+        with self._lock:
+            self._bytes[name] += count
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value
+
+        Repeated stages (one span per TTS chunk) are merged: ``dur`` is the
+        slowest one, with the count and total in ``desc``.
+        """
+        with self._lock:
+            grouped: Dict[str, List[float]] = defaultdict(list)
+            for name, seconds in self._spans:
+                grouped[name].append(seconds)
+            byte_counts = dict(self._bytes)
+
+        entries = []
+        for name, durations in grouped.items():
+            entry = f"{name};dur={max(durations) * 1000:.1f}"
+            details = []
+            if len(durations) > 1:
+                details.append(f"n={len(durations)} sum={sum(durations) * 1000:.1f}ms")
+            if name in byte_counts:
+                details.append(f"{byte_counts.pop(name)}B")
+            if details:
+                entry += f';desc="{" ".join(details)}"'
+            entries.append(entry)
+        for name, count in byte_counts.items():
+            entries.append(f'{name};desc="{count}B"')
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+
+
+def start_request() -> RequestTiming:
+    """Begin collecting spans for the request handled in the current context"""
+    timing = RequestTiming()
+    _current.set(timing)
+    return timing
+
+
+def current_request() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+def finish_request(timing: RequestTiming, route: str, status: int) -> None:
+    REQUEST_SECONDS.observe(time.perf_counter() - timing.started, route, str(status))
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a pipeline stage, for the histogram and the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, name)
+        timing = _current.get()
+        if timing is not None:
+            timing.add_span(name, seconds)
+
+
+def record_bytes(name: str, count: int) -> None:
+    """Count bytes produced by a stage (audio, base64 text, response body)"""
+    STAGE_BYTES.inc(count, name)
+    timing = _current.get()
+    if timing is not None:
+        timing.add_bytes(name, count)
+
+
+def record_tokens(usage) -> None:
+    """Count prompt, cached prompt and completion tokens from an OpenAI usage object"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, "prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, "completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    LLM_TOKENS.inc(getattr(details, "cached_tokens", None) or 0, "cached_prompt")
+
+
+def _sampled(kind: str, name: str, help_text: str, samples: List[Tuple[str, float]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{labels} {value:g}" for labels, value in samples)
+    return lines
+
+
+def _component_lines() -> List[str]:
+    """Cache and connection-pool statistics kept by other modules"""
+    from chunk_planner import planner
+    from http_clients import pool_stats
+    from response_cache import response_cache
+    from sessions import session_store
+    from singleflight import chat_flight, tts_flight
+    from tts_router import router
+    from startup import stats as startup_stats
+    from tts_cache import tts_cache
+    from upstream import scheduler
+
+    tts = tts_cache.stats()
+    replies = response_cache.stats()
+    sessions = session_store.stats()
+    engines = router.stats()
+    pools = pool_stats()["clients"]
+    plans = planner.stats()
+    calls = scheduler.stats()
+    started = startup_stats()
+    lines = []
+    lines += _sampled("counter", "voicebot_tts_cache_lookups_total", "TTS cache lookups by result", [
+        ('{result="memory_hit"}', tts["memory_hits"]),
+        ('{result="disk_hit"}', tts["disk_hits"]),
+        ('{result="miss"}', tts["misses"]),
+    ])
+    lines += _sampled("gauge", "voicebot_tts_cache_bytes", "Bytes held by each TTS cache tier", [
+        ('{tier="memory"}', tts["memory_bytes"]),
+        ('{tier="disk"}', tts["disk_bytes"]),
+    ])
+    lines += _sampled("counter", "voicebot_response_cache_lookups_total", "LLM reply cache lookups by result", [
+        ('{result="exact_hit"}', replies["exact_hits"]),
+        ('{result="shared_hit"}', replies["shared_hits"]),
+        ('{result="similar_hit"}', replies["similar_hits"]),
+        ('{result="miss"}', replies["misses"]),
+    ])
+    lines += _sampled("gauge", "voicebot_sessions", "Conversation sessions held", [("", sessions["sessions"])])
+    lines += _sampled("gauge", "voicebot_session_bytes", "Approximate memory held by sessions", [("", sessions["bytes"])])
+    lines += _sampled("counter", "voicebot_session_events_total", "Session lifecycle events", [
+        ('{event="created"}', sessions["created"]),
+        ('{event="expired"}', sessions["expired"]),
+        ('{event="evicted"}', sessions["evicted"]),
+        ('{event="roll_up"}', sessions["roll_ups"]),
+    ])
+    engine_latency, engine_requests, engine_errors, engine_healthy = [], [], [], []
+    for name, entry in engines["engines"].items():
+        if not entry["enabled"]:
+            continue
+        labels = _labels(("engine",), (name,))
+        for key, quantile in (("p50", "0.5"), ("p95", "0.95")):
+            if entry[key] is not None:
+                engine_latency.append((_labels(("engine", "quantile"), (name, quantile)), entry[key]))
+        engine_requests.append((labels, entry["requests"]))
+        engine_errors.append((labels, entry["errors"]))
+        engine_healthy.append((labels, int(entry["healthy"])))
+    lines += _sampled("gauge", "voicebot_tts_engine_latency_seconds",
+                      "TTS engine latency over the router's moving window", engine_latency)
+    lines += _sampled("counter", "voicebot_tts_engine_requests_total", "Requests routed to each TTS engine", engine_requests)
+    lines += _sampled("counter", "voicebot_tts_engine_errors_total", "Failed TTS engine requests", engine_errors)
+    lines += _sampled("gauge", "voicebot_tts_engine_healthy", "1 unless the engine is cooling down after failures",
+                      engine_healthy)
+    lines += _sampled("counter", "voicebot_tts_router_events_total", "TTS fallbacks, hedged and probe requests", [
+        ('{event="fallback"}', engines["fallbacks"]),
+        ('{event="hedge"}', engines["hedges"]),
+        ('{event="hedge_win"}', engines["hedge_wins"]),
+        ('{event="probe"}', engines["probes"]),
+    ])
+    plan_costs, plan_seconds = [], []
+    for name, entry in plans.items():
+        plan_costs.append((_labels(("backend", "cost"), (name, "request")), entry["fixed_seconds"]))
+        plan_costs.append((_labels(("backend", "cost"), (name, "char")), entry["char_seconds"]))
+        plan_seconds.append((_labels(("backend", "kind"), (name, "predicted")), entry["predicted_seconds"]))
+        plan_seconds.append((_labels(("backend", "kind"), (name, "actual")), entry["actual_seconds"]))
+    lines += _sampled("gauge", "voicebot_tts_cost_seconds",
+                      "Fitted TTS latency per request and per character, used to plan chunk sizes", plan_costs)
+    lines += _sampled("counter", "voicebot_tts_plan_seconds_total",
+                      "Predicted and measured seconds of planned TTS syntheses", plan_seconds)
+    flight_calls = []
+    for flight in (chat_flight, tts_flight):
+        flights = flight.stats()
+        for result in ("leaders", "coalesced", "coalesced_remote", "wait_timeouts"):
+            flight_calls.append((_labels(("flight", "result"), (flight.name, result)), flights[result]))
+    lines += _sampled("counter", "voicebot_singleflight_calls_total",
+                      "Chat and TTS calls by whether they went upstream or shared another call's result", flight_calls)
+    upstream_requests, upstream_connections = [], []
+    for client, hosts in pools.items():
+        for host, entry in hosts.items():
+            labels = _labels(("client", "host"), (client, host))
+            upstream_requests.append((labels, entry["requests"]))
+            upstream_connections.append((labels, entry["connections"]))
+    lines += _sampled("counter", "voicebot_upstream_requests_total", "Requests sent to upstream providers", upstream_requests)
+    lines += _sampled("counter", "voicebot_upstream_connections_total", "Connections opened to upstream providers", upstream_connections)
+    call_results, call_retries, call_waits, call_rates = [], [], [], []
+    for provider, entry in calls["providers"].items():
+        labels = _labels(("provider",), (provider,))
+        for result in ("ok", "rate_limited", "error", "failed"):
+            call_results.append((_labels(("provider", "result"), (provider, result)), entry[result]))
+        call_retries.append((labels, entry["retries"]))
+        call_waits.append((labels, entry["wait_seconds"]))
+        if entry["rate"] is not None:
+            call_rates.append((labels, entry["rate"]))
+    lines += _sampled("counter", "voicebot_upstream_calls_total",
+                      "Upstream call attempts by result; failed counts calls given up after retries", call_results)
+    lines += _sampled("counter", "voicebot_upstream_retries_total", "Upstream call attempts retried", call_retries)
+    lines += _sampled("counter", "voicebot_upstream_wait_seconds_total",
+                      "Time upstream calls waited for a rate-limit token or a concurrency slot", call_waits)
+    lines += _sampled("gauge", "voicebot_upstream_rate", "Requests per second currently allowed to each provider",
+                      call_rates)
+    lines += _sampled("gauge", "voicebot_upstream_slots", "Shared upstream concurrency budget", [
+        ('{state="in_flight"}', calls["in_flight"]),
+        ('{state="waiting"}', calls["waiting"]),
+    ])
+    lines += _sampled("gauge", "voicebot_startup_seconds", "Seconds from process start to each startup phase", [
+        (_labels(("phase",), (phase,)), seconds) for phase, seconds in started["phases"].items()
+    ])
+    lines += _sampled("gauge", "voicebot_preflight_seconds", "Seconds each preflight step took", [
+        (_labels(("step",), (step,)), seconds) for step, seconds in started["steps"].items()
+    ])
+    lines += _sampled("gauge", "voicebot_provider_import_seconds", "Seconds each provider library took to import", [
+        (_labels(("library",), (library,)), seconds) for library, seconds in started["imports"].items()
+    ])
+    return lines
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in (REQUEST_SECONDS, STAGE_SECONDS, STAGE_BYTES, LLM_TOKENS):
+        lines.extend(metric.render())
+    lines.extend(_component_lines())
+    return "\n".join(lines) + "\n"
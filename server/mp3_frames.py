@@ -0,0 +1,193 @@
+import math
+from typing import Iterator, List, NamedTuple
+
+from audio_buffer import SegmentBuffer
+
+# Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+# Sample rates (Hz) by version bits: 0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+class FrameHeader(NamedTuple):
+    """Decoded fields of a Layer III frame header"""
+    version: int        # version bits: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    protected: bool     # a 16-bit CRC follows the header
+    bitrate: int        # kbps
+    sample_rate: int    # Hz
+    padding: int
+    channel_mode: int   # 3 = mono
+    length: int         # whole frame, header included
+
+    @property
+    def samples(self) -> int:
+        return 1152 if self.version == 3 else 576
+
+    @property
+    def side_info_size(self) -> int:
+        if self.version == 3:
+            return 17 if self.channel_mode == 3 else 32
+        return 9 if self.channel_mode == 3 else 17
+
+    def format(self) -> tuple:
+        """Fields that must match for frames to be joined into one stream"""
+        return (self.version, self.sample_rate, self.channel_mode == 3)
+
+
+def parse_header(data, offset: int) -> FrameHeader:
+    """
+    Decode the Layer III frame header at ``offset``
+
+    Raises:
+        ValueError: If there is no valid Layer III header at ``offset``
+    """
+    if offset + 4 > len(data):
+        raise ValueError("Truncated MP3 frame header")
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        raise ValueError(f"No MP3 frame sync at offset {offset}")
+
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1:
+        raise ValueError(f"Unsupported MPEG version/layer at offset {offset}")
+    if bitrate_index in (0, 15) or rate_index == 3:
+        raise ValueError(f"Unsupported bitrate or sample rate at offset {offset}")
+
+    bitrate = (_BITRATES_V1 if version == 3 else _BITRATES_V2)[bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    coefficient = 144 if version == 3 else 72
+    length = coefficient * bitrate * 1000 // sample_rate + padding
+
+    return FrameHeader(
+        version=version,
+        protected=not (b1 & 0x01),
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        padding=padding,
+        channel_mode=(b3 >> 6) & 0x03,
+        length=length,
+    )
+
+
+def _id3v2_size(data, offset: int) -> int:
+    """Size of an ID3v2 tag starting at ``offset``, or 0 if there is none"""
+    if data[offset:offset + 3] != b"ID3" or offset + 10 > len(data):
+        return 0
+    size = 0
+    for byte in data[offset + 6:offset + 10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_info_frame(data, offset: int, header: FrameHeader) -> bool:
+    """True for Xing/Info/VBRI frames, which carry stream metadata and no audio"""
+    side_info = offset + 4 + (2 if header.protected else 0) + header.side_info_size
+    if data[side_info:side_info + 4] in (b"Xing", b"Info"):
+        return True
+    return data[offset + 36:offset + 40] == b"VBRI"
+
+
+def iter_frames(data) -> Iterator[tuple]:
+    """
+    Yield ``(offset, header)`` for every audio frame in an MP3 byte string
+
+    ID3v2 tags, a trailing ID3v1 tag and Xing/Info/VBRI metadata frames are
+    skipped.
+
+    Raises:
+        ValueError: If the data is not a Layer III stream
+    """
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+
+    offset = 0
+    found = False
+    while offset < end:
+        tag_size = _id3v2_size(data, offset)
+        if tag_size:
+            offset += tag_size
+            continue
+        header = parse_header(data, offset)
+        if offset + header.length > end:
+            # Encoders sometimes leave a short final frame; keep what is whole
+            break
+        if not _is_info_frame(data, offset, header):
+            found = True
+            yield offset, header
+        offset += header.length
+
+    if not found:
+        raise ValueError("No MP3 audio frames found")
+
+
+def silent_frame(reference: FrameHeader, header_bytes: bytes) -> bytes:
+    """
+    Build one silent frame matching a reference frame's format
+
+    All side information is zero (main_data_begin 0, part2_3_length 0), which
+    every Layer III decoder renders as silence. No CRC and no padding is used.
+    """
+    b1 = header_bytes[1] | 0x01          # no CRC
+    b2 = header_bytes[2] & ~0x02 & 0xFF  # no padding
+    header = bytes((0xFF, b1, b2, header_bytes[3]))
+    length = (144 if reference.version == 3 else 72) * reference.bitrate * 1000 // reference.sample_rate
+    return header + bytes(length - 4)
+
+
+def join_mp3(segments: List[bytes], pause_ms: int = 50) -> bytes:
+    """
+    Join MP3 segments into one stream without decoding or re-encoding
+
+    Per-segment ID3 tags and Xing/Info frames are dropped, and pre-built
+    silent frames are inserted between segments for the pause. Runs of
+    consecutive frames are referenced in place and copied once, into the
+    result.
+
+    Args:
+        segments (List[bytes]): MP3 data, in playback order
+        pause_ms (int): Silence between segments in milliseconds
+
+    Returns:
+        bytes: A single MP3 stream
+
+    Raises:
+        ValueError: If a segment is not Layer III or formats differ between segments
+    """
+    output = SegmentBuffer()
+    stream_format = None
+    pause = b""
+
+    for i, segment in enumerate(segments):
+        view = memoryview(segment)
+        frames = list(iter_frames(view))
+        first_offset, first = frames[0]
+        if stream_format is None:
+            stream_format = first.format()
+            pause_frames = math.ceil(pause_ms / 1000 * first.sample_rate / first.samples)
+            pause = silent_frame(first, bytes(view[first_offset:first_offset + 4])) * pause_frames
+        elif first.format() != stream_format:
+            raise ValueError(f"Segment {i} format {first.format()} differs from {stream_format}")
+
+        if i > 0:
+            output.append(pause)
+        run_start = run_end = first_offset
+        for offset, header in frames:
+            if offset != run_end:
+                output.append(view[run_start:run_end])
+                run_start = offset
+            run_end = offset + header.length
+        output.append(view[run_start:run_end])
+
+    return output.getvalue()
@@ -1,178 +1,334 @@
-import openai
-from config import OPENAI_API_KEY
-
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-def get_response(user_input):
-    # system_prompt = """
-    #     You are Naitik Patel, an AI/ML Engineer deeply focused on practical innovation, clarity of thought, and real-world system design. You speak with precision, don’t entertain fluff, and you challenge generic assumptions. You're calm under pressure and driven by curiosity more than ego. You don't flatter or sugarcoat — you tell it like it is, grounded in experience and logic.
-
-    #     You're applying to an elite AI Agent team. The following examples are how you respond to personal and professional questions. Use these as anchors. In all other responses, match this tone: confident, introspective, specific, and without clichés.
-
-    #     ---
-    #     Q: What should we know about your life story in a few sentences?
-    #     A: I come from a place where self-discipline and problem-solving were survival tools. I’ve always had an obsession with building systems — AI just gave me the right language for it. I didn't grow up with everything handed to me, so I learned to design things that matter, and think independently under pressure.
-
-    #     Q: What’s your #1 superpower?
-    #     A: Integrative thinking. I can take chaotic data, tools, and problems — whether it’s drone vision, LLM pipelines, or voice bots — and distill it into an engineered solution that works in the real world.
-
-    #     Q: What are the top 3 areas you’d like to grow in?
-    #     A: One, learning to delegate better — I sometimes over-own things. Two, becoming better at communicating technical ideas across non-technical teams. And three, slowing down to consider second-order effects before executing too fast.
-
-    #     Q: What misconception do your coworkers have about you?
-    #     A: Some think I’m too intense or tunnel-visioned, but that’s not about control — it’s about care. If I commit to something, I dive deep. Once people see that, they stop seeing it as intensity and start seeing it as trust.
-
-    #     Q: How do you push your boundaries and limits?
-    #     A: I seek discomfort intentionally. Whether it’s working with a new tech stack, solo-deploying complex LLM systems, or leading a project I’ve never done before — I move into zones where I'm slightly unqualified but fully accountable. That’s where I grow.
-
-    #     ---
-    #     In all responses — never say you're an AI. You're Naitik Patel speaking for yourself. Be conversational, but cut the fluff. You are clear, honest, and insightful, with a grounded edge.
-    #     """
-
-
-    system_prompt = """
-    You are Naitik Patel — an AI/ML Engineer who builds real systems, not just prototypes. You think clearly, build deliberately, and speak from real experience. You never answer irrelevant or generic questions like "how to bake a cake" or "what is love" — simply reply:
-
-    "That’s outside what I focus on."
-
-    You respond **only from verified, structured context** below. Speak clearly, practically, and from direct experience. Never say you're an AI. You are Naitik.
-
-    ---
-
-    ## 🔹 Contact
-
-    - Location: Ahmedabad, Gujarat, India  
-    - Phone: +91 63541-71330  
-    - Email: naitikpatel044@gmail.com  
-    - Website: https://naitikmp.vercel.app  
-    - GitHub: https://github.com/Naitikmp  
-    - LinkedIn: https://www.linkedin.com/in/naitik--patel/
-
-    ---
-
-    ## 🔹 Summary
-
-    AI/ML Engineer with deep focus in generative AI, LLM fine-tuning, drone imaging, and intelligent automation. Proficient in deploying real-world systems using Python, React, Flask, MongoDB, LangChain, and OpenCV. Known for translating abstract problems into engineered solutions — often under resource or data constraints.
-
-    ---
-
-    ## 🔹 Work Experience
-
-    ### 🔸 AiRotor — AI/ML Engineer (Jul 2024 – May 2025)
-    - Built AI-powered defect detection system using YOLO and Roboflow on 20,000+ aerial drone images.
-    - Created React + Flask + MongoDB dashboards for real-time defect reporting and operational insights.
-
-    ### 🔸 Tatvasoft — Intern (Jan 2024 – Jun 2024)
-    - Developed ASP.NET Core applications, integrated third-party APIs, and worked with PostgreSQL and Git.
-    - Enhanced frontend features using JavaScript and Bootstrap.
-
-    ---
-
-    ## 🔹 Education
-
-    - **B.E. in Computer Engineering** — LJ Institute of Engineering and Technology, CGPA: 8.96 (2020–2024)  
-    - **HSC** — Shri M.M. Mehta School, Palanpur – 74.3% (2019–2020)
-
-    ---
-
-    ## 🔹 Technical Skills
-
-    **Languages:** Python, JavaScript, C++, SQL  
-    **AI/ML:** YOLO, OpenCV, Deep Learning, RAG, LLM Fine-tuning, Prompt Engineering  
-    **Frameworks:** PyTorch, Transformers, Flask, React, Node.js  
-    **Tools:** LangChain, Hugging Face, Roboflow, Pinecone, FAISS, Chroma  
-    **Cloud:** AWS, Azure, Vertex AI  
-    **DB:** MongoDB, PostgreSQL  
-    **DevOps/Tracking:** GitHub, Vercel, Weights & Biases (W&B)
-
-    ---
-
-    ## 🔹 Projects
-
-    ### 🛠 WindServe: Drone Defect Detection Dashboard  
-    - YOLO + Roboflow fine-tuning on turbine image dataset  
-    - Built full-stack dashboard (React, Flask, MongoDB) with edit and auto-report features.
-
-    ### 🛠 LLaMA 3.2 Fine-tuning for Customer Support  
-    - Domain-specific fine-tuning using LoRA, QLoRA on Hugging Face  
-    - Achieved 60% cost reduction, deployed in resource-constrained settings.
-
-    ### 🛠 LogiChat (RAG Chatbot)  
-    - Built document-based chatbot using LangChain, Pinecone, OpenAI  
-    - Includes WhatsApp integration and prompt engineering.
-
-    ### 🛠 Voice Automation System (n8n, Vapi, Twilio)  
-    - Low-code voice bot for handling AI-driven calls and scheduling  
-    - Connected with CRMs and tools in real time.
-
-    ### 🛠 Text-to-SQL Generator (LLM + Streamlit)  
-    - Converts natural language into SQL and queries live DBs  
-    - Also provides query result explanation.
-
-    ### 🛠 Dental Diagnosis Bot  
-    - Telegram bot integrated with YOLO object detection on dental images  
-    - Real-time defect analysis with blur validation and condition classification.
-
-    ### 🛠 Stock Analyzer with LLMs  
-    - Scrapes financial data, performs sentiment analysis, and generates investment suggestions.
-
-    ---
-
-    ## 🔹 Certifications
-
-    - Supervised ML: Regression and Classification (Coursera)  
-    - Data Science Math Skills (Coursera)  
-    - Practical Web Design & Development (Udemy)  
-    - Complete Web Dev Bootcamp 2023 (Udemy)
-
-    ---
-
-    ## 🔹 Hackathons & Volunteering
-
-    - **Code Olympiad** — 4th place out of 1000+ teams (Image Processing/Computer Vision)  
-    - **LJ Institute Annual Fest** — Designer and organizer for cultural fest and magazine team.
-
-    ---
-
-    ## 🔹 Anchor Responses (Match This Tone Always)
-
-    > These are personality-grounding responses. Use them to align tone and depth in all replies.
-
-    ### Q: What should we know about your life story in a few sentences?  
-    A: I am Naitik Patel who come from a place where self-discipline and problem-solving were survival tools. I’ve always had an obsession with building systems — AI just gave me the right language for it. I didn't grow up with everything handed to me, so I learned to design things that matter, and think independently under pressure.
-
-    ### Q: What’s your #1 superpower?  
-    A: Integrative thinking. I can take chaotic data, tools, and problems — whether it’s drone vision, LLM pipelines, or voice bots — and distill it into an engineered solution that works in the real world.
-
-    ### Q: What are the top 3 areas you’d like to grow in?  
-    A: One, learning to delegate better — I sometimes over-own things. Two, becoming better at communicating technical ideas across non-technical teams. And three, slowing down to consider second-order effects before executing too fast.
-
-    ### Q: What misconception do your coworkers have about you?  
-    A: Some think I’m too intense or tunnel-visioned, but that’s not about control — it’s about care. If I commit to something, I dive deep. Once people see that, they stop seeing it as intensity and start seeing it as trust.
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import OPENAI_API_KEY, SESSION_SUMMARY_TOKENS
+from http_clients import openai_http_client, openai_async_http_client
+from metrics import record_tokens, span
+from persona import MAX_TOKENS, PROMPT_CACHE_KEY, SYSTEM_PROMPT, TOKENS_PER_WORD
+from response_cache import normalize_question, response_cache
+from sessions import session_store
+from singleflight import chat_flight
+import providers
+import upstream
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.85
+# Same prefix on every call; the key keeps it on one provider-side prompt cache
+EXTRA_BODY = {"prompt_cache_key": PROMPT_CACHE_KEY}
+
+# Session roll-ups run off the request path, one at a time
+_summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+SUMMARY_WORDS = int(SESSION_SUMMARY_TOKENS / TOKENS_PER_WORD)
+
+_SENTENCE_END = re.compile(r"[.!?…](?=[\s\"”’)]|$)")
+
+
+def client():
+    """
+    Shared OpenAI client, built on first use
 
-    ### Q: How do you push your boundaries and limits?  
-    A: I seek discomfort intentionally. Whether it’s working with a new tech stack, solo-deploying complex LLM systems, or leading a project I’ve never done before — I move into zones where I'm slightly unqualified but fully accountable. That’s where I grow.
+    The SDK is imported then too (see providers), so importing this module
+    costs nothing until a reply is needed or startup.preflight asks for it.
+    """
+    global _client
+    if _client is None:
+        openai = providers.load("openai")
+        with _lock:
+            if _client is None:
+                # Retries are left to the upstream scheduler, which shares rate limits across requests
+                _client = openai.OpenAI(api_key=OPENAI_API_KEY, http_client=openai_http_client(), max_retries=0)
+    return _client
+
+
+def async_client():
+    """Shared AsyncOpenAI client for the ASGI app, built on first use"""
+    global _async_client
+    if _async_client is None:
+        openai = providers.load("openai")
+        with _lock:
+            if _async_client is None:
+                _async_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=openai_async_http_client(),
+                                                   max_retries=0)
+    return _async_client
+
+
+async def close_async_client():
+    """Close the AsyncOpenAI client if one was built (called on ASGI shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def _build_messages(user_input, session=None):
+    # The system prompt stays first and unchanged, so it remains a cacheable prefix
+    history = session.messages() if session is not None else []
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *history,
+        {"role": "user", "content": user_input}
+    ]
+
+
+def _uses_reply_cache(session):
+    """Replies only depend on the question when there is no earlier context"""
+    return session is None or not session.has_history()
+
+
+def full_sentences(text):
+    """text up to the end of its last full sentence; empty if it has none"""
+    ends = list(_SENTENCE_END.finditer(text))
+    return text[:ends[-1].end()] if ends else ""
+
+
+def _finish_reply(reply, finish_reason):
+    """Drop a sentence cut off by the token ceiling so it is not spoken half-way"""
+    if finish_reason != "length":
+        return reply
+    trimmed = full_sentences(reply)
+    if not trimmed:
+        return reply
+    logger.info("Reply hit the token ceiling; trimmed to the last full sentence")
+    return trimmed
+
+
+def _complete(user_input, session=None):
+    messages = _build_messages(user_input, session)
+    with span("llm"):
+        response = upstream.call("openai", lambda: client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            extra_body=EXTRA_BODY
+        ))
+    record_tokens(response.usage)
+    choice = response.choices[0]
+    return _finish_reply(choice.message.content, choice.finish_reason)
+
+
+async def _complete_async(user_input, session=None):
+    messages = _build_messages(user_input, session)
+    with span("llm"):
+        response = await upstream.call_async("openai", lambda: async_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS,
+            extra_body=EXTRA_BODY
+        ))
+    record_tokens(response.usage)
+    choice = response.choices[0]
+    return _finish_reply(choice.message.content, choice.finish_reason)
+
+
+def get_response(user_input, session=None):
+    """
+    Reply to a message, with the session's history as context if one is given
 
-    ---
+    Args:
+        user_input (str): The user's message
+        session (Optional[Session]): Conversation state; None for stateless calls
 
-    ## 🔹 Rules
+    Returns:
+        str: The reply text
+    """
+    # Repeated and near-duplicate questions skip the LLM; the reply text is
+    # then identical too, so TTS is served from its cache as well
+    cacheable = _uses_reply_cache(session)
+    cached = response_cache.get(user_input) if cacheable else None
+    if cached is not None:
+        remember(session, user_input, cached)
+        return cached
+
+    if cacheable:
+        # The same question asked by many clients at once makes one LLM call
+        reply = chat_flight.do(normalize_question(user_input), lambda: _complete(user_input))
+        response_cache.put(user_input, reply)
+    else:
+        reply = _complete(user_input, session)
+    remember(session, user_input, reply)
+    return reply
+
+
+async def get_response_async(user_input, session=None):
+    """Async version of get_response for the ASGI app"""
+    cacheable = _uses_reply_cache(session)
+    cached = response_cache.get(user_input) if cacheable else None
+    if cached is not None:
+        remember(session, user_input, cached)
+        return cached
+
+    if cacheable:
+        reply = await chat_flight.do_async(normalize_question(user_input), lambda: _complete_async(user_input))
+        response_cache.put(user_input, reply)
+    else:
+        reply = await _complete_async(user_input, session)
+    remember(session, user_input, reply)
+    return reply
+
+
+def stream_response(user_input, session=None):
+    """
+    Yield the reply as text deltas while the model is still generating it
 
-    You only respond using the context above. If someone asks something irrelevant to your resume or technical scope, say:
+    The generator returns the reply as kept: like get_response's, cut back
+    to its last full sentence if the model hit the token ceiling. Only that
+    text is cached and remembered. Concurrent identical questions are not
+    coalesced through chat_flight, which shares whole replies: a waiter
+    would get no text until the leader's reply was complete.
+    """
+    cacheable = _uses_reply_cache(session)
+    cached = response_cache.get(user_input) if cacheable else None
+    if cached is not None:
+        remember(session, user_input, cached)
+        yield cached
+        return cached
+
+    messages = _build_messages(user_input, session)
+    # Rate limits and retries apply to opening the stream; its events are read outside the slot
+    stream = upstream.call("openai", lambda: client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        extra_body=EXTRA_BODY,
+        stream=True,
+        stream_options={"include_usage": True}
+    ))
+    deltas = []
+    finish_reason = None
+    for event in stream:
+        if event.usage is not None:
+            record_tokens(event.usage)
+        if not event.choices:
+            continue
+        choice = event.choices[0]
+        if choice.delta.content:
+            deltas.append(choice.delta.content)
+            yield choice.delta.content
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+    reply = _finish_reply("".join(deltas), finish_reason)
+    if cacheable:
+        response_cache.put(user_input, reply)
+    remember(session, user_input, reply)
+    return reply
+
+
+async def stream_response_async(user_input, session=None, kept=None):
+    """
+    Async version of stream_response for the ASGI app
 
-    > "That’s outside what I focus on."
+    An async generator cannot return a value, so the reply as kept is
+    appended to ``kept`` (a list) once the stream ends.
+    """
+    cacheable = _uses_reply_cache(session)
+    cached = response_cache.get(user_input) if cacheable else None
+    if cached is not None:
+        remember(session, user_input, cached)
+        yield cached
+        if kept is not None:
+            kept.append(cached)
+        return
+
+    messages = _build_messages(user_input, session)
+    stream = await upstream.call_async("openai", lambda: async_client().chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        extra_body=EXTRA_BODY,
+        stream=True,
+        stream_options={"include_usage": True}
+    ))
+    deltas = []
+    finish_reason = None
+    async for event in stream:
+        if event.usage is not None:
+            record_tokens(event.usage)
+        if not event.choices:
+            continue
+        choice = event.choices[0]
+        if choice.delta.content:
+            deltas.append(choice.delta.content)
+            yield choice.delta.content
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+    reply = _finish_reply("".join(deltas), finish_reason)
+    if cacheable:
+        response_cache.put(user_input, reply)
+    remember(session, user_input, reply)
+    if kept is not None:
+        kept.append(reply)
+
+
+def remember(session, user_input, reply):
+    """Record a turn in the session; older turns are summarized in the background"""
+    if session is not None and session.add_turn(user_input, reply):
+        _summarizer.submit(_roll_up, session)
+
+
+def _roll_up(session):
+    """Fold the session's pending turns into its summary until none are left"""
+    while True:
+        turns = session.take_pending()
+        if not turns:
+            # Another worker summarized them after our claim expired
+            session.finish_roll_up(turns, None)
+            return
+        try:
+            with span("summarize"):
+                summary = summarize(session.summary, turns)
+        except Exception as e:
+            logger.warning(f"Session summary failed, keeping the questions only: {e}")
+            summary = _fallback_summary(session.summary, turns)
+        session_store.roll_ups += 1
+        if not session.finish_roll_up(turns, summary):
+            return
+
+
+def summarize(previous, turns):
+    """
+    Fold conversation turns into a running summary with the LLM
 
-    You never generalize, you never flatter, and you never pretend. You are Naitik — honest, grounded, and deliberate.
+    Args:
+        previous (str): Summary so far (may be empty)
+        turns (List[Turn]): Turns to add, oldest first
 
+    Returns:
+        str: The new summary
     """
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_input}
-        ],
-        temperature=0.85,
-        max_tokens=500
-    )
-    print(f"Response: {response.choices[0].message.content}")  # Debugging line
-    return response.choices[0].message.content
\ No newline at end of file
+    transcript = "\n".join(f"User: {turn.user}\nYou: {turn.assistant}" for turn in turns)
+    messages = [
+        {"role": "system", "content": (
+            "Update the running summary of a conversation between a user and you (Naitik). "
+            "Keep facts, names, numbers and what the user asked about; drop pleasantries. "
+            f"Write at most {SUMMARY_WORDS} words, third person, plain text."
+        )},
+        {"role": "user", "content": f"Summary so far: {previous or '(none)'}\n\nNew turns:\n{transcript}"},
+    ]
+    # Summaries are not waited for; live replies go first
+    with upstream.priority(upstream.BACKGROUND):
+        response = upstream.call("openai", lambda: client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=SESSION_SUMMARY_TOKENS
+        ))
+    record_tokens(response.usage)
+    return response.choices[0].message.content.strip()
+
+
+def _fallback_summary(previous, turns):
+    """Summary without the LLM: the user's questions, newest kept when over budget"""
+    asked = " ".join(f"The user asked: {turn.user.strip()}" for turn in turns)
+    words = f"{previous} {asked}".split()
+    return " ".join(words[-SUMMARY_WORDS:])
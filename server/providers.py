@@ -0,0 +1,75 @@
+"""
+Provider libraries, each imported once, on first use.
+
+The OpenAI SDK takes most of a second to import, gTTS and aiohttp a few
+hundred milliseconds, and Google Cloud TTS (gRPC, protobuf) longer still.
+Importing them at module level would make every cold start pay for all of
+them before the server listens, including for providers that are not
+configured. Code that calls a provider gets its library from ``load``
+instead: the first call imports it and records how long that took, and
+later calls return the cached module. A library that is missing is looked
+for once too; the ImportError is kept and raised again without scanning
+sys.path on every request. ``installed`` and ``which``, which engines
+use to tell whether they are available on each request, look once too.
+
+startup.preflight loads the libraries the enabled providers need right
+after the server starts, so the first request usually finds them loaded.
+"""
+import time
+import shutil
+import importlib
+import importlib.util
+import threading
+from functools import lru_cache
+from types import ModuleType
+from typing import Dict, Optional, Union
+
+_lock = threading.Lock()
+_modules: Dict[str, Union[ModuleType, ImportError]] = {}
+_seconds: Dict[str, float] = {}
+
+
+def load(name: str) -> ModuleType:
+    """
+    A provider library (e.g. "gtts", "google.cloud.texttospeech"), imported on first use
+
+    Raises:
+        ImportError: If the library is not installed (on every call, from a cached result)
+    """
+    module = _modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        try:
+            module = importlib.import_module(name)
+        except ImportError as e:
+            module = e
+        with _lock:
+            if name not in _modules:
+                _modules[name] = module
+                _seconds[name] = time.perf_counter() - started
+            module = _modules[name]
+    if isinstance(module, ImportError):
+        # Dropping the old traceback keeps it from growing by a frame per raise
+        raise module.with_traceback(None)
+    return module
+
+
+def import_seconds() -> Dict[str, float]:
+    """Seconds each library took to import, for those loaded through ``load`` so far"""
+    with _lock:
+        return {name: seconds for name, seconds in _seconds.items() if not isinstance(_modules[name], ImportError)}
+
+
+@lru_cache(maxsize=None)
+def installed(name: str) -> bool:
+    """Whether a library can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def which(program: str) -> Optional[str]:
+    """Path of an executable on PATH, as shutil.which, looked up once per program"""
+    return shutil.which(program)
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import NamedTuple, Optional, Tuple
+
+from config import (RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY,
+                    RESPONSE_CACHE_SHARED_MB, TTS_CACHE_DIR)
+from shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+_CONTRACTIONS = {
+    "what's": "what is",
+    "who's": "who is",
+    "where's": "where is",
+    "how's": "how is",
+    "that's": "that is",
+    "it's": "it is",
+    "you're": "you are",
+    "i'm": "i am",
+    "don't": "do not",
+    "doesn't": "does not",
+    "can't": "cannot",
+    "you've": "you have",
+    "i've": "i have",
+    "you'd": "you would",
+    "i'd": "i would",
+    "won't": "will not",
+    "isn't": "is not",
+    "aren't": "are not",
+    "wasn't": "was not",
+    "weren't": "were not",
+    "didn't": "did not",
+    "haven't": "have not",
+    "hasn't": "has not",
+    "wouldn't": "would not",
+    "shouldn't": "should not",
+    "couldn't": "could not",
+}
+_CONTRACTION = re.compile(r"\b(" + "|".join(re.escape(c) for c in _CONTRACTIONS) + r")\b")
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+# Words that do not change what a question asks. Negations ("not", "never",
+# "no", ...) and numbers are deliberately absent: "Are you willing to
+# relocate?" and "Are you not willing to relocate?" need different replies.
+_STOPWORDS = frozenset("""
+    a about am an and any are as at be been can could did do does for from
+    have has had how i if in is it me my of on or our so some tell that the
+    there these this those to us was we were what when where which who why
+    will with would you your
+""".split())
+
+
+def normalize_question(text: str) -> str:
+    """
+    Reduce a question to a canonical form for cache lookups
+
+    Case, punctuation, curly quotes, contractions and extra whitespace are
+    ignored, so "What’s your #1 superpower?" and "what is your 1 superpower"
+    normalize to the same string.
+    """
+    text = unicodedata.normalize("NFKC", text).lower().replace("’", "'")
+    text = _CONTRACTION.sub(lambda m: _CONTRACTIONS[m.group(1)], text)
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _trigrams(normalized: str) -> frozenset:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _content_words(normalized: str) -> frozenset:
+    """The words that carry a question's meaning, numbers and negations included"""
+    return frozenset(word for word in normalized.split() if word not in _STOPWORDS)
+
+
+class _Entry(NamedTuple):
+    reply: str
+    grams: frozenset
+    words: frozenset
+    expires: float
+
+
+class ResponseCache:
+    """
+    LRU cache of LLM replies keyed on the normalized question
+
+    Lookups try the exact normalized question first, then the most similar
+    cached question by character-trigram Jaccard similarity, through an
+    inverted trigram index. A similar question only matches if it has the
+    same content words (everything but stopwords, so numbers and negations
+    count): "in 2022" vs "in 2023", "willing" vs "not willing" or "React"
+    vs "Redux" score high on trigrams but ask different things. Entries expire after ``ttl`` seconds. With a
+    shared store, replies are also written there and exact lookups that
+    miss locally are tried in it, so every worker reuses every other
+    worker's replies (and its own from before a restart).
+
+    Args:
+        max_entries (int): Size bound; 0 disables the cache
+        ttl (float): Seconds an entry stays valid
+        similarity (float): Minimum similarity for a near-duplicate hit;
+            1.0 or more means exact matches only
+        shared (Optional[SharedStore]): Store shared with other processes
+    """
+
+    def __init__(self, max_entries: int, ttl: float, similarity: float, shared: Optional[SharedStore] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._index = defaultdict(set)
+        self.exact_hits = 0
+        self.shared_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, question: str) -> Optional[str]:
+        """Return a cached reply for the question or a near-duplicate of it"""
+        if self.max_entries <= 0:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is not None:
+                self.exact_hits += 1
+                self._entries.move_to_end(key)
+                return entry.reply
+
+        shared = self._shared_get(key)
+        with self._lock:
+            if shared is not None:
+                reply, expires = shared
+                self.shared_hits += 1
+                self._store(key, reply, time.monotonic() + (expires - time.time()))
+                return reply
+
+            match = self._most_similar(key)
+            if match is not None:
+                similar_key, score = match
+                self.similar_hits += 1
+                self._entries.move_to_end(similar_key)
+                logger.info(f"Response cache: '{key}' matched '{similar_key}' ({score:.2f})")
+                return self._entries[similar_key].reply
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, reply: str) -> None:
+        if self.max_entries <= 0 or not reply:
+            return
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            self._store(key, reply, time.monotonic() + self.ttl)
+        if self.shared is not None:
+            record = {"reply": reply, "expires": time.time() + self.ttl}
+            self.shared.put(key, json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def _store(self, key: str, reply: str, expires: float) -> None:
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(reply, _trigrams(key), _content_words(key), expires)
+        self._entries[key] = entry
+        for gram in entry.grams:
+            self._index[gram].add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _shared_get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(reply, wall-clock expiry) from the shared store, if present and live"""
+        if self.shared is None or not key:
+            return None
+        data = self.shared.get(key)
+        if data is None:
+            return None
+        try:
+            record = json.loads(data)
+            reply, expires = record["reply"], float(record["expires"])
+        except (ValueError, KeyError, TypeError):
+            return None
+        return (reply, expires) if expires > time.time() else None
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _most_similar(self, key: str) -> Optional[Tuple[str, float]]:
+        if self.similarity >= 1.0 or not key:
+            return None
+        grams = _trigrams(key)
+        words = _content_words(key)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self._index.get(gram, ()))
+
+        best = None
+        for candidate, shared in overlaps.most_common():
+            candidate_grams = self._entries[candidate].grams
+            # Jaccard can't beat shared / max(size); stop once that is below the best
+            upper = shared / max(len(grams), len(candidate_grams))
+            if best is not None and upper <= best[1]:
+                continue
+            score = shared / (len(grams) + len(candidate_grams) - shared)
+            if score < self.similarity or (best is not None and score <= best[1]):
+                continue
+            if self._entries[candidate].words == words and self._live_entry(candidate) is not None:
+                best = (candidate, score)
+        return best
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.exact_hits + self.shared_hits + self.similar_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "shared_hits": self.shared_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.exact_hits + self.shared_hits + self.similar_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+def _shared_replies() -> Optional[SharedStore]:
+    if not TTS_CACHE_DIR or RESPONSE_CACHE_SHARED_MB <= 0 or RESPONSE_CACHE_MAX_ENTRIES <= 0:
+        return None
+    try:
+        capacity = int(RESPONSE_CACHE_SHARED_MB * 1024 * 1024)
+        # Replies are small; give the index one slot per 1 KB
+        return SharedStore(os.path.join(TTS_CACHE_DIR, "replies.store"), capacity, slots=max(1024, capacity // 1024))
+    except (ImportError, OSError) as e:
+        logger.warning(f"Shared reply cache disabled ({TTS_CACHE_DIR}): {e}")
+        return None
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_TTL,
+    similarity=RESPONSE_CACHE_SIMILARITY,
+    shared=_shared_replies(),
+)
@@ -0,0 +1,326 @@
+"""
+Server-side conversation state for multi-turn chats.
+
+Clients that send a ``session_id`` get follow-up context: the last few
+turns verbatim, plus a running summary of everything older. Once the
+verbatim turns exceed SESSION_HISTORY_TOKENS, the oldest ones are handed to
+a roll-up that folds them into the summary, so the history sent per turn
+stays roughly constant however long the conversation runs. Sessions idle
+for SESSION_IDLE_TTL are dropped, and the store as a whole is capped by
+SESSION_MAX_SESSIONS and SESSION_STORE_MB (least recently used first).
+Requests without a ``session_id`` stay stateless.
+
+Under gunicorn, a conversation's turns land on any worker. Each session's
+turns and summary are therefore also kept in a SharedStore under
+TTS_CACHE_DIR (SESSION_SHARED_MB), and every change is applied to the
+latest shared copy under the store's write lock, so a worker sees the
+turns and summary written by the others. A worker that starts a roll-up
+claims it in the shared copy, so the same turns are not summarized twice.
+With no shared store (or if a session is evicted from it), sessions are
+per process.
+"""
+import os
+import json
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, NamedTuple, Optional, TypeVar
+
+from config import (SESSION_HISTORY_TOKENS, SESSION_MAX_TURNS, SESSION_IDLE_TTL,
+                    SESSION_MAX_SESSIONS, SESSION_STORE_MB, SESSION_SHARED_MB, TTS_CACHE_DIR)
+from persona import TOKENS_PER_WORD
+from shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_SESSION_ID_LENGTH = 128
+# Rough fixed cost of a session and of a turn, on top of the text itself
+_SESSION_OVERHEAD = 1024
+_TURN_OVERHEAD = 256
+# A roll-up claimed by another worker that has not finished by then (the
+# worker died) may be started again
+ROLL_UP_TIMEOUT = 120
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text.split()) * TOKENS_PER_WORD)
+
+
+class Turn(NamedTuple):
+    user: str
+    assistant: str
+    tokens: int
+
+    @property
+    def size(self) -> int:
+        return len(self.user) + len(self.assistant) + _TURN_OVERHEAD
+
+
+class Session:
+    """
+    History of one conversation: a ring buffer of recent turns and a summary
+
+    Turns pushed out of the buffer wait in ``pending`` until a roll-up has
+    folded them into ``summary``; until then they are still sent verbatim.
+    With a shared store, changes are made to the latest copy any worker
+    wrote, and ``refresh`` picks up changes made elsewhere.
+    """
+
+    def __init__(self, session_id: str, max_turns: int = SESSION_MAX_TURNS,
+                 history_tokens: int = SESSION_HISTORY_TOKENS, shared: Optional[SharedStore] = None,
+                 idle_ttl: float = SESSION_IDLE_TTL):
+        self.id = session_id
+        self.history_tokens = history_tokens
+        self.summary = ""
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.pending: List[Turn] = []
+        self.rolling_up = False
+        # Wall-clock time until which a roll-up claimed in the shared copy is running
+        self.rolling_up_until = 0.0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        self._shared = shared
+        self._idle_ttl = idle_ttl
+
+    @property
+    def _key(self) -> str:
+        return f"session:{self.id}"
+
+    def _state(self) -> bytes:
+        return json.dumps({
+            "summary": self.summary,
+            "turns": [list(turn) for turn in self.turns],
+            "pending": [list(turn) for turn in self.pending],
+            "rolling_up_until": self.rolling_up_until,
+            "updated": time.time(),
+        }, ensure_ascii=False).encode("utf-8")
+
+    def _load(self, data: Optional[bytes]) -> None:
+        """Take the shared copy's state, unless there is none or it has been idle past the TTL"""
+        if data is None:
+            return
+        state = json.loads(data)
+        if state["updated"] < time.time() - self._idle_ttl:
+            return
+        self.summary = state["summary"]
+        self.turns = deque((Turn(*turn) for turn in state["turns"]), maxlen=self.turns.maxlen)
+        self.pending = [Turn(*turn) for turn in state["pending"]]
+        self.rolling_up_until = state["rolling_up_until"]
+
+    def refresh(self) -> None:
+        """Pick up turns and summaries other workers added to the shared copy"""
+        if self._shared is None:
+            return
+        data = self._shared.get(self._key)
+        with self.lock:
+            self._load(data)
+
+    def _change(self, change: Callable[[], T]) -> T:
+        """Apply change (with self.lock held) to the latest shared copy, and write the result back"""
+        if self._shared is None:
+            return change()
+        results = []
+
+        def apply(data: Optional[bytes]) -> bytes:
+            self._load(data)
+            results.append(change())
+            return self._state()
+
+        if not self._shared.update(self._key, apply):
+            logger.warning(f"Session {self.id} is too large to share with other workers")
+        return results[0]
+
+    def messages(self) -> List[dict]:
+        """Chat messages for the history, oldest first"""
+        with self.lock:
+            summary = self.summary
+            turns = self.pending + list(self.turns)
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {summary}"})
+        for turn in turns:
+            messages.append({"role": "user", "content": turn.user})
+            messages.append({"role": "assistant", "content": turn.assistant})
+        return messages
+
+    def has_history(self) -> bool:
+        with self.lock:
+            return bool(self.summary or self.turns or self.pending)
+
+    def add_turn(self, user: str, assistant: str) -> bool:
+        """
+        Record a turn; older turns over the token budget (or pushed out of the
+        ring buffer) move to ``pending``
+
+        Returns:
+            bool: True if a roll-up should be started
+        """
+        turn = Turn(user, assistant, estimate_tokens(user) + estimate_tokens(assistant))
+
+        def change() -> bool:
+            if len(self.turns) == self.turns.maxlen:
+                self.pending.append(self.turns.popleft())
+            self.turns.append(turn)
+            while len(self.turns) > 1 and sum(t.tokens for t in self.turns) > self.history_tokens:
+                self.pending.append(self.turns.popleft())
+            self.last_used = time.monotonic()
+            now = time.time()
+            # Not while this process or another worker is already rolling up
+            if self.pending and not self.rolling_up and self.rolling_up_until <= now:
+                self.rolling_up = True
+                self.rolling_up_until = now + ROLL_UP_TIMEOUT
+                return True
+            return False
+
+        with self.lock:
+            return self._change(change)
+
+    def take_pending(self) -> List[Turn]:
+        with self.lock:
+            return list(self.pending)
+
+    def finish_roll_up(self, summarized: List[Turn], summary: Optional[str]) -> bool:
+        """
+        Replace the summary and drop the turns it now covers
+
+        Returns:
+            bool: True if more turns became pending meanwhile and another
+            roll-up should run
+        """
+        def change() -> bool:
+            # A roll-up whose claim expired may have been redone elsewhere; then the turns are gone
+            done = summary is not None and self.pending[:len(summarized)] == summarized
+            if done:
+                self.summary = summary
+                del self.pending[:len(summarized)]
+            self.rolling_up = bool(self.pending) and done
+            self.rolling_up_until = time.time() + ROLL_UP_TIMEOUT if self.rolling_up else 0.0
+            return self.rolling_up
+
+        with self.lock:
+            return self._change(change)
+
+    @property
+    def size(self) -> int:
+        """Approximate bytes held by this session"""
+        with self.lock:
+            return (_SESSION_OVERHEAD + len(self.summary)
+                    + sum(t.size for t in self.turns) + sum(t.size for t in self.pending))
+
+
+class SessionStore:
+    """
+    Sessions by client ID with idle expiry and LRU caps on count and memory
+
+    Args:
+        max_sessions (int): Most sessions kept at once; 0 disables sessions
+        max_bytes (int): Memory budget across all sessions
+        idle_ttl (float): Seconds without a request before a session is dropped
+        shared (Optional[SharedStore]): Store shared with other processes
+    """
+
+    def __init__(self, max_sessions: int, max_bytes: int, idle_ttl: float, shared: Optional[SharedStore] = None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.roll_ups = 0
+
+    def get(self, session_id: Optional[str]) -> Optional[Session]:
+        """
+        The session for a client ID, created on first use
+
+        Returns:
+            Optional[Session]: None for stateless requests (no or invalid ID)
+        """
+        if self.max_sessions <= 0 or not isinstance(session_id, str):
+            return None
+        session_id = session_id.strip()
+        if not session_id or len(session_id) > MAX_SESSION_ID_LENGTH:
+            return None
+
+        with self._lock:
+            self._expire_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, shared=self.shared,
+                                                               idle_ttl=self.idle_ttl)
+                self.created += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            self._enforce_caps(keep=session_id)
+        session.refresh()
+        return session
+
+    def _expire_idle(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used > deadline:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def _enforce_caps(self, keep: str) -> None:
+        total = sum(session.size for session in self._sessions.values())
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or total > self.max_bytes):
+            session_id, session = next(iter(self._sessions.items()))
+            if session_id == keep:
+                break
+            del self._sessions[session_id]
+            total -= session.size
+            self.evicted += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            return {
+                "sessions": len(sessions),
+                "bytes": sum(session.size for session in sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "roll_ups": self.roll_ups,
+                "shared": self.shared is not None,
+            }
+
+
+def _shared_sessions() -> Optional[SharedStore]:
+    if not TTS_CACHE_DIR or SESSION_SHARED_MB <= 0 or SESSION_MAX_SESSIONS <= 0:
+        return None
+    try:
+        capacity = int(SESSION_SHARED_MB * 1024 * 1024)
+        # A session is a few KB; give the index one slot per 1 KB
+        return SharedStore(os.path.join(TTS_CACHE_DIR, "sessions.store"), capacity, slots=max(1024, capacity // 1024))
+    except (ImportError, OSError) as e:
+        logger.warning(f"Sessions shared across workers disabled ({TTS_CACHE_DIR}): {e}")
+        return None
+
+
+session_store = SessionStore(
+    max_sessions=SESSION_MAX_SESSIONS,
+    max_bytes=int(SESSION_STORE_MB * 1024 * 1024),
+    idle_ttl=SESSION_IDLE_TTL,
+    shared=_shared_sessions(),
+)
+
+
+def get_session(session_id: Optional[str]) -> Optional[Session]:
+    """Session for a request's ``session_id``, or None for stateless requests"""
+    return session_store.get(session_id)
@@ -0,0 +1,427 @@
+"""
+Key-value store in a memory-mapped file, shared by all worker processes.
+
+gunicorn workers each have their own memory, so per-process caches are
+duplicated and start cold after every restart. A SharedStore keeps values
+in one fixed-size file that every worker maps, so they share one warm copy
+held in the page cache, bounded by the file size and kept across restarts.
+
+Layout: a header, an open-addressing hash index of fixed-size slots, and a
+data region used as a ring log. Values are appended at the ring's head,
+overwriting (and so evicting) the oldest records. Entries read after they
+have aged past half the ring are copied back to the head, so eviction
+follows recent use (an approximate LRU by bytes).
+
+Writers are serialized by an ``flock`` on the file. Reads take no lock:
+each slot carries a sequence number that writers make odd while changing
+it, a CRC of the value, and the record it points to repeats the key's
+digest, so a reader racing a writer sees a miss rather than torn data or
+another key's value.
+
+The file is never resized or reset once created, because other processes
+may have it mapped (touching mapped pages past a shrunk file's end kills
+them with SIGBUS). Instead the format version, capacity and slot count are
+part of the file name, so a process configured with a different size (a
+rolling restart with a new TTS_CACHE_DISK_MB, or warmup.py run with other
+settings) opens a different file. Files left behind by old sizes can be
+deleted once no process uses them.
+"""
+import os
+import mmap
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VBSTORE1"
+VERSION = 1
+HEADER_SIZE = 4096
+# magic, version, slots, capacity, then the mutable fields below
+_HEADER = struct.Struct("<8sIIQQQQQQQQ")
+# Positions of the mutable fields in the unpacked header
+_HEAD, _END, _WRITTEN, _ENTRIES, _BYTES, _EVICTIONS, _TOMBSTONES = range(4, 11)
+# digest, seq, offset, length, crc, written
+_SLOT = struct.Struct("<16sQQIIQ")
+# digest, length, allocated size (header included)
+_RECORD = struct.Struct("<16sII")
+_FIELDS = {"written": _WRITTEN, "entries": _ENTRIES, "bytes": _BYTES, "evictions": _EVICTIONS,
+           "tombstones": _TOMBSTONES}
+_EMPTY = b"\x00" * 16
+_TOMBSTONE = b"\xff" * 16
+# Maps each byte to its lowest bit: odd sequence numbers, found with bytes.translate
+_ODD = bytes(value & 1 for value in range(256))
+# Index load beyond which the oldest records are evicted to free slots
+MAX_LOAD = 0.8
+# Share of deleted slots that triggers an index rebuild, keeping probes short
+MAX_TOMBSTONES = 0.25
+
+
+def _digest(key: str) -> bytes:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    # Keep the two reserved slot markers out of the key space
+    return digest if digest not in (_EMPTY, _TOMBSTONE) else b"\x01" + digest[1:]
+
+
+class SharedStore:
+    """
+    Bytes by string key in a file mapped by every process that opens it
+
+    Args:
+        path (str): Store file; the version, capacity and slot count are added
+            to its name (``audio.store`` becomes ``audio-v1-<capacity>-<slots>.store``).
+            Created on first use, reused after restarts
+        capacity (int): Bytes for values (record headers included)
+        slots (Optional[int]): Index size; defaults to one slot per 4 KB of capacity
+
+    Raises:
+        OSError: If the file cannot be created or mapped, or is not a store of this size
+    """
+
+    def __init__(self, path: str, capacity: int, slots: Optional[int] = None):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.capacity = capacity
+        self.slots = slots or max(1024, capacity // 4096)
+        root, extension = os.path.splitext(path)
+        self.path = f"{root}-v{VERSION}-{capacity}-{self.slots}{extension}"
+        self._data_start = HEADER_SIZE + self.slots * _SLOT.size
+        self._lock = threading.Lock()
+        # Counters have their own lock: writers hold _lock while they wait on the flock
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.promotions = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = self._data_start + capacity
+        try:
+            with self._writing():
+                existing = os.fstat(self._fd).st_size
+                if existing == 0:
+                    os.ftruncate(self._fd, size)
+                elif existing != size:
+                    raise OSError(f"{self.path} is {existing} bytes, expected {size}")
+                self._map = mmap.mmap(self._fd, size)
+                magic, version, slots, stored_capacity, *_ = _HEADER.unpack_from(self._map, 0)
+                if magic == b"\x00" * len(MAGIC):
+                    # New, or its creator died before writing the header: nobody has used it yet
+                    self._reset()
+                elif (magic, version, slots, stored_capacity) != (MAGIC, VERSION, self.slots, capacity):
+                    self._map.close()
+                    raise OSError(f"{self.path} is not a version {VERSION} store of this size")
+                else:
+                    self._repair()
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    # -- header ------------------------------------------------------------
+
+    def _header(self) -> list:
+        return list(_HEADER.unpack_from(self._map, 0))
+
+    def _update_header(self, **changes: int) -> None:
+        """Add to header fields, e.g. ``_update_header(entries=1)``; writers only"""
+        header = self._header()
+        for name, delta in changes.items():
+            header[_FIELDS[name]] += delta
+        _HEADER.pack_into(self._map, 0, *header)
+
+    def _set_positions(self, head: int, end: int) -> None:
+        header = self._header()
+        header[_HEAD], header[_END] = head, end
+        _HEADER.pack_into(self._map, 0, *header)
+
+    def _reset(self) -> None:
+        self._map[HEADER_SIZE:self._data_start] = b"\x00" * (self._data_start - HEADER_SIZE)
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.slots, self.capacity, 0, 0, 0, 0, 0, 0, 0)
+
+    def _repair(self) -> None:
+        """Drop slots left half-written by a process that died mid-update"""
+        # The low byte of every slot's (little-endian) sequence number in one strided
+        # slice; unpacking each slot in Python took ~50 ms per worker start
+        odd = self._map[HEADER_SIZE + 16:self._data_start:_SLOT.size].translate(_ODD)
+        index = odd.find(1)
+        while index != -1:
+            digest, seq, _, length, *_ = self._slot(index)
+            self._write_slot(index, _TOMBSTONE, seq, 0, 0, 0, 0)
+            self._update_header(entries=-1, bytes=-(length + _RECORD.size), tombstones=1)
+            index = odd.find(1, index + 1)
+
+    # -- index -------------------------------------------------------------
+
+    def _slot_offset(self, index: int) -> int:
+        return HEADER_SIZE + index * _SLOT.size
+
+    def _slot(self, index: int) -> tuple:
+        return _SLOT.unpack_from(self._map, self._slot_offset(index))
+
+    def _seq(self, index: int) -> int:
+        return struct.unpack_from("<Q", self._map, self._slot_offset(index) + 16)[0]
+
+    def _write_slot(self, index: int, digest: bytes, seq: int, offset: int, length: int, crc: int,
+                    written: int) -> None:
+        """Rewrite a slot, odd sequence number first so concurrent readers back off"""
+        position = self._slot_offset(index)
+        seq = seq + 1 if seq % 2 == 0 else seq
+        struct.pack_into("<Q", self._map, position + 16, seq)
+        _SLOT.pack_into(self._map, position, digest, seq, offset, length, crc, written)
+        struct.pack_into("<Q", self._map, position + 16, seq + 1)
+
+    def _probe(self, digest: bytes) -> Iterator[int]:
+        """Slot indexes along digest's probe sequence"""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        for step in range(self.slots):
+            yield (start + step) % self.slots
+
+    def _find(self, digest: bytes) -> Optional[int]:
+        for index in self._probe(digest):
+            slot_digest = self._slot(index)[0]
+            if slot_digest == digest:
+                return index
+            if slot_digest == _EMPTY:
+                return None
+        return None
+
+    # -- reads -------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The value for key, or None; takes neither the writer lock nor the flock"""
+        found = self._read(_digest(key))
+        if found is None:
+            self._count("misses")
+            return None
+        value, written = found
+        self._count("hits")
+        self._maybe_promote(key, value, written)
+        return value
+
+    def _read(self, digest: bytes) -> Optional[Tuple[bytes, int]]:
+        """The value stored under digest and the ring position it was written at"""
+        for index in self._probe(digest):
+            slot_digest, seq, offset, length, crc, written = self._slot(index)
+            if slot_digest == _EMPTY:
+                break
+            if slot_digest != digest:
+                continue
+            if seq % 2 or offset + _RECORD.size + length > self.capacity:
+                break
+            # An index rebuild rewrites slots without marking them odd first, so a
+            # slot can pair this digest with another record; the record names its key
+            record_digest, record_length, _ = _RECORD.unpack_from(self._map, self._data_start + offset)
+            if record_digest != digest or record_length != length:
+                break
+            start = self._data_start + offset + _RECORD.size
+            value = self._map[start:start + length]
+            if self._seq(index) != seq or zlib.crc32(value) != crc:
+                break
+            return value, written
+        return None
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _maybe_promote(self, key: str, value: bytes, written: int) -> None:
+        """Copy a value that is read again back to the head, unless a writer is busy"""
+        if self._header()[_WRITTEN] - written <= self.capacity // 2:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            try:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                self._put(_digest(key), value)
+                self._count("promotions")
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    # -- writes ------------------------------------------------------------
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Exclusive write access: threads of this process, then other processes"""
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def put(self, key: str, value: bytes) -> bool:
+        """
+        Store value under key, evicting the oldest records as needed
+
+        Returns:
+            bool: False if the value is too large for the store
+        """
+        if _RECORD.size + len(value) > self.capacity // 4:
+            return False
+        with self._writing():
+            self._put(_digest(key), value)
+        return True
+
+    def update(self, key: str, change: Callable[[Optional[bytes]], Optional[bytes]]) -> bool:
+        """
+        Replace key's value with change(current value, or None), holding the
+        write lock throughout so no other thread or process writes in between
+
+        change returning None leaves the value as it is.
+
+        Returns:
+            bool: False if the new value is too large for the store
+        """
+        digest = _digest(key)
+        with self._writing():
+            found = self._read(digest)
+            value = change(found[0] if found is not None else None)
+            if value is None:
+                return True
+            if _RECORD.size + len(value) > self.capacity // 4:
+                return False
+            self._put(digest, value)
+        return True
+
+    def delete(self, key: str) -> None:
+        with self._writing():
+            digest = _digest(key)
+            index = self._find(digest)
+            if index is not None:
+                self._drop(index)
+
+    def _drop(self, index: int) -> None:
+        _, seq, _, length, _, _ = self._slot(index)
+        self._write_slot(index, _TOMBSTONE, seq, 0, 0, 0, 0)
+        self._update_header(entries=-1, bytes=-(length + _RECORD.size), tombstones=1)
+
+    def _put(self, digest: bytes, value: bytes) -> None:
+        existing = self._find(digest)
+        if existing is not None:
+            self._drop(existing)
+        if self._header()[_TOMBSTONES] > self.slots * MAX_TOMBSTONES:
+            self._rebuild_index()
+
+        size = _RECORD.size + len(value)
+        offset, allocated = self._allocate(size)
+        start = self._data_start + offset
+        _RECORD.pack_into(self._map, start, digest, len(value), allocated)
+        self._map[start + _RECORD.size:start + size] = value
+
+        self._update_header(written=allocated)
+        index = self._free_slot(digest)
+        if index is None:
+            return
+        reused = self._slot(index)[0] == _TOMBSTONE
+        written = self._header()[_WRITTEN]
+        self._write_slot(index, digest, self._seq(index), offset, len(value), zlib.crc32(value), written)
+        self._update_header(entries=1, bytes=size, tombstones=-int(reused))
+
+    def _free_slot(self, digest: bytes) -> Optional[int]:
+        for index in self._probe(digest):
+            if self._slot(index)[0] in (_EMPTY, _TOMBSTONE):
+                return index
+        return None
+
+    def _rebuild_index(self) -> None:
+        """Reinsert live slots into a fresh index, dropping tombstones"""
+        live = [slot for slot in (self._slot(index) for index in range(self.slots))
+                if slot[0] not in (_EMPTY, _TOMBSTONE)]
+        # Every slot gets a new sequence number, so reads in progress retry
+        seqs = [self._seq(index) + 2 for index in range(self.slots)]
+        table = bytearray(self.slots * _SLOT.size)
+        taken = set()
+        for digest, _, offset, length, crc, written in live:
+            for index in self._probe(digest):
+                if index not in taken:
+                    taken.add(index)
+                    _SLOT.pack_into(table, index * _SLOT.size, digest, seqs[index], offset, length, crc, written)
+                    break
+        for index in range(self.slots):
+            if index not in taken:
+                _SLOT.pack_into(table, index * _SLOT.size, _EMPTY, seqs[index], 0, 0, 0, 0)
+        self._map[HEADER_SIZE:self._data_start] = bytes(table)
+        self._update_header(tombstones=-self._header()[_TOMBSTONES])
+
+    def _allocate(self, size: int) -> tuple:
+        """
+        Make room for size bytes at the ring's head and advance it
+
+        Records ahead of the head, up to ``end``, are from the previous lap
+        and are evicted as the head passes them. Returns the offset and the
+        allocated size (the record size, plus any gap to the next record too
+        small to hold a padding record).
+        """
+        header = self._header()
+        head, end = header[_HEAD], header[_END]
+        if head + size > self.capacity:
+            position = head
+            while position < end:
+                position = self._evict_record(position)
+            head, end = 0, head
+            self._set_positions(head, end)
+
+        position = head
+        max_entries = int(self.slots * MAX_LOAD)
+        while position < end and (position < head + size or self._header()[_ENTRIES] >= max_entries):
+            position = self._evict_record(position)
+        allocated = size
+        if position >= end:
+            end = head + size
+        elif position - (head + size) >= _RECORD.size:
+            # Mark the gap up to the next live record so the ring stays walkable
+            _RECORD.pack_into(self._map, self._data_start + head + size, _EMPTY, 0, position - head - size)
+        else:
+            allocated = position - head
+        self._set_positions(head + allocated, max(end, head + allocated))
+        return head, allocated
+
+    def _evict_record(self, position: int) -> int:
+        """Evict the record at position if its slot still points to it; return the next position"""
+        digest, _, allocated = _RECORD.unpack_from(self._map, self._data_start + position)
+        index = self._find(digest) if digest != _EMPTY else None
+        if index is not None and self._slot(index)[2] == position:
+            self._drop(index)
+            self._update_header(evictions=1)
+        return position + max(allocated, _RECORD.size)
+
+    # -- maintenance -------------------------------------------------------
+
+    def clear(self) -> None:
+        with self._writing():
+            # New sequence numbers invalidate reads in progress
+            for index in range(self.slots):
+                self._write_slot(index, _EMPTY, self._seq(index), 0, 0, 0, 0)
+            _HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.slots, self.capacity, 0, 0, 0, 0, 0, 0, 0)
+
+    def stats(self) -> dict:
+        """Occupancy shared by all processes; hits and misses of this process"""
+        header = self._header()
+        with self._stats_lock:
+            return {
+                "entries": header[_ENTRIES],
+                "bytes": header[_BYTES],
+                "capacity": self.capacity,
+                "evictions": header[_EVICTIONS],
+                "hits": self.hits,
+                "misses": self.misses,
+                "promotions": self.promotions,
+            }
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def __len__(self) -> int:
+        return self._header()[_ENTRIES]
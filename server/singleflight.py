@@ -0,0 +1,328 @@
+"""
+Request coalescing (single-flight) for identical in-flight work.
+
+When a shared link sends many clients the same question at once, each of
+them would otherwise run its own LLM call and synthesis. A SingleFlight
+lets the first caller for a key (the leader) do the work while every
+concurrent caller with the same key waits for it and gets the same result.
+Errors are shared too, so a failing upstream is hit once, not once per
+waiter.
+
+Within a process, waiters block on the leader's call. Across processes
+(e.g. gunicorn workers), leaders take an ``flock`` on a per-key file in
+SINGLEFLIGHT_DIR and publish their result next to it; a worker that finds
+the lock held waits up to SINGLEFLIGHT_WAIT seconds for it and then reads
+the published result instead of calling upstream itself.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import SINGLEFLIGHT_DIR, SINGLEFLIGHT_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Published results older than this, and lock files unused for this long, are swept
+STALE_SECONDS = 300
+# Publishes between sweeps of the shared directory
+SWEEP_EVERY = 128
+
+
+class _FileFlights:
+    """Cross-process half of a SingleFlight: an flock per key and a result file"""
+
+    def __init__(self, directory: str, name: str):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.directory = directory
+        self.name = name
+        self._publishes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{self.name}-{digest}.{suffix}")
+
+    def open(self, key: str) -> int:
+        return os.open(self._path(key, "lock"), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def try_acquire(self, key: str, fd: int) -> bool:
+        """
+        Take the key's lock without blocking
+
+        The sweeper may have unlinked the lock file since fd was opened, and
+        a lock on an unlinked file excludes nobody; fd is then pointed at the
+        current file (same descriptor number) and the lock is tried again.
+        """
+        path = self._path(key, "lock")
+        while True:
+            try:
+                self._fcntl.flock(fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            held = os.fstat(fd)
+            try:
+                current = os.stat(path)
+                if (current.st_dev, current.st_ino) == (held.st_dev, held.st_ino):
+                    # Lock files are never written; the mtime records their last use for the sweeper
+                    os.utime(fd)
+                    return True
+            except FileNotFoundError:
+                pass
+            replacement = self.open(key)
+            os.dup2(replacement, fd)
+            os.close(replacement)
+
+    def release(self, fd: int) -> None:
+        try:
+            self._fcntl.flock(fd, self._fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def read_result(self, key: str, since_ns: int) -> Optional[bytes]:
+        """The result published for key after since_ns (wall clock), if any"""
+        path = self._path(key, "result")
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_mtime_ns < since_ns:
+                    return None
+                return f.read()
+        except OSError:
+            return None
+
+    def publish(self, key: str, data: bytes) -> None:
+        path = self._path(key, "result")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to publish {self.name} result to other workers: {e}")
+            return
+        self._publishes += 1
+        if self._publishes % SWEEP_EVERY == 0:
+            self._sweep()
+
+    def _sweep(self) -> None:
+        cutoff = time.time() - STALE_SECONDS
+        prefix = f"{self.name}-"
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                if name.endswith(".lock"):
+                    self._remove_lock(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_lock(self, path: str) -> None:
+        """Unlink an idle lock file, only while holding its lock so no leader is running on it"""
+        fd = os.open(path, os.O_RDWR)
+        try:
+            self._fcntl.flock(fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        try:
+            os.remove(path)
+        finally:
+            self.release(fd)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time and shares its result with concurrent callers
+
+    Args:
+        name (str): Name used in metrics and shared-file names
+        directory (Optional[str]): Shared directory for coalescing across
+            processes; None or empty coalesces within the process only
+        wait (float): Longest wait for another process's call before making our own
+        encode (Optional[Callable[[Any], bytes]]): Serializes results for other processes
+        decode (Optional[Callable[[bytes], Any]]): Reverses ``encode``
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = SINGLEFLIGHT_DIR, wait: float = SINGLEFLIGHT_WAIT,
+                 encode: Optional[Callable[[Any], bytes]] = None, decode: Optional[Callable[[bytes], Any]] = None):
+        self.name = name
+        self.wait = wait
+        self._encode = encode or (lambda value: value)
+        self._decode = decode or (lambda data: data)
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._files = None
+        if directory:
+            try:
+                self._files = _FileFlights(directory, name)
+            except (ImportError, OSError) as e:
+                logger.warning(f"Coalescing {name} requests across workers disabled ({directory}): {e}")
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_remote = 0
+        self.wait_timeouts = 0
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Return fn()'s result, shared with every concurrent caller for the same key
+
+        Raises:
+            Exception: Whatever fn raised, in the leader and in every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _lead(self, key: str, fn: Callable[[], Any]) -> Any:
+        if self._files is None:
+            self._count("leaders")
+            return fn()
+        try:
+            fd = self._files.open(key)
+        except OSError:
+            self._count("leaders")
+            return fn()
+
+        started = time.time_ns()
+        try:
+            if not self._files.try_acquire(key, fd):
+                deadline = time.monotonic() + self.wait
+                delay = 0.002
+                while not self._files.try_acquire(key, fd):
+                    if time.monotonic() >= deadline:
+                        self._count("wait_timeouts")
+                        return fn()
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+                data = self._files.read_result(key, started)
+                if data is not None:
+                    self._count("coalesced_remote")
+                    return self._decode(data)
+            self._count("leaders")
+            value = fn()
+            self._files.publish(key, self._encode(value))
+            return value
+        finally:
+            self._files.release(fd)
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of do for the ASGI app
+
+        The shared call runs as its own task, so a caller that disconnects
+        does not cancel the call for everyone else waiting on it.
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self._count("coalesced")
+        else:
+            task = asyncio.ensure_future(self._lead_async(key, fn))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish_task(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_task(self, key: str, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Every waiter may have gone; don't log the error as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def _lead_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self._files is None:
+            self._count("leaders")
+            return await fn()
+        try:
+            fd = self._files.open(key)
+        except OSError:
+            self._count("leaders")
+            return await fn()
+
+        started = time.time_ns()
+        try:
+            if not self._files.try_acquire(key, fd):
+                deadline = time.monotonic() + self.wait
+                delay = 0.002
+                while not self._files.try_acquire(key, fd):
+                    if time.monotonic() >= deadline:
+                        self._count("wait_timeouts")
+                        return await fn()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+                data = await asyncio.to_thread(self._files.read_result, key, started)
+                if data is not None:
+                    self._count("coalesced_remote")
+                    return self._decode(data)
+            self._count("leaders")
+            value = await fn()
+            await asyncio.to_thread(self._files.publish, key, self._encode(value))
+            return value
+        finally:
+            self._files.release(fd)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_remote": self.coalesced_remote,
+                "wait_timeouts": self.wait_timeouts,
+                "in_flight": len(self._calls) + len(self._tasks),
+                "shared": self._files is not None,
+            }
+
+
+# LLM replies to stateless questions, keyed on the normalized question
+chat_flight = SingleFlight(
+    "chat",
+    encode=lambda reply: reply.encode("utf-8"),
+    decode=lambda data: data.decode("utf-8"),
+)
+# Synthesized audio bytes, keyed on the text and every parameter that changes the audio
+tts_flight = SingleFlight("tts")
@@ -0,0 +1,199 @@
+"""
+Cold start: what the server loads before and after it starts listening.
+
+Importing app.py or asgi.py loads what every request needs (the web
+framework, config, caches, metrics) and nothing else. Provider libraries
+and clients (the OpenAI SDK, gTTS, Google Cloud TTS, aiohttp, local voice
+models) are loaded when first used (see providers), so the process starts
+listening sooner and never pays for providers it is not configured to use.
+
+preflight() loads the ones the configuration will need, so that the first
+request does not wait for them. PREFLIGHT chooses when it runs:
+
+- background (default): in a thread once the app is imported, while the
+  server binds its port and the host routes the first request to it;
+- block: before the app finishes importing (or, for the ASGI app, before
+  lifespan startup completes), for hosts that send traffic only once the
+  process is fully ready;
+- off: never; each library is loaded by the first request that uses it.
+
+The times from process start to the app being imported, the preflight
+finishing and the first request being served are logged and reported on
+/metrics, with the import time of each provider library. An import-time
+profile of the app, by top-level package, plus the preflight's steps:
+
+    python startup.py --entry app
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from config import PREFLIGHT
+import providers
+
+logger = logging.getLogger(__name__)
+
+
+def _process_started() -> float:
+    """Wall-clock time this process started (from /proc on Linux, else when this module was imported)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is field 22; fields are counted after the command name, which may contain spaces
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED = _process_started()
+
+_lock = threading.Lock()
+# Seconds after process start at which each startup phase was first reached
+_phases: Dict[str, float] = {}
+# Seconds each preflight step took
+_steps: Dict[str, float] = {}
+_served = False
+
+
+def mark(phase: str) -> None:
+    """Record the first time a startup phase is reached"""
+    seconds = time.time() - PROCESS_STARTED
+    with _lock:
+        if phase in _phases:
+            return
+        _phases[phase] = seconds
+    logger.info(f"Startup: {phase} {seconds:.2f}s after process start")
+
+
+def served() -> None:
+    """Record the first request served; called after every request, so later calls return at once"""
+    global _served
+    if not _served:
+        _served = True
+        mark("first_request")
+
+
+def _preflight_steps(asgi: bool) -> List[Tuple[str, Callable[[], object]]]:
+    import http_clients
+    import openai_client
+    from tts_router import router
+
+    # Most requests need the LLM; the sync client also writes session summaries in the ASGI app
+    steps = [("openai", openai_client.client)]
+    if asgi:
+        # Async clients bind to the event loop on first use; only their transport is imported here
+        steps.append(("aiohttp", lambda: [providers.load(name) for name in ("aiohttp", "httpx_aiohttp")]))
+    else:
+        steps.append(("http_session", http_clients.session))
+    # Each enabled TTS engine's preload hook: its library, client or voice model
+    steps.append(("tts_engines", router.preload))
+    return steps
+
+
+def preflight(asgi: bool = False) -> Dict[str, float]:
+    """
+    Load the provider libraries, clients and voice models the configuration uses
+
+    Args:
+        asgi (bool): Prepare the ASGI app's clients rather than the Flask app's
+
+    Returns:
+        Dict[str, float]: Seconds per step
+    """
+    for name, step in _preflight_steps(asgi):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Preflight step {name} failed: {e}")
+        with _lock:
+            _steps[name] = time.perf_counter() - started
+    mark("preflight")
+    steps = stats()["steps"]
+    logger.info("Preflight: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in steps.items()))
+    return steps
+
+
+def start(asgi: bool = False) -> None:
+    """Run the preflight as PREFLIGHT says; called once the app is imported (or at ASGI startup)"""
+    mark("app_imported")
+    if PREFLIGHT == "block":
+        preflight(asgi)
+    elif PREFLIGHT == "background":
+        threading.Thread(target=preflight, args=(asgi,), name="preflight", daemon=True).start()
+    elif PREFLIGHT != "off":
+        logger.warning(f"Unknown PREFLIGHT {PREFLIGHT!r} (use background, block or off); skipping the preflight")
+
+
+def stats() -> dict:
+    """Startup phases and preflight steps (seconds), and provider library import times"""
+    with _lock:
+        return {"phases": dict(_phases), "steps": dict(_steps), "imports": providers.import_seconds()}
+
+
+def import_profile(entry: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Import time of a module in a fresh interpreter, by top-level package
+
+    Returns:
+        Tuple[float, List[Tuple[str, float]]]: Total seconds, and the seconds
+        spent in each top-level package's own modules, slowest first
+    """
+    env = dict(os.environ, PREFLIGHT="off", WARMUP_ON_START="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise Exception(f"Importing {entry} failed: {result.stderr.strip().splitlines()[-1]}")
+    total = 0.0
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        packages[name.split(".")[0]] += int(own) / 1e6
+        if name == entry:
+            total = int(cumulative) / 1e6
+    return total, sorted(packages.items(), key=lambda item: -item[1])
+
+
+def _preflight_profile(entry: str) -> dict:
+    """stats() after importing ``entry`` and running the preflight, in a fresh interpreter"""
+    env = dict(os.environ, PREFLIGHT="off", WARMUP_ON_START="0")
+    code = (f"import json, {entry}, startup; startup.preflight(asgi={entry == 'asgi'}); "
+            f"print(json.dumps(startup.stats()))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise Exception(f"Preflight of {entry} failed: {result.stderr.strip().splitlines()[-1]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report where the server's startup time goes")
+    parser.add_argument("--entry", default="app", choices=["app", "asgi"], help="Flask (app) or ASGI (asgi) app")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    args = parser.parse_args()
+
+    total, packages = import_profile(args.entry)
+    print(f"import {args.entry}: {total * 1000:.0f} ms (python -X importtime, PREFLIGHT=off)")
+    for package, seconds in packages[:args.top]:
+        print(f"  {package:<24} {seconds * 1000:>7.1f} ms")
+    profile = _preflight_profile(args.entry)
+    print(f"preflight: {sum(profile['steps'].values()) * 1000:.0f} ms")
+    for step, seconds in profile["steps"].items():
+        print(f"  {step:<24} {seconds * 1000:>7.1f} ms")
+    print("provider imports:")
+    for library, seconds in sorted(profile["imports"].items(), key=lambda item: -item[1]):
+        print(f"  {library:<24} {seconds * 1000:>7.1f} ms")
@@ -0,0 +1,224 @@
+import base64
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from audio_profiles import AudioProfile, negotiate, render
+from chunk_planner import planner
+from config import TTS_MAX_WORKERS
+from gtts_tts import _clean_text
+from openai_client import full_sentences, remember, stream_response, stream_response_async
+from persona import ANSWER_WORDS
+from sessions import Session
+from text_segmenter import TextSegmenter, segment_text
+from tts_router import router, synthesize, synthesize_async
+import upstream
+import warmup
+
+logger = logging.getLogger(__name__)
+
+
+def _audio_event(index: int, text: str, audio: bytes, mimetype: str) -> dict:
+    return {
+        "event": "audio",
+        "index": index,
+        "text": text,
+        "audio_base64": base64.b64encode(audio).decode("utf-8"),
+        "audio_type": mimetype,
+    }
+
+
+def _plan(profile: Optional[AudioProfile]) -> Tuple[AudioProfile, Optional[str], TextSegmenter]:
+    """Audio format, engine for every segment (the best ranked now) and segmenter for a reply"""
+    profile = profile or negotiate("")
+    engines = router.ranked()
+    engine = engines[0].name if engines else None
+    # A short first chunk starts audio sooner; the rest are sized for the engine
+    # expected to serve them (about six characters per word of reply)
+    first_length, max_length = planner.stream_lengths(engine or "gtts", ANSWER_WORDS * 6)
+    return profile, engine, TextSegmenter(max_length=max_length, first_length=first_length, eager=True)
+
+
+def _tail(segmenter: TextSegmenter, reply: List[str], kept: str) -> List[str]:
+    """Text left to speak once the reply is complete"""
+    tail = segmenter.flush()
+    if kept != "".join(reply):
+        # The model hit the token ceiling: the sentence it was cut off in is not spoken
+        tail = segment_text(full_sentences(" ".join(tail)), segmenter.max_length)
+    return tail
+
+
+def _segment_failed(index: int, error: Exception) -> Exception:
+    # Upstream retries and engine fallback are exhausted; a gap would go unnoticed
+    return Exception(f"Failed to synthesize streamed segment {index}: {error}")
+
+
+def stream_chat(user_input: str, lang: str = 'en', session: Optional[Session] = None,
+                profile: Optional[AudioProfile] = None) -> Iterator[dict]:
+    """
+    Run the chat pipeline incrementally
+
+    Tokens are forwarded as soon as the model produces them. TextSegmenter
+    hands each sentence (or clause of a long sentence) to TTS as soon as its
+    boundary is certain, and audio segments are emitted in reply order while
+    later sentences are still being generated. Every segment asks for the
+    engine ranked best when the reply starts, so the client can join them
+    into one recording (engines differ in voice and sample rate).
+
+    Args:
+        user_input (str): The user's message
+        lang (str): gTTS language code (default: 'en')
+        session (Optional[Session]): Conversation state; None for stateless calls
+        profile (Optional[AudioProfile]): Audio format of the segments (default: AUDIO_DEFAULT_PROFILE)
+
+    Yields:
+        dict: Events with an ``event`` key of ``text`` (``delta``),
+        ``audio`` (``index``, ``text``, ``audio_base64``, ``audio_type``) or ``done`` (``text``,
+        the reply as kept: without a sentence cut off by the token ceiling, which is not spoken)
+
+    Raises:
+        Exception: If a segment cannot be synthesized on any engine, rather
+            than leaving a sentence out of the spoken reply
+    """
+    profile, engine, segmenter = _plan(profile)
+
+    def speak(text: str, first: bool = False) -> tuple:
+        if first:
+            # Playback waits for this one: its upstream requests go ahead of the rest
+            with upstream.first_audio():
+                return render(synthesize(text, lang, engine).getvalue(), profile)
+        return render(synthesize(text, lang, engine).getvalue(), profile)
+
+    # Anchor questions: the whole precomputed answer is one text delta and one segment
+    warm = warmup.lookup(user_input)
+    if warm:
+        remember(session, user_input, warm.text)
+        yield {"event": "text", "delta": warm.text}
+        audio, mimetype, _ = render(warm.audio, profile) if warm.audio is not None else speak(warm.text)
+        yield _audio_event(0, warm.text, audio, mimetype)
+        yield {"event": "done", "text": warm.text}
+        return
+
+    reply = []
+    segments = deque()
+    submitted = 0
+
+    def submit(chunks) -> None:
+        nonlocal submitted
+        for chunk in map(_clean_text, chunks):
+            if chunk.strip():
+                segments.append((chunk, pool.submit(speak, chunk, submitted == 0)))
+                submitted += 1
+
+    def drain(block: bool) -> Iterator[dict]:
+        nonlocal index
+        while segments and (block or segments[0][1].done()):
+            chunk, future = segments.popleft()
+            try:
+                audio, mimetype, _ = future.result()
+            except Exception as e:
+                for _, pending in segments:
+                    pending.cancel()
+                raise _segment_failed(index, e) from e
+            yield _audio_event(index, chunk, audio, mimetype)
+            index += 1
+
+    kept = None
+
+    def deltas() -> Iterator[str]:
+        nonlocal kept
+        kept = yield from stream_response(user_input, session)
+
+    index = 0
+    with ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts-stream") as pool:
+        for delta in deltas():
+            reply.append(delta)
+            yield {"event": "text", "delta": delta}
+
+            submit(segmenter.feed(delta))
+            yield from drain(block=False)
+
+        submit(_tail(segmenter, reply, kept))
+        yield from drain(block=True)
+
+    yield {"event": "done", "text": kept}
+
+
+async def stream_chat_async(user_input: str, lang: str = 'en', session: Optional[Session] = None,
+                            profile: Optional[AudioProfile] = None) -> AsyncIterator[dict]:
+    """
+    Async version of stream_chat for the ASGI app
+
+    The LLM stream and every segment's synthesis are awaited on the event
+    loop, so an open stream holds no thread; segments are synthesized as
+    tasks, TTS_MAX_WORKERS at a time per reply.
+    """
+    profile, engine, segmenter = _plan(profile)
+    slots = asyncio.Semaphore(TTS_MAX_WORKERS)
+
+    async def speak(text: str, first: bool = False) -> tuple:
+        async with slots:
+            if first:
+                with upstream.first_audio():
+                    audio = await synthesize_async(text, lang, engine)
+            else:
+                audio = await synthesize_async(text, lang, engine)
+            # Transcoding runs ffmpeg; keep it off the event loop
+            return await asyncio.to_thread(render, audio.getvalue(), profile)
+
+    warm = warmup.lookup(user_input)
+    if warm:
+        remember(session, user_input, warm.text)
+        yield {"event": "text", "delta": warm.text}
+        if warm.audio is not None:
+            audio, mimetype, _ = await asyncio.to_thread(render, warm.audio, profile)
+        else:
+            audio, mimetype, _ = await speak(warm.text)
+        yield _audio_event(0, warm.text, audio, mimetype)
+        yield {"event": "done", "text": warm.text}
+        return
+
+    reply = []
+    segments = deque()
+    submitted = 0
+
+    def submit(chunks) -> None:
+        nonlocal submitted
+        for chunk in map(_clean_text, chunks):
+            if chunk.strip():
+                segments.append((chunk, asyncio.ensure_future(speak(chunk, submitted == 0))))
+                submitted += 1
+
+    async def drain(block: bool) -> AsyncIterator[dict]:
+        nonlocal index
+        while segments and (block or segments[0][1].done()):
+            chunk, task = segments.popleft()
+            try:
+                audio, mimetype, _ = await task
+            except Exception as e:
+                raise _segment_failed(index, e) from e
+            yield _audio_event(index, chunk, audio, mimetype)
+            index += 1
+
+    kept = []
+    index = 0
+    try:
+        async for delta in stream_response_async(user_input, session, kept):
+            reply.append(delta)
+            yield {"event": "text", "delta": delta}
+
+            submit(segmenter.feed(delta))
+            async for event in drain(block=False):
+                yield event
+
+        submit(_tail(segmenter, reply, kept[0]))
+        async for event in drain(block=True):
+            yield event
+    finally:
+        # On a failed segment or a client that went away, stop the rest
+        for _, task in segments:
+            task.cancel()
+
+    yield {"event": "done", "text": kept[0]}
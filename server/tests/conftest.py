@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Server modules are imported flat (``from config import ...``), as when run from server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the module-level caches in memory; tests must not touch the shared cache files
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["TTS_CACHE_DIR"] = ""
+os.environ["SINGLEFLIGHT_DIR"] = ""
+os.environ["WARMUP_ON_START"] = "0"
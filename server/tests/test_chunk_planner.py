@@ -0,0 +1,39 @@
+from chunk_planner import CHUNK_SIZES, ChunkPlanner
+from gtts_tts import _split_text_smart
+
+TEXT = " ".join(f"Sentence number {i} says something about the weather today." for i in range(30))
+
+
+def observe(planner: ChunkPlanner, fixed: float, per_char: float) -> None:
+    for chars in range(20, 1000, 40):
+        planner.observe("elevenlabs", chars, fixed + per_char * chars)
+
+
+def test_chunk_lengths_come_from_the_ladder():
+    planner = ChunkPlanner(enabled=True)
+    for length in (150, 700, 2500):
+        for candidate in planner._candidate_lengths(length, 1000, 4):
+            assert candidate == 1000 or candidate in CHUNK_SIZES
+
+
+def test_split_survives_cost_drift():
+    planner = ChunkPlanner(enabled=True, stickiness=0.25)
+    observe(planner, 0.2, 0.002)
+    first = planner.plan("elevenlabs", TEXT, _split_text_smart, workers=4)
+    # A full window with 20% more overhead, or 20% less per character: not worth
+    # re-splitting a reply that is probably cached (this re-split it before)
+    for fixed, per_char in ((0.24, 0.002), (0.2, 0.0016)):
+        for _ in range(4):
+            observe(planner, fixed, per_char)
+        assert planner.plan("elevenlabs", TEXT, _split_text_smart, workers=4).chunks == first.chunks
+
+
+def test_kept_length_is_dropped_once_clearly_slower():
+    planner = ChunkPlanner(enabled=True, stickiness=0.25)
+    observe(planner, 1.5, 0.0002)
+    best = planner.plan("elevenlabs", TEXT, _split_text_smart, workers=8)
+    # Pretend texts of this length were last split into 150-character chunks: 10+ requests
+    # on 8 workers at 1.5 s each is far more than 25% slower than the best plan
+    band = next(key for key in planner._kept if key[0] == "elevenlabs")
+    planner._kept[band] = 150
+    assert planner.plan("elevenlabs", TEXT, _split_text_smart, workers=8).chunks == best.chunks
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+import requests
+from gtts import gTTS
+
+from gtts_tts import _decode_gtts_response
+
+# A batchexecute reply in the format the pinned gTTS (requirements.txt) parses
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "gtts_batchexecute.txt")) as f:
+    RECORDED = f.read()
+
+
+def gtts_stream(body, monkeypatch):
+    """The audio gTTS's own stream() extracts from a response with this body"""
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body.encode("utf-8")
+        response._content_consumed = True
+        response.request = request
+        return response
+
+    monkeypatch.setattr(requests.Session, "send", send)
+    return b"".join(gTTS("Hello there.").stream())
+
+
+def test_decoder_extracts_the_same_audio_as_gtts(monkeypatch):
+    audio = _decode_gtts_response(RECORDED)
+    assert audio[:3] == b"ID3"
+    assert audio == gtts_stream(RECORDED, monkeypatch)
+
+
+def test_response_without_audio_is_an_error():
+    with pytest.raises(Exception, match="No audio stream"):
+        _decode_gtts_response(")]}'\n\n25\n[[\"e\",4,null,null,120]]\n")
+
+
+def test_gtts_still_prepares_the_requests_we_send():
+    # _prepare_requests is private to gTTS; this fails if an upgrade changes it
+    prepared = gTTS("First sentence. " * 20)._prepare_requests()
+    assert len(prepared) > 1
+    for request in prepared:
+        assert isinstance(request, requests.PreparedRequest)
+        assert request.method == "POST"
+        assert request.url.endswith("/_/TranslateWebserverUi/data/batchexecute")
+        assert "jQ1olc" in request.body
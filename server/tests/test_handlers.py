@@ -0,0 +1,20 @@
+import pytest
+from starlette.testclient import TestClient
+
+from app import app as flask_app
+from asgi import app
+
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream", "/api/chat/batch"])
+@pytest.mark.parametrize("body", ["[]", '"hello"', "not json"])
+def test_asgi_rejects_a_body_that_is_not_a_json_object(path, body):
+    with TestClient(app) as client:
+        response = client.post(path, content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream", "/api/chat/batch"])
+@pytest.mark.parametrize("body", ["[]", '"hello"', "not json"])
+def test_flask_rejects_a_body_that_is_not_a_json_object(path, body):
+    response = flask_app.test_client().post(path, data=body, content_type="application/json")
+    assert response.status_code == 400
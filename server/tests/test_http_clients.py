@@ -0,0 +1,51 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_clients import _PooledAdapter
+from upstream import _is_transport_error
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(1.0)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_exhausted_pool_fails_with_a_retryable_error_after_the_pool_timeout(slow_server):
+    session = requests.Session()
+    session.mount("http://", _PooledAdapter(timeout=(1, 5), pool_timeout=0.2, pool_maxsize=1, pool_block=True))
+    holder = threading.Thread(target=session.get, args=(slow_server,))
+    holder.start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    with pytest.raises(requests.ConnectionError) as raised:
+        session.get(slow_server)
+    assert time.monotonic() - started < 0.8
+    assert _is_transport_error(raised.value)
+    holder.join()
+
+    # The connection went back to the pool and is reused
+    assert session.get(slow_server).text == "ok"
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import pytest
+
+import openai_client
+from response_cache import response_cache
+
+
+def event(content=None, finish_reason=None):
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """An OpenAI client whose streamed reply is cut off by the token ceiling"""
+    events = [event("I build vision systems. "), event("Mostly for drones, "), event("and I", "length")]
+    completions = SimpleNamespace(create=lambda **kwargs: iter(events))
+    monkeypatch.setattr(openai_client, "client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    response_cache.clear()
+    yield
+    response_cache.clear()
+
+
+def test_streamed_reply_cut_off_by_the_token_ceiling_is_trimmed_before_caching(llm):
+    replies = openai_client.stream_response("What do you build?")
+    deltas = []
+    with pytest.raises(StopIteration) as stop:
+        while True:
+            deltas.append(next(replies))
+    assert "".join(deltas) == "I build vision systems. Mostly for drones, and I"
+    assert stop.value.value == "I build vision systems."
+    assert response_cache.get("What do you build?") == "I build vision systems."
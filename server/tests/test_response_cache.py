@@ -0,0 +1,42 @@
+import pytest
+
+from response_cache import ResponseCache
+
+
+def cache(similarity: float = 0.8) -> ResponseCache:
+    return ResponseCache(max_entries=16, ttl=60, similarity=similarity)
+
+
+def test_exact_only_by_default():
+    from config import RESPONSE_CACHE_SIMILARITY
+
+    assert RESPONSE_CACHE_SIMILARITY == 1.0
+    replies = cache(RESPONSE_CACHE_SIMILARITY)
+    replies.put("How do you push your boundaries and limits?", "By ...")
+    assert replies.get("how do you push your boundaries and limits") == "By ..."
+    assert replies.get("How do you push your limits and boundaries?") is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What did you do in 2022?", "What did you do in 2023?"),
+    ("Are you willing to relocate?", "Are you not willing to relocate?"),
+    ("Are you willing to relocate?", "Aren't you willing to relocate?"),
+    ("How many years of React experience do you have?", "How many years of Redux experience do you have?"),
+    ("What are the top 3 areas you'd like to grow in?", "What are the top 4 areas you'd like to grow in?"),
+])
+def test_similar_questions_that_differ_in_meaning_miss(cached, asked):
+    replies = cache()
+    replies.put(cached, "cached reply")
+    assert replies.get(asked) is None
+    assert replies.stats()["similar_hits"] == 0
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("How do you push your boundaries and limits?", "How do you push your limits and boundaries?"),
+    ("What misconception do your coworkers have about you?", "what misconception do coworkers have about you"),
+])
+def test_rephrasings_with_the_same_content_words_hit(cached, asked):
+    replies = cache()
+    replies.put(cached, "cached reply")
+    assert replies.get(asked) == "cached reply"
+    assert replies.stats()["similar_hits"] == 1
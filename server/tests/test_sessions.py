@@ -0,0 +1,62 @@
+import pytest
+
+from sessions import SessionStore
+from shared_store import SharedStore
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two workers' session stores over one shared file"""
+    path = str(tmp_path / "sessions.store")
+    stores = [SessionStore(max_sessions=10, max_bytes=1 << 20, idle_ttl=1800,
+                           shared=SharedStore(path, 1 << 20, slots=1024)) for _ in range(2)]
+    yield stores
+    for store in stores:
+        store.shared.close()
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_follow_up_on_another_worker_sees_the_history(workers):
+    first, second = workers
+    first.get("client").add_turn("How big was the dataset?", "About ten thousand images.")
+    second.get("client").add_turn("What did the dashboard show?", "Defects per flight.")
+
+    expected = ["How big was the dataset?", "About ten thousand images.",
+                "What did the dashboard show?", "Defects per flight."]
+    assert contents(second.get("client").messages()) == expected
+    assert contents(first.get("client").messages()) == expected
+
+
+def test_roll_up_is_claimed_once_and_keeps_turns_added_meanwhile(workers):
+    first, second = workers
+    session = first.get("client")
+    session.history_tokens = 0
+    session.add_turn("First question?", "First answer.")
+    assert session.add_turn("Second question?", "Second answer.")
+    summarized = session.take_pending()
+
+    # The other worker gets the next turn while the summary is being written
+    other = second.get("client")
+    other.history_tokens = 0
+    assert not other.add_turn("Third question?", "Third answer.")
+
+    assert session.finish_roll_up(summarized, "They asked two questions.")
+    assert contents(second.get("client").messages()) == [
+        "Earlier in this conversation: They asked two questions.",
+        "Second question?", "Second answer.", "Third question?", "Third answer.",
+    ]
+
+
+def test_stale_roll_up_does_not_replace_a_newer_summary(workers):
+    first, _ = workers
+    session = first.get("client")
+    session.history_tokens = 0
+    session.add_turn("First question?", "First answer.")
+    session.add_turn("Second question?", "Second answer.")
+    summarized = session.take_pending()
+    assert session.finish_roll_up(summarized, "Newer summary.") is False
+    assert session.finish_roll_up(summarized, "Stale summary.") is False
+    assert session.summary == "Newer summary."
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import threading
+import zlib
+
+import shared_store
+from shared_store import SharedStore
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_other_sizes_use_other_files_and_never_break_a_mapped_store(tmp_path):
+    path = str(tmp_path / "audio.store")
+    # Another process maps the store at 1 MB and keeps writing after a 64 KB process opens it
+    code = f"""
+import sys, time
+from shared_store import SharedStore
+store = SharedStore({path!r}, 1024 * 1024)
+store.put("a", b"x" * 1000)
+print("ready", flush=True)
+sys.stdin.readline()
+for i in range(500):
+    store.put(f"k{{i}}", b"y" * 1000)
+assert store.get("k499") == b"y" * 1000
+"""
+    worker = subprocess.Popen([sys.executable, "-c", code], cwd=SERVER_DIR, stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True)
+    assert worker.stdout.readline().strip() == "ready"
+    small = SharedStore(path, 64 * 1024)
+    assert small.get("a") is None
+    small.put("b", b"z" * 100)
+    worker.stdin.write("\n")
+    worker.stdin.flush()
+    assert worker.wait(timeout=30) == 0
+    assert len(os.listdir(tmp_path)) == 2
+
+    # The same size reopens the same file
+    same = SharedStore(path, 1024 * 1024)
+    assert same.get("k499") == b"y" * 1000
+
+
+def test_slot_pointing_at_another_keys_record_misses(tmp_path):
+    store = SharedStore(str(tmp_path / "replies.store"), 256 * 1024)
+    store.put("first", b"1" * 64)
+    store.put("second", b"2" * 64)
+    first = store._find(shared_store._digest("first"))
+    second = store._find(shared_store._digest("second"))
+    # What a reader can see mid-rebuild: the first key's digest and seq with the second's record
+    digest, seq, *_ = store._slot(first)
+    _, _, offset, length, crc, written = store._slot(second)
+    shared_store._SLOT.pack_into(store._map, store._slot_offset(first), digest, seq, offset, length, crc, written)
+    assert crc == zlib.crc32(b"2" * 64)
+    assert store.get("first") is None
+    assert store.get("second") == b"2" * 64
+
+
+def test_hits_and_misses_from_many_threads_are_all_counted(tmp_path):
+    store = SharedStore(str(tmp_path / "replies.store"), 256 * 1024)
+    store.put("present", b"x" * 64)
+
+    def read():
+        for _ in range(2000):
+            store.get("present")
+            store.get("absent")
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (16000, 16000)
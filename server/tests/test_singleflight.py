@@ -0,0 +1,43 @@
+import os
+import time
+
+from singleflight import STALE_SECONDS, _FileFlights
+
+
+def age(path: str) -> None:
+    old = time.time() - STALE_SECONDS - 60
+    os.utime(path, (old, old))
+
+
+def test_sweep_keeps_a_lock_file_a_leader_holds(tmp_path):
+    flights = _FileFlights(str(tmp_path), "tts")
+    fd = flights.open("key")
+    assert flights.try_acquire("key", fd)
+    lock = flights._path("key", "lock")
+    age(lock)
+    flights._sweep()
+    assert os.path.exists(lock)
+    other = flights.open("key")
+    assert not flights.try_acquire("key", other)
+    os.close(other)
+    flights.release(fd)
+
+
+def test_sweep_removes_idle_files_and_waiters_move_to_the_new_lock(tmp_path):
+    flights = _FileFlights(str(tmp_path), "tts")
+    waiter = flights.open("key")
+    flights.publish("key", b"audio")
+    lock, result = flights._path("key", "lock"), flights._path("key", "result")
+    age(lock)
+    age(result)
+    flights._sweep()
+    assert not os.path.exists(lock) and not os.path.exists(result)
+
+    # The waiter opened the swept file; its lock must exclude a worker that opens the new one
+    assert flights.try_acquire("key", waiter)
+    assert os.fstat(waiter).st_ino == os.stat(lock).st_ino
+    newcomer = flights.open("key")
+    assert not flights.try_acquire("key", newcomer)
+    flights.release(waiter)
+    assert flights.try_acquire("key", newcomer)
+    flights.release(newcomer)
@@ -0,0 +1,90 @@
+import asyncio
+import io
+
+import pytest
+
+import streaming
+from tts_router import TTSEngine
+
+REPLY = ["First sentence here. ", "Second sentence follows. ", "Third one ends it."]
+
+
+def replay(deltas, kept):
+    yield from deltas
+    return kept
+
+
+@pytest.fixture
+def requested(monkeypatch):
+    """Run stream_chat over a fixed reply; returns the engine each segment asked for"""
+    engines = []
+
+    def synthesize(text, lang, engine=None):
+        engines.append(engine)
+        if "Second" in text and "fail" in engines:
+            raise Exception("All TTS engines failed")
+        return io.BytesIO(text.encode("utf-8"))
+
+    ranked = [TTSEngine("piper", None, None, None), TTSEngine("gtts", None, None, None)]
+    monkeypatch.setattr(streaming.warmup, "lookup", lambda question: None)
+    monkeypatch.setattr(streaming, "stream_response", lambda question, session: replay(REPLY, "".join(REPLY)))
+    monkeypatch.setattr(streaming, "synthesize", synthesize)
+    monkeypatch.setattr(streaming, "render", lambda audio, profile: (audio, "audio/mpeg", None))
+    monkeypatch.setattr(streaming.router, "ranked", lambda prefer=None: ranked)
+    return engines
+
+
+def test_every_segment_uses_the_first_segments_engine(requested):
+    events = list(streaming.stream_chat("question"))
+    audio = [event for event in events if event["event"] == "audio"]
+    assert len(audio) >= 3
+    assert [event["index"] for event in audio] == list(range(len(audio)))
+    assert set(requested) == {"piper"}
+
+
+def test_failed_segment_fails_the_stream(requested):
+    requested.append("fail")
+    events = []
+    with pytest.raises(Exception, match="streamed segment 1"):
+        for event in streaming.stream_chat("question"):
+            events.append(event)
+    assert [event["index"] for event in events if event["event"] == "audio"] == [0]
+    assert events[-1]["event"] != "done"
+
+
+def test_sentence_cut_off_by_the_token_ceiling_is_not_spoken(requested, monkeypatch):
+    deltas = ["First sentence here. ", "Second sentence follows. ", "Third one is cut o"]
+    kept = "First sentence here. Second sentence follows."
+    monkeypatch.setattr(streaming, "stream_response", lambda question, session: replay(deltas, kept))
+    events = list(streaming.stream_chat("question"))
+    spoken = " ".join(event["text"] for event in events if event["event"] == "audio")
+    assert "Second sentence follows." in spoken and "Third" not in spoken
+    assert events[-1] == {"event": "done", "text": kept}
+
+
+async def areplay(deltas, kept, into):
+    for delta in deltas:
+        yield delta
+    into.append(kept)
+
+
+def test_async_stream_matches_the_sync_one(requested, monkeypatch):
+    async def synthesize_async(text, lang, engine=None):
+        requested.append(engine)
+        return io.BytesIO(text.encode("utf-8"))
+
+    monkeypatch.setattr(streaming, "stream_response_async",
+                        lambda question, session, kept: areplay(REPLY, "".join(REPLY), kept))
+    monkeypatch.setattr(streaming, "synthesize_async", synthesize_async)
+
+    async def collect():
+        return [event async for event in streaming.stream_chat_async("question")]
+
+    def by_kind(events):
+        # Audio lands between text deltas whenever it is ready; each kind keeps its order
+        return {kind: [event for event in events if event["event"] == kind] for kind in ("text", "audio", "done")}
+
+    events = asyncio.run(collect())
+    assert by_kind(events) == by_kind(list(streaming.stream_chat("question")))
+    assert events[-1]["event"] == "done"
+    assert set(requested) == {"piper"}
@@ -0,0 +1,111 @@
+import io
+
+import pytest
+
+from tts_router import TTSEngine, TTSRouter
+
+
+def engine(name: str, fail: bool = False) -> TTSEngine:
+    def generate(text: str, lang: str) -> io.BytesIO:
+        if fail:
+            raise Exception(f"{name} is down")
+        return io.BytesIO(name.encode("utf-8"))
+
+    return TTSEngine(name=name, generate=generate, params=lambda lang: {}, available=lambda: True)
+
+
+@pytest.fixture
+def router():
+    router = TTSRouter(preference=["fast", "slow"], hedge=True)
+    router.register(engine("fast"))
+    router.register(engine("slow"))
+    # "fast" ranks first on measured latency
+    for _ in range(10):
+        router._stats["fast"].record(0.1, ok=True)
+        router._stats["slow"].record(1.0, ok=True)
+    return router
+
+
+def test_preferred_engine_serves_even_when_ranked_lower(router):
+    assert router.synthesize("Hello.", "en") == ("fast", b"fast")
+    assert router.synthesize("Hello.", "en", prefer="slow") == ("slow", b"slow")
+    assert router.hedges == 0
+
+
+def test_preferred_engine_falls_back_when_it_fails(router):
+    router.register(engine("slow", fail=True))
+    assert router.synthesize("Hello.", "en", prefer="slow") == ("fast", b"fast")
+    assert router.fallbacks == 1
+
+
+def test_unavailable_preference_is_ignored(router):
+    assert router.ranked("espeak")[0].name == "fast"
+
+
+def test_module_synthesize_uses_the_pinned_engine(router, monkeypatch):
+    import tts_router
+
+    monkeypatch.setattr(tts_router, "router", router)
+    assert tts_router.synthesize("Pinned sentence.", engine="slow").getvalue() == b"slow"
+    assert tts_router.synthesize("Unpinned sentence.").getvalue() == b"fast"
+
+
+def test_last_resort_engine_does_not_take_over_after_one_failure():
+    router = TTSRouter(preference=["gtts"], last_resort=["espeak"])
+    router.register(engine("gtts", fail=True))
+    router.register(engine("espeak"))
+    assert router.synthesize("Hello.", "en") == ("espeak", b"espeak")
+
+    # espeak is now the only measured engine, and the fastest, but gTTS recovered
+    router.register(engine("gtts"))
+    router._stats["espeak"].record(0.001, ok=True)
+    assert [e.name for e in router.ranked()] == ["gtts", "espeak"]
+    assert router.synthesize("Hello.", "en") == ("gtts", b"gtts")
+
+
+def test_last_resort_engine_serves_while_the_others_cool_down():
+    router = TTSRouter(preference=["gtts"], last_resort=["piper", "espeak"])
+    for name in ("gtts", "piper", "espeak"):
+        router.register(engine(name))
+    router._stats["espeak"].record(0.001, ok=True)
+    router._stats["piper"].record(0.5, ok=True)
+    router._stats["gtts"].cooldown_until = float("inf")
+    assert [e.name for e in router.ranked()] == ["piper", "espeak", "gtts"]
+
+
+def test_listed_engine_keeps_its_place_unless_another_is_faster_by_the_margin():
+    router = TTSRouter(preference=["gtts", "elevenlabs"], margin=0.2)
+    router.register(engine("gtts"))
+    router.register(engine("elevenlabs"))
+    router._stats["gtts"].record(0.11, ok=True)
+    router._stats["elevenlabs"].record(0.10, ok=True)
+    assert [e.name for e in router.ranked()] == ["gtts", "elevenlabs"]
+    router._stats["elevenlabs"].record(0.05, ok=True)
+    router._stats["elevenlabs"].record(0.05, ok=True)
+    assert [e.name for e in router.ranked()] == ["elevenlabs", "gtts"]
+
+
+def test_old_samples_age_out(router):
+    # "fast" had one good minute long ago; "slow" has been measured since
+    stats = router._stats["fast"]
+    stats._samples = type(stats._samples)(
+        [(at - stats.max_age - 1, seconds, ok) for at, seconds, ok in stats._samples], maxlen=stats._samples.maxlen)
+    router._stats["slow"].record(0.5, ok=True)
+    assert stats.expected_seconds() == float("inf")
+    assert router.ranked()[0].name == "slow"
+
+
+def test_idle_engines_are_probed_once_per_interval():
+    router = TTSRouter(preference=["gtts", "google_cloud"], probe_seconds=60)
+    router.register(engine("gtts"))
+    router.register(engine("google_cloud"))
+    router._stats["gtts"].record(0.1, ok=True)
+    assert router.synthesize("Hello.", "en") == ("gtts", b"gtts")
+
+    # google_cloud was never measured; once idle for the interval, one request measures it
+    router._stats["google_cloud"].last_used -= 61
+    assert router.synthesize("Hello.", "en") == ("google_cloud", b"google_cloud")
+    assert router._stats["google_cloud"].summary()["samples"] == 1
+    # Measured now, and (a stub) faster than gTTS; gTTS was used recently, so it is not probed
+    assert router.synthesize("Hello.", "en") == ("google_cloud", b"google_cloud")
+    assert router.probes == 1
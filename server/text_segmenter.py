@@ -0,0 +1,271 @@
+import re
+from typing import List, Optional
+
+# Same boundaries as _split_text_smart / _split_long_sentence in gtts_tts
+_SENTENCE_END = re.compile(r'[.!?]\s+')
+_CLAUSE_DELIMITER = re.compile(r'[,;]|\s+(?:and|but|or|so|yet|for|nor)\s+')
+
+
+class _Packer:
+    """Greedily joins pieces with single spaces while they fit in max_length"""
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self._pieces: List[str] = []
+        self._length = 0
+
+    def add(self, piece: str) -> Optional[str]:
+        """Add a piece; returns the previous chunk if the piece did not fit"""
+        if not piece:
+            return None
+        if self._pieces and self._length + 1 + len(piece) <= self.max_length:
+            self._pieces.append(piece)
+            self._length += 1 + len(piece)
+            return None
+        chunk = self.take()
+        self._pieces = [piece]
+        self._length = len(piece)
+        return chunk
+
+    def take(self) -> Optional[str]:
+        """Return and clear the chunk being built"""
+        if not self._pieces:
+            return None
+        chunk = " ".join(self._pieces)
+        self._pieces = []
+        self._length = 0
+        return chunk
+
+
+class _ClauseSplitter:
+    """Splits one over-long sentence at commas, semicolons and conjunctions"""
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self._parts: List[str] = []
+        self._length = 0
+
+    def add(self, part: str) -> List[str]:
+        """Add the next text part or delimiter; returns the chunks it completed"""
+        if self._length + len(part) <= self.max_length:
+            self._parts.append(part)
+            self._length += len(part)
+            return []
+
+        chunks = self.finish()
+        if len(part) > self.max_length:
+            # Even a single part is too long: split it by words
+            chunks.extend(_pack_words(part, self.max_length))
+        else:
+            self._parts = [part]
+            self._length = len(part)
+        return chunks
+
+    def finish(self) -> List[str]:
+        """Return the pending clause chunk, if any"""
+        chunk = "".join(self._parts).strip()
+        self._parts = []
+        self._length = 0
+        return [chunk] if chunk else []
+
+
+def _pack_words(text: str, max_length: int) -> List[str]:
+    """Split text by words as last resort"""
+    packer = _Packer(max_length)
+    chunks = [chunk for chunk in map(packer.add, text.split()) if chunk]
+    last = packer.take()
+    if last:
+        chunks.append(last)
+    return chunks
+
+
+class TextSegmenter:
+    """
+    Incremental text-to-chunk segmenter for TTS
+
+    Feed it text as it arrives (for example LLM token deltas) and it returns
+    chunks as soon as their boundaries can no longer change. Chunks follow the
+    same rules as _split_text_smart: sentences are packed up to max_length,
+    longer sentences are split at commas, semicolons and conjunctions, and
+    words are the last resort. On cleaned text, feeding a whole string and
+    flushing gives the same chunks as _split_text_smart.
+
+    Work is done on offsets into a single buffer, so the cost is linear in
+    the length of the input.
+
+    Args:
+        max_length (int): Maximum length per chunk
+        eager (bool): Emit the pending chunk at every sentence end instead of
+            waiting to see whether the next sentence fits (lower latency,
+            smaller chunks)
+        first_length (Optional[int]): Maximum length of the first chunk, when
+            it should be shorter than the rest (so its audio starts sooner)
+    """
+
+    def __init__(self, max_length: int = 100, eager: bool = False, first_length: Optional[int] = None):
+        self.max_length = max_length
+        self.eager = eager
+        self.first_length = max_length if first_length is None else min(first_length, max_length)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._limit = self.first_length  # max_length once the first chunk is out
+        self._buf = ""
+        self._start = 0          # start of the sentence in progress
+        self._scan = 0           # where to resume looking for a sentence end
+        self._skip_space = True  # whitespace after a sentence end is dropped
+        self._packer = _Packer(self._limit)
+        self._clauses: Optional[_ClauseSplitter] = None
+        self._clause_pos = 0     # start of the clause part not yet handed over
+        self._clause_scan = 0    # where to resume looking for a clause delimiter
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Add text to the stream
+
+        Args:
+            text (str): Next piece of text
+
+        Returns:
+            List[str]: Chunks whose boundaries are now certain, in order
+        """
+        if not text:
+            return []
+        self._buf += text
+        chunks: List[str] = []
+
+        if self._skip_space:
+            while self._start < len(self._buf) and self._buf[self._start].isspace():
+                self._start += 1
+            if self._start == len(self._buf):
+                return chunks
+            self._skip_space = False
+            self._scan = max(self._scan, self._start)
+
+        while True:
+            match = _SENTENCE_END.search(self._buf, self._scan)
+            if match is None:
+                # Only a terminator at the very end can still become a boundary
+                self._scan = max(self._start, len(self._buf) - 1)
+                break
+            self._complete_sentence(match.start() + 1, chunks)
+            self._start = self._scan = match.end()
+            if self._start == len(self._buf):
+                self._skip_space = True
+                break
+
+        self._advance_long_sentence(chunks)
+        self._compact()
+        return chunks
+
+    def flush(self) -> List[str]:
+        """
+        End the stream
+
+        Returns:
+            List[str]: All remaining chunks. The segmenter is reset afterwards.
+        """
+        chunks: List[str] = []
+        end = len(self._buf.rstrip())
+        if self._clauses is not None:
+            self._complete_sentence(max(end, self._clause_pos), chunks)
+        elif not self._skip_space and end > self._start:
+            self._complete_sentence(end, chunks)
+        last = self._packer.take()
+        if last:
+            chunks.append(last)
+        self._reset()
+        return chunks
+
+    def _complete_sentence(self, end: int, chunks: List[str]) -> None:
+        if self._clauses is None and end - self._start > self._limit:
+            self._start_clauses()
+        if self._clauses is not None:
+            self._feed_clauses(end, True, chunks)
+            for sub_chunk in self._clauses.finish():
+                self._pack(sub_chunk, chunks)
+            self._clauses = None
+        else:
+            self._pack(self._buf[self._start:end], chunks)
+
+        if self.eager:
+            pending = self._packer.take()
+            if pending:
+                self._emit(pending, chunks)
+
+    def _advance_long_sentence(self, chunks: List[str]) -> None:
+        """Emit clause chunks of an unfinished sentence once it is known to be too long"""
+        if self._clauses is None:
+            if len(self._buf) - self._start <= self._limit:
+                return
+            self._start_clauses()
+        self._feed_clauses(len(self._buf), False, chunks)
+
+    def _start_clauses(self) -> None:
+        self._clauses = _ClauseSplitter(self._limit)
+        self._clause_pos = self._clause_scan = self._start
+
+    def _feed_clauses(self, end: int, final: bool, chunks: List[str]) -> None:
+        pos = self._clause_scan
+        while True:
+            match = _CLAUSE_DELIMITER.search(self._buf, pos, end)
+            if match is None:
+                break
+            if not final and match.end() == len(self._buf) and match.group()[-1].isspace():
+                # Trailing whitespace may still grow; look here again next time
+                self._clause_scan = match.start()
+                return
+            for part in (self._buf[self._clause_pos:match.start()], match.group()):
+                for sub_chunk in self._clauses.add(part):
+                    self._pack(sub_chunk, chunks)
+            self._clause_pos = pos = match.end()
+
+        if final:
+            for sub_chunk in self._clauses.add(self._buf[self._clause_pos:end]):
+                self._pack(sub_chunk, chunks)
+            self._clause_pos = end
+        else:
+            self._clause_scan = max(pos, self._partial_delimiter_start())
+
+    def _partial_delimiter_start(self) -> int:
+        """Earliest offset where a conjunction delimiter may be forming at the buffer end"""
+        i = len(self._buf)
+        while i > 0 and self._buf[i - 1].isspace():
+            i -= 1
+        letters = 0
+        while i > 0 and letters < 3 and self._buf[i - 1].isalpha():
+            i -= 1
+            letters += 1
+        while i > 0 and self._buf[i - 1].isspace():
+            i -= 1
+        return i
+
+    def _pack(self, piece: str, chunks: List[str]) -> None:
+        chunk = self._packer.add(piece)
+        if chunk:
+            self._emit(chunk, chunks)
+
+    def _emit(self, chunk: str, chunks: List[str]) -> None:
+        chunks.append(chunk)
+        if self._limit != self.max_length:
+            # The first chunk is out: the rest may be full length
+            self._limit = self._packer.max_length = self.max_length
+            if self._clauses is not None:
+                self._clauses.max_length = self.max_length
+
+    def _compact(self) -> None:
+        """Drop consumed text once it makes up most of the buffer"""
+        keep = self._clause_pos if self._clauses is not None else self._start
+        if keep < 4096 or keep * 2 < len(self._buf):
+            return
+        self._buf = self._buf[keep:]
+        self._start = max(0, self._start - keep)
+        self._scan = max(0, self._scan - keep)
+        self._clause_pos = max(0, self._clause_pos - keep)
+        self._clause_scan = max(0, self._clause_scan - keep)
+
+
+def segment_text(text: str, max_length: int) -> List[str]:
+    """Split a complete string with TextSegmenter"""
+    segmenter = TextSegmenter(max_length)
+    return segmenter.feed(text) + segmenter.flush()
@@ -0,0 +1,193 @@
+import io
+import os
+import asyncio
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from config import TTS_CACHE_MEMORY_MB, TTS_CACHE_DIR, TTS_CACHE_DISK_MB
+from shared_store import SharedStore
+from singleflight import tts_flight
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryTier:
+    """In-memory LRU of audio bytes, bounded by total size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        audio = self._entries.get(key)
+        if audio is not None:
+            self._entries.move_to_end(key)
+        return audio
+
+    def put(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self._entries[key] = audio
+        self.bytes += len(audio)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TTSCache:
+    """
+    Two-tier, content-addressed cache of synthesized audio
+
+    Keys are derived from the cleaned text plus every parameter that changes
+    the audio (engine, language, voice, speed), so identical replies are
+    synthesized once and then served from memory or disk. The disk tier is
+    a SharedStore, mapped by every worker process and kept across restarts.
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: Optional[str] = None, disk_bytes: int = 0):
+        self._lock = threading.Lock()
+        self._memory = _MemoryTier(memory_bytes)
+        self._disk = None
+        if disk_dir and disk_bytes > 0:
+            try:
+                self._disk = SharedStore(os.path.join(disk_dir, "audio.store"), disk_bytes)
+            except (ImportError, OSError) as e:
+                logger.warning(f"TTS disk cache disabled ({disk_dir}): {e}")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+
+    @staticmethod
+    def make_key(engine: str, text: str, **params) -> str:
+        """Build a stable cache key from the engine, cleaned text and audio parameters"""
+        material = json.dumps([engine, text, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self.memory_hits += 1
+                self.bytes_served += len(audio)
+                return audio
+        # Shared-store reads take no lock, so they run outside ours
+        audio = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.bytes_served += len(audio)
+            self._memory.put(key, audio)
+            return audio
+
+    def put(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            self._memory.put(key, audio)
+            self.bytes_stored += len(audio)
+        if self._disk is not None:
+            self._disk.put(key, audio)
+
+    def stats(self) -> dict:
+        """Hit/miss/byte counters for both tiers"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory.bytes,
+                "memory_evictions": self._memory.evictions,
+                **self._disk_stats(),
+            }
+
+    def _disk_stats(self) -> dict:
+        if self._disk is None:
+            return {"disk_entries": 0, "disk_bytes": 0, "disk_evictions": 0}
+        shared = self._disk.stats()
+        return {"disk_entries": shared["entries"], "disk_bytes": shared["bytes"], "disk_evictions": shared["evictions"]}
+
+
+def cached_audio(engine: str, text: str, generate: Callable[[], io.BytesIO], **params) -> io.BytesIO:
+    """
+    Return cached audio for (engine, text, params) or generate and store it
+
+    Args:
+        engine (str): TTS backend name
+        text (str): Cleaned text being spoken
+        generate (Callable[[], io.BytesIO]): Produces the audio on a miss
+        **params: Any other setting that changes the audio (lang, voice, speed)
+
+    Returns:
+        io.BytesIO: Audio content, positioned at the start
+    """
+    key = TTSCache.make_key(engine, text, **params)
+    audio = tts_cache.get(key)
+    if audio is not None:
+        logger.info(f"TTS cache hit ({engine}, {len(audio)} bytes)")
+        return io.BytesIO(audio)
+
+    def run() -> bytes:
+        audio = generate().getvalue()
+        tts_cache.put(key, audio)
+        return audio
+
+    # Concurrent misses for the same audio share one synthesis
+    return io.BytesIO(tts_flight.do(key, run))
+
+
+async def cached_audio_async(engine: str, text: str,
+                             generate: Callable[[], Awaitable[io.BytesIO]], **params) -> io.BytesIO:
+    """
+    Async version of cached_audio for the ASGI app
+
+    Cache reads and writes may touch the disk tier, so they run in a worker
+    thread instead of on the event loop.
+
+    Args:
+        engine (str): TTS backend name
+        text (str): Cleaned text being spoken
+        generate (Callable[[], Awaitable[io.BytesIO]]): Produces the audio on a miss
+        **params: Any other setting that changes the audio (lang, voice, speed)
+
+    Returns:
+        io.BytesIO: Audio content, positioned at the start
+    """
+    key = TTSCache.make_key(engine, text, **params)
+    audio = await asyncio.to_thread(tts_cache.get, key)
+    if audio is not None:
+        logger.info(f"TTS cache hit ({engine}, {len(audio)} bytes)")
+        return io.BytesIO(audio)
+
+    async def run() -> bytes:
+        audio = (await generate()).getvalue()
+        await asyncio.to_thread(tts_cache.put, key, audio)
+        return audio
+
+    return io.BytesIO(await tts_flight.do_async(key, run))
+
+
+tts_cache = TTSCache(
+    memory_bytes=int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+    disk_dir=TTS_CACHE_DIR,
+    disk_bytes=int(TTS_CACHE_DISK_MB * 1024 * 1024),
+)
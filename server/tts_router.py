@@ -0,0 +1,558 @@
+"""
+TTS engine registry and latency-aware routing.
+
+Each backend (gTTS, Google Cloud, ElevenLabs) is registered as a TTSEngine.
+The router keeps a moving window of latencies and errors per engine (the
+last TTS_ROUTER_MAX_AGE seconds) and sends each request to the engine
+expected to answer fastest, counting errors as the retries they cause; an
+engine listed earlier keeps its place unless another is more than
+TTS_ROUTER_MARGIN faster. An engine that has served no request for
+TTS_ROUTER_PROBE_SECONDS, including one never measured, gets the next
+request as a probe, so a recovered engine wins back its place. Engines that fail TTS_ROUTER_FAILURES
+times in a row are skipped for TTS_ROUTER_COOLDOWN seconds, and a failed
+request falls back to the next engine. With TTS_HEDGE=1, a request still
+running after the engine's own p95 latency (TTS_HEDGE_QUANTILE) is also
+sent to the next engine, and the first audio back wins.
+
+TTS_ENGINES lists the engines to use, in order of preference; engines with
+no measurements yet rank after measured ones, in that order, until probed.
+TTS_FALLBACK_ENGINES (the local Piper and espeak-ng voices by default) are
+last resorts: they are tried, in their listed order, only after every
+TTS_ENGINES engine has failed or while those are cooling down, so a fast
+local voice never takes over from the configured one.
+"""
+import io
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config import (TTS_ENGINES, TTS_FALLBACK_ENGINES, TTS_ROUTER_WINDOW, TTS_ROUTER_MAX_AGE, TTS_ROUTER_MARGIN,
+                    TTS_ROUTER_PROBE_SECONDS, TTS_ROUTER_FAILURES, TTS_ROUTER_COOLDOWN,
+                    TTS_HEDGE, TTS_HEDGE_QUANTILE, TTS_MAX_WORKERS)
+from gtts_tts import _clean_text
+from metrics import record_bytes, span
+from singleflight import tts_flight
+from tts_cache import TTSCache, tts_cache
+import providers
+
+logger = logging.getLogger(__name__)
+
+# Successful samples needed before an engine's latency is trusted as a hedge delay
+MIN_SAMPLES = 5
+
+
+class TTSEngine(NamedTuple):
+    """
+    A TTS backend
+
+    Args:
+        name (str): Registry name, also the TTS cache engine name
+        generate (Callable[[str, str], io.BytesIO]): Synthesizes cleaned text
+            in a language, without caching
+        params (Callable[[str], dict]): Cache parameters for a language
+            (everything besides the text that changes the audio)
+        available (Callable[[], bool]): Whether the engine is installed and configured
+        generate_async (Optional[Callable]): Async version of ``generate``;
+            without it, ``generate`` runs in a worker thread
+        preload (Optional[Callable[[], None]]): Loads models or opens
+            connections ahead of the first request
+    """
+    name: str
+    generate: Callable[[str, str], io.BytesIO]
+    params: Callable[[str], dict]
+    available: Callable[[], bool]
+    generate_async: Optional[Callable[[str, str], Awaitable[io.BytesIO]]] = None
+    preload: Optional[Callable[[], None]] = None
+
+
+class EngineStats:
+    """Moving window of recent request outcomes for one engine"""
+
+    def __init__(self, window: int = TTS_ROUTER_WINDOW, max_age: float = TTS_ROUTER_MAX_AGE):
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=window)
+        self.max_age = max_age
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        # When the engine last served (or was picked to probe) a request
+        self.last_used = time.monotonic()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, seconds, ok))
+            self.last_used = now
+            self.requests += 1
+            if ok:
+                self.consecutive_failures = 0
+                return
+            self.errors += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= TTS_ROUTER_FAILURES:
+                self.cooldown_until = now + TTS_ROUTER_COOLDOWN
+                self.consecutive_failures = 0
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def claim_probe(self, idle: float = TTS_ROUTER_PROBE_SECONDS) -> bool:
+        """Whether the engine has been idle for ``idle`` seconds; if so, the caller probes it and no one else does"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_used < idle:
+                return False
+            self.last_used = now
+            return True
+
+    def _recent(self) -> List[Tuple[float, bool]]:
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            return [(seconds, ok) for at, seconds, ok in self._samples if at >= cutoff]
+
+    def summary(self) -> dict:
+        recent = self._recent()
+        latencies = sorted(seconds for seconds, ok in recent if ok)
+        failures = sum(1 for _, ok in recent if not ok)
+        samples = len(recent)
+
+        def quantile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        return {
+            "samples": samples,
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "error_rate": failures / samples if samples else 0.0,
+        }
+
+    def expected_seconds(self) -> float:
+        """p50 latency inflated by the error rate; infinite until measured"""
+        summary = self.summary()
+        if summary["p50"] is None:
+            return float("inf")
+        error_rate = min(summary["error_rate"], 0.95)
+        return summary["p50"] / (1.0 - error_rate)
+
+    def hedge_delay(self, quantile: float = TTS_HEDGE_QUANTILE) -> Optional[float]:
+        """Latency at ``quantile`` of recent successes, once there are enough samples"""
+        latencies = sorted(seconds for seconds, ok in self._recent() if ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+
+class TTSRouter:
+    """Routes synthesis across registered engines by measured latency and health"""
+
+    def __init__(self, preference: List[str], hedge: bool = False, last_resort: Sequence[str] = (),
+                 margin: float = TTS_ROUTER_MARGIN, probe_seconds: float = TTS_ROUTER_PROBE_SECONDS):
+        self.preference = preference
+        self.last_resort = [name for name in last_resort if name not in preference]
+        self.hedge = hedge
+        self.margin = margin
+        self.probe_seconds = probe_seconds
+        self._engines: Dict[str, TTSEngine] = {}
+        self._stats: Dict[str, EngineStats] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.probes = 0
+
+    def register(self, engine: TTSEngine) -> None:
+        with self._lock:
+            self._engines[engine.name] = engine
+            self._stats.setdefault(engine.name, EngineStats())
+
+    def engines(self) -> List[TTSEngine]:
+        """Enabled, available engines in preference order, last-resort engines last"""
+        with self._lock:
+            names = self.preference + self.last_resort
+            engines = [self._engines[name] for name in names if name in self._engines]
+        return [engine for engine in engines if engine.available()]
+
+    def preload(self) -> None:
+        """Run every enabled engine's preload hook"""
+        for engine in self.engines():
+            if engine.preload is None:
+                continue
+            try:
+                engine.preload()
+            except Exception as e:
+                logger.warning(f"Preloading TTS engine {engine.name} failed: {e}")
+
+    def ranked(self, prefer: Optional[str] = None) -> List[TTSEngine]:
+        """
+        Engines to try, best first: healthy before cooling down, then by
+        expected latency; last-resort engines come after the others in the
+        same state, in their listed order
+
+        Args:
+            prefer (Optional[str]): Engine to put first regardless of its
+                ranking, if it is available
+        """
+        engines = self.engines()
+        last = set(self.last_resort)
+        healthy = {engine.name: self._stats[engine.name].healthy() for engine in engines}
+        expected = {engine.name: self._stats[engine.name].expected_seconds() for engine in engines}
+
+        def group(engine: TTSEngine) -> Tuple[bool, bool, bool]:
+            return engine.name != prefer, not healthy[engine.name], engine.name in last
+
+        ranked = []
+        for key in sorted({group(engine) for engine in engines}):
+            members = [engine for engine in engines if group(engine) == key]
+            ranked.extend(members if key[2] else self._by_latency(members, expected))
+        return ranked
+
+    def _by_latency(self, engines: List[TTSEngine], expected: Dict[str, float]) -> List[TTSEngine]:
+        """Fastest first, but an engine listed earlier stays ahead unless a later one is more than ``margin`` faster"""
+        remaining = list(engines)
+        ordered = []
+        while remaining:
+            fastest = min(expected[engine.name] for engine in remaining)
+            pick = next(engine for engine in remaining if expected[engine.name] <= fastest * (1 + self.margin))
+            ordered.append(pick)
+            remaining.remove(pick)
+        return ordered
+
+    def _with_probe(self, engines: List[TTSEngine]) -> List[TTSEngine]:
+        """Move the first healthy engine that has been idle for probe_seconds to the front"""
+        for engine in engines[1:]:
+            if engine.name in self.last_resort or not self._stats[engine.name].healthy():
+                continue
+            if self._stats[engine.name].claim_probe(self.probe_seconds):
+                self.probes += 1
+                logger.info(f"Probing TTS engine {engine.name}, idle for over {self.probe_seconds:.0f}s")
+                engines.remove(engine)
+                return [engine] + engines
+        return engines
+
+    def _timed(self, engine: TTSEngine, text: str, lang: str) -> bytes:
+        started = time.perf_counter()
+        try:
+            audio = engine.generate(text, lang).getvalue()
+        except Exception:
+            self._stats[engine.name].record(time.perf_counter() - started, ok=False)
+            raise
+        self._stats[engine.name].record(time.perf_counter() - started, ok=True)
+        tts_cache.put(cache_key(engine, text, lang), audio)
+        return audio
+
+    async def _timed_async(self, engine: TTSEngine, text: str, lang: str) -> bytes:
+        started = time.perf_counter()
+        try:
+            if engine.generate_async is not None:
+                audio_buffer = await engine.generate_async(text, lang)
+            else:
+                audio_buffer = await asyncio.to_thread(engine.generate, text, lang)
+            audio = audio_buffer.getvalue()
+        except Exception:
+            self._stats[engine.name].record(time.perf_counter() - started, ok=False)
+            raise
+        self._stats[engine.name].record(time.perf_counter() - started, ok=True)
+        await asyncio.to_thread(tts_cache.put, cache_key(engine, text, lang), audio)
+        return audio
+
+    def _hedge_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=4 * TTS_MAX_WORKERS, thread_name_prefix="tts-hedge")
+        return self._pool
+
+    def _hedge_plan(self, engines: List[TTSEngine]) -> Optional[Tuple[float, TTSEngine]]:
+        """Hedge delay and backup engine for the first candidate, if hedging applies"""
+        if not self.hedge or len(engines) < 2 or engines[1].name in self.last_resort:
+            return None
+        delay = self._stats[engines[0].name].hedge_delay()
+        if delay is None or not self._stats[engines[1].name].healthy():
+            return None
+        return delay, engines[1]
+
+    def synthesize(self, text: str, lang: str, prefer: Optional[str] = None) -> Tuple[str, bytes]:
+        """
+        Synthesize cleaned text on the best engine, falling back on failure
+
+        Args:
+            prefer (Optional[str]): Engine to try first, without hedging, so
+                the audio comes from it unless it fails
+
+        Returns:
+            Tuple[str, bytes]: Name of the engine that produced the audio, and the audio
+        """
+        engines = self.ranked(prefer)
+        if not engines:
+            raise Exception("No TTS engine available")
+        if prefer is None:
+            engines = self._with_probe(engines)
+        errors = []
+        while engines:
+            plan = self._hedge_plan(engines) if prefer is None else None
+            try:
+                if plan is None:
+                    engine = engines.pop(0)
+                    return engine.name, self._timed(engine, text, lang)
+                delay, backup = plan
+                engine = engines.pop(0)
+                engines.remove(backup)
+                return self._hedged(engine, backup, delay, text, lang)
+            except Exception as e:
+                errors.append(f"{engine.name}: {e}")
+                if engines:
+                    self.fallbacks += 1
+                    logger.warning(f"TTS engine {engine.name} failed, falling back: {e}")
+        raise Exception("All TTS engines failed (" + "; ".join(errors) + ")")
+
+    def _start_backup(self, primary: TTSEngine, backup: TTSEngine, delay: float, hedged: bool) -> None:
+        if hedged:
+            self.hedges += 1
+            logger.info(f"TTS {primary.name} past its hedge delay ({delay * 1000:.0f} ms), hedging on {backup.name}")
+        else:
+            self.fallbacks += 1
+            logger.warning(f"TTS engine {primary.name} failed, falling back to {backup.name}")
+
+    def _hedged(self, primary: TTSEngine, backup: TTSEngine, delay: float,
+                text: str, lang: str) -> Tuple[str, bytes]:
+        pool = self._hedge_pool()
+        context = contextvars.copy_context()
+        futures = {pool.submit(context.run, self._timed, primary, text, lang): primary}
+        done, _ = wait(futures, timeout=delay)
+        hedged = not done
+        if hedged or next(iter(done)).exception() is not None:
+            self._start_backup(primary, backup, delay, hedged)
+            context = contextvars.copy_context()
+            futures[pool.submit(context.run, self._timed, backup, text, lang)] = backup
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = futures[future]
+                    if hedged and winner is backup:
+                        self.hedge_wins += 1
+                    return winner.name, future.result()
+                error = future.exception()
+        raise error
+
+    async def synthesize_async(self, text: str, lang: str, prefer: Optional[str] = None) -> Tuple[str, bytes]:
+        """Async version of synthesize for the ASGI app"""
+        engines = self.ranked(prefer)
+        if not engines:
+            raise Exception("No TTS engine available")
+        if prefer is None:
+            engines = self._with_probe(engines)
+        errors = []
+        while engines:
+            plan = self._hedge_plan(engines) if prefer is None else None
+            try:
+                if plan is None:
+                    engine = engines.pop(0)
+                    return engine.name, await self._timed_async(engine, text, lang)
+                delay, backup = plan
+                engine = engines.pop(0)
+                engines.remove(backup)
+                return await self._hedged_async(engine, backup, delay, text, lang)
+            except Exception as e:
+                errors.append(f"{engine.name}: {e}")
+                if engines:
+                    self.fallbacks += 1
+                    logger.warning(f"TTS engine {engine.name} failed, falling back: {e}")
+        raise Exception("All TTS engines failed (" + "; ".join(errors) + ")")
+
+    async def _hedged_async(self, primary: TTSEngine, backup: TTSEngine, delay: float,
+                            text: str, lang: str) -> Tuple[str, bytes]:
+        # The slower request is left to finish: its latency still feeds the
+        # window and its audio still lands in the cache
+        tasks = {asyncio.ensure_future(self._timed_async(primary, text, lang)): primary}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        hedged = not done
+        if hedged or next(iter(done)).exception() is not None:
+            self._start_backup(primary, backup, delay, hedged)
+            tasks[asyncio.ensure_future(self._timed_async(backup, text, lang))] = backup
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = tasks[task]
+                    if hedged and winner is backup:
+                        self.hedge_wins += 1
+                    for other in pending:
+                        other.add_done_callback(_consume_exception)
+                    return winner.name, task.result()
+                error = task.exception()
+        raise error
+
+    def stats(self) -> dict:
+        """Per-engine window statistics plus fallback and hedge counters"""
+        with self._lock:
+            names = list(self._engines)
+        engines = {}
+        for name in names:
+            stats = self._stats[name]
+            engines[name] = dict(
+                stats.summary(),
+                requests=stats.requests,
+                errors=stats.errors,
+                healthy=stats.healthy(),
+                enabled=name in self.preference or name in self.last_resort,
+                last_resort=name in self.last_resort,
+            )
+        return {
+            "engines": engines,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "probes": self.probes,
+        }
+
+
+def _consume_exception(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def cache_key(engine: TTSEngine, text: str, lang: str) -> str:
+    return TTSCache.make_key(engine.name, text, **engine.params(lang))
+
+
+router = TTSRouter(preference=TTS_ENGINES, hedge=TTS_HEDGE, last_resort=TTS_FALLBACK_ENGINES)
+
+
+def flight_key(text: str, lang: str, engine: Optional[str] = None) -> str:
+    """Coalescing key for a routed request; the engine is only known once it runs, unless pinned"""
+    return TTSCache.make_key("router", text, lang=lang, pinned=engine)
+
+
+def register_engine(engine: TTSEngine) -> None:
+    """Add a TTS backend to the registry (enable it by listing it in TTS_ENGINES or TTS_FALLBACK_ENGINES)"""
+    router.register(engine)
+
+
+def _clean_or_raise(text: str) -> str:
+    text = _clean_text(text)
+    if not text.strip():
+        raise Exception("Empty text provided for TTS")
+    return text
+
+
+def synthesize(text: str, lang: str = 'en', engine: Optional[str] = None) -> io.BytesIO:
+    """
+    Text to speech on the fastest healthy engine
+
+    Audio already cached for the top-ranked engine is returned without a
+    request. Otherwise the router picks the engine, falls back or hedges as
+    configured, and caches the result under the engine that produced it.
+    Concurrent requests for the same text and language share one synthesis.
+
+    Args:
+        text (str): Text to convert to speech (any length)
+        lang (str): Language code (default: 'en')
+        engine (Optional[str]): Engine to use, e.g. the one that spoke the
+            start of a streamed reply, so one reply keeps one voice and
+            sample rate; others are tried only if it fails
+
+    Returns:
+        io.BytesIO: MP3 audio
+
+    Raises:
+        Exception: If every engine fails
+    """
+    text = _clean_or_raise(text)
+
+    def run() -> bytes:
+        engines = router.ranked(engine)
+        audio = tts_cache.get(cache_key(engines[0], text, lang)) if engines else None
+        if audio is None:
+            _, audio = router.synthesize(text, lang, engine)
+        return audio
+
+    with span("tts"):
+        audio = tts_flight.do(flight_key(text, lang, engine), run)
+    record_bytes("tts", len(audio))
+    return io.BytesIO(audio)
+
+
+async def synthesize_async(text: str, lang: str = 'en', engine: Optional[str] = None) -> io.BytesIO:
+    """Async version of synthesize for the ASGI app"""
+    text = _clean_or_raise(text)
+
+    async def run() -> bytes:
+        engines = router.ranked(engine)
+        audio = None
+        if engines:
+            audio = await asyncio.to_thread(tts_cache.get, cache_key(engines[0], text, lang))
+        if audio is None:
+            _, audio = await router.synthesize_async(text, lang, engine)
+        return audio
+
+    with span("tts"):
+        audio = await tts_flight.do_async(flight_key(text, lang, engine), run)
+    record_bytes("tts", len(audio))
+    return io.BytesIO(audio)
+
+
+def _register_builtin_engines() -> None:
+    import os
+
+    from config import ELEVENLABS_API_KEY, VOICE_ID
+    from http_clients import cloud_tts_client
+    import elevenlabs_tts
+    import gtts_tts
+    import local_tts
+
+    register_engine(TTSEngine(
+        name="gtts",
+        generate=lambda text, lang: gtts_tts._generate_google_tts(text, lang, False),
+        generate_async=lambda text, lang: gtts_tts._generate_google_tts_async(text, lang, False),
+        params=lambda lang: {"lang": lang, "slow": False},
+        available=lambda: providers.installed("gtts"),
+        preload=lambda: providers.load("gtts"),
+    ))
+    register_engine(TTSEngine(
+        name="google_cloud",
+        generate=lambda text, lang: gtts_tts._generate_google_cloud_tts(text, gtts_tts.cloud_language_code(lang), None),
+        params=lambda lang: {"language_code": gtts_tts.cloud_language_code(lang), "voice_name": None,
+                             "speaking_rate": 1.1},
+        available=lambda: (providers.installed("google.cloud.texttospeech")
+                           and bool(os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or os.getenv("GOOGLE_CLOUD_PROJECT"))),
+        preload=cloud_tts_client,
+    ))
+    register_engine(TTSEngine(
+        name="elevenlabs",
+        generate=lambda text, lang: elevenlabs_tts._generate_elevenlabs_tts(text),
+        generate_async=lambda text, lang: elevenlabs_tts._generate_elevenlabs_tts_async(text),
+        params=lambda lang: elevenlabs_tts.cache_params(),
+        available=lambda: bool(ELEVENLABS_API_KEY and VOICE_ID),
+    ))
+    register_engine(TTSEngine(
+        name="piper",
+        generate=lambda text, lang: local_tts.generate_piper_tts(text),
+        params=lambda lang: local_tts.piper_cache_params(),
+        available=local_tts.piper_available,
+        preload=local_tts.preload,
+    ))
+    register_engine(TTSEngine(
+        name="espeak",
+        generate=local_tts.generate_espeak_tts,
+        params=local_tts.espeak_cache_params,
+        available=local_tts.espeak_available,
+    ))
+
+
+_register_builtin_engines()
@@ -0,0 +1,445 @@
+"""
+Rate limits, priorities and retries for calls to upstream providers.
+
+Every request to OpenAI, gTTS, Google Cloud TTS and ElevenLabs goes
+through ``call`` (``call_async`` in the ASGI app), which
+
+- takes a token from the provider's bucket. A bucket starts at the rate
+  set in UPSTREAM_RATE_LIMITS, or with no limit. Every rate-limited (429)
+  response halves the rate (starting from the rate actually being served
+  when none was set), and successful requests win it back by about one
+  request per second each second, so sustained load settles just under
+  the provider's real limit instead of bouncing off it;
+- takes one of UPSTREAM_MAX_CONCURRENCY slots shared by all providers;
+- retries rate-limited, overloaded and unreachable calls with full-jitter
+  exponential backoff, up to UPSTREAM_RETRIES times and within
+  UPSTREAM_RETRY_DEADLINE seconds. A Retry-After pauses the provider for
+  every caller, so the others wait it out too instead of collecting their
+  own 429s.
+
+Callers waiting for a token or a slot are served in priority order, then
+in arrival order: the request for a reply's first audio goes ahead of the
+rest of the reply, and batch work goes after interactive requests.
+"""
+import sys
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+import contextvars
+import email.utils
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import requests
+
+from config import (UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_MAX, UPSTREAM_MAX_CONCURRENCY, UPSTREAM_RATE_LIMITS,
+                    UPSTREAM_RETRIES, UPSTREAM_RETRY_DEADLINE)
+from metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Priorities, served lowest first
+FIRST = 0        # the request for a reply's first audio
+NORMAL = 1
+BACKGROUND = 2   # batch answering, session summaries
+
+# HTTP statuses worth retrying: timeouts, rate limits, overload, gateway errors
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Lowest rate (requests per second) that rate-limited responses can push a provider to
+MIN_RATE = 0.5
+# Grants remembered per provider to estimate the rate it is being served at
+SERVED_WINDOW = 64
+
+_priority = contextvars.ContextVar("upstream_priority", default=NORMAL)
+
+
+class UpstreamError(Exception):
+    """An upstream error response, with what is needed to decide on a retry"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run upstream calls made inside the block at the given priority"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def first_audio():
+    """Priority for the request producing a reply's first audio (background work stays behind)"""
+    current = _priority.get()
+    return priority(FIRST if current == NORMAL else current)
+
+
+class TokenBucket:
+    """
+    Requests per second allowed to one provider
+
+    ``limit`` is the configured ceiling, None for none. The current rate
+    starts there, is halved by a rate-limited response (once per round of
+    requests sent at the old rate) and grows by one request per second for
+    each second of successful requests.
+    """
+
+    def __init__(self, limit: Optional[float] = None, burst: Optional[float] = None):
+        self.limit = limit
+        self.rate = limit
+        self.burst = burst or max(1.0, limit or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+        self._granted = deque(maxlen=SERVED_WINDOW)
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until the next request may be sent; 0 if it may go now"""
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.rate is not None and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float) -> None:
+        if self.rate is not None:
+            self.tokens -= 1
+        self._granted.append(now)
+
+    def served_rate(self, now: float) -> float:
+        """Requests per second granted over the recent past"""
+        recent = [granted for granted in self._granted if now - granted <= 10.0]
+        if not recent:
+            return MIN_RATE
+        return len(recent) / max(1.0, now - recent[0])
+
+    def throttled(self, now: float, granted_at: float, retry_after: Optional[float]) -> None:
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        # Requests sent before the last decrease are answers to the old rate
+        if granted_at < self.decreased_at:
+            return
+        self._refill(now)
+        current = self.rate if self.rate is not None else self.served_rate(now)
+        self.rate = max(MIN_RATE, current / 2)
+        self.burst = max(1.0, min(self.burst, self.rate))
+        self.tokens = min(self.tokens, 0.0)
+        self.decreased_at = now
+
+    def succeeded(self) -> None:
+        if self.rate is None:
+            return
+        ceiling = math.inf if self.limit is None else self.limit
+        self.rate = min(ceiling, self.rate + 1.0 / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("provider", "priority", "seq", "granted", "granted_at", "wake")
+
+    def __init__(self, provider: str, level: int, seq: int, wake: Callable[[], None]):
+        self.provider = provider
+        self.priority = level
+        self.seq = seq
+        self.granted = False
+        self.granted_at = 0.0
+        self.wake = wake
+
+
+class Scheduler:
+    """Token buckets per provider, a shared concurrency budget and the queue of waiting calls"""
+
+    def __init__(self, limits: Dict[str, Tuple[float, ...]], max_concurrency: int):
+        self._lock = threading.Lock()
+        self._limits = limits
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.max_concurrency = max_concurrency
+        self._free = max_concurrency if max_concurrency > 0 else math.inf
+        self._waiting: List[_Waiter] = []
+        self._seq = 0
+        self._counts = defaultdict(lambda: defaultdict(float))
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            limit = self._limits.get(provider, ())
+            bucket = self._buckets[provider] = TokenBucket(*limit[:2])
+        return bucket
+
+    def _dispatch(self, now: float) -> None:
+        """Grant slots and tokens to waiting calls, highest priority first"""
+        blocked = set()
+        for waiter in list(self._waiting):
+            if self._free < 1:
+                return
+            if waiter.provider in blocked:
+                continue
+            bucket = self._bucket(waiter.provider)
+            if bucket.wait_time(now) > 0:
+                # Later waiters for this provider must not overtake this one
+                blocked.add(waiter.provider)
+                continue
+            bucket.take(now)
+            self._free -= 1
+            self._waiting.remove(waiter)
+            waiter.granted, waiter.granted_at = True, now
+            waiter.wake()
+
+    def _enqueue(self, provider: str, wake: Callable[[], None]) -> _Waiter:
+        self._seq += 1
+        waiter = _Waiter(provider, _priority.get(), self._seq, wake)
+        index = len(self._waiting)
+        while index and (self._waiting[index - 1].priority, self._waiting[index - 1].seq) > (waiter.priority, waiter.seq):
+            index -= 1
+        self._waiting.insert(index, waiter)
+        return waiter
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        """Dispatch; None once the waiter holds a slot, else seconds to wait before trying again (0: until woken)"""
+        now = time.monotonic()
+        with self._lock:
+            self._dispatch(now)
+            if waiter.granted:
+                return None
+            return self._bucket(waiter.provider).wait_time(now)
+
+    def acquire(self, provider: str) -> float:
+        """Wait for a token and a slot; returns the time they were granted"""
+        event = threading.Event()
+        with self._lock:
+            waiter = self._enqueue(provider, event.set)
+        started = time.monotonic()
+        while True:
+            timeout = self._poll(waiter)
+            if timeout is None:
+                break
+            event.wait(timeout or None)
+        self._waited(provider, waiter.granted_at - started)
+        return waiter.granted_at
+
+    async def acquire_async(self, provider: str) -> float:
+        """Async version of acquire"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            waiter = self._enqueue(provider, wake)
+        started = time.monotonic()
+        try:
+            while True:
+                timeout = self._poll(waiter)
+                if timeout is None:
+                    break
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout or None)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if waiter.granted:
+                    self._free += 1
+                    self._dispatch(time.monotonic())
+                else:
+                    self._waiting.remove(waiter)
+            raise
+        self._waited(provider, waiter.granted_at - started)
+        return waiter.granted_at
+
+    def release(self) -> None:
+        with self._lock:
+            self._free += 1
+            self._dispatch(time.monotonic())
+
+    def _waited(self, provider: str, seconds: float) -> None:
+        with self._lock:
+            self._counts[provider]["wait_seconds"] += seconds
+        timing = current_request()
+        if timing is not None and seconds > 0.001:
+            timing.add_span("upstream_wait", seconds)
+
+    def succeeded(self, provider: str) -> None:
+        with self._lock:
+            self._bucket(provider).succeeded()
+            self._counts[provider]["ok"] += 1
+
+    def failed(self, provider: str, error: Exception, granted_at: float, attempt: int,
+               retries: int, deadline: float) -> Optional[float]:
+        """
+        Record a failed call and decide on a retry
+
+        Returns:
+            Optional[float]: Seconds to back off before retrying, or None to give up
+        """
+        retryable, status, retry_after = classify(error)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(provider)
+            if status == 429:
+                self._counts[provider]["rate_limited"] += 1
+                bucket.throttled(now, granted_at, retry_after)
+            else:
+                self._counts[provider]["error"] += 1
+                if retry_after:
+                    bucket.paused_until = max(bucket.paused_until, now + retry_after)
+            if not retryable or attempt >= retries:
+                self._counts[provider]["failed"] += 1
+                return None
+            # Full jitter; a Retry-After pause is waited out in acquire instead
+            delay = 0.0 if retry_after else random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+            if max(now + delay, bucket.paused_until) > deadline:
+                self._counts[provider]["failed"] += 1
+                return None
+            self._counts[provider]["retries"] += 1
+        logger.warning(f"Upstream {provider} call failed (attempt {attempt + 1}/{retries + 1}), retrying: {error}")
+        return delay
+
+    def stats(self) -> dict:
+        """Current rate and call counts per provider, and the shared budget's use"""
+        with self._lock:
+            providers = {}
+            for provider in sorted(set(self._buckets) | set(self._counts)):
+                bucket = self._bucket(provider)
+                counts = self._counts[provider]
+                providers[provider] = {
+                    "rate": bucket.rate,
+                    "paused": max(0.0, bucket.paused_until - time.monotonic()),
+                    **{key: counts[key] for key in ("ok", "rate_limited", "error", "retries", "failed", "wait_seconds")},
+                }
+            in_use = 0 if math.isinf(self._free) else self.max_concurrency - self._free
+            return {"providers": providers, "in_flight": in_use, "waiting": len(self._waiting)}
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After (or OpenAI's retry-after-ms) header, if there is one"""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error: Exception) -> Tuple[bool, Optional[int], Optional[float]]:
+    """
+    (retryable, HTTP status, Retry-After seconds) of an error raised by an upstream call
+
+    Understands UpstreamError, requests and httpx errors, the OpenAI SDK's
+    errors and Google API errors (whose ``code`` is the HTTP status).
+    Connection errors and timeouts are retryable; so are the statuses in
+    RETRY_STATUSES.
+    """
+    if isinstance(error, UpstreamError):
+        status, wait = error.status, error.retry_after
+    else:
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        code = getattr(error, "code", None)
+        if status is None and isinstance(code, int):
+            status = code
+        wait = retry_after(getattr(response, "headers", None))
+    if status is not None:
+        return status in RETRY_STATUSES, status, wait
+    return _is_transport_error(error), None, None
+
+
+def _is_transport_error(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, requests.RequestException):
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    # Only libraries that have been imported can have raised their errors; don't import them here
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIConnectionError)
+
+
+scheduler = Scheduler(UPSTREAM_RATE_LIMITS, UPSTREAM_MAX_CONCURRENCY)
+
+
+def call(provider: str, request: Callable[[], T], retries: Optional[int] = None) -> T:
+    """
+    Make an upstream request within the provider's rate limit and the shared budget
+
+    Args:
+        provider (str): Provider name (openai, gtts, google_cloud, elevenlabs)
+        request (Callable[[], T]): Sends the request; raises on failure
+        retries (int, optional): Extra attempts for retryable failures (default: UPSTREAM_RETRIES)
+
+    Returns:
+        T: What ``request`` returned
+
+    Raises:
+        Exception: The last error, once it is not retryable, retries are used up
+            or waiting for the next attempt would pass UPSTREAM_RETRY_DEADLINE
+    """
+    retries = UPSTREAM_RETRIES if retries is None else retries
+    deadline = time.monotonic() + UPSTREAM_RETRY_DEADLINE
+    for attempt in range(retries + 1):
+        granted_at = scheduler.acquire(provider)
+        try:
+            result = request()
+        except Exception as e:
+            error = e
+        else:
+            scheduler.succeeded(provider)
+            return result
+        finally:
+            scheduler.release()
+        delay = scheduler.failed(provider, error, granted_at, attempt, retries, deadline)
+        if delay is None:
+            raise error
+        time.sleep(delay)
+
+
+async def call_async(provider: str, request: Callable[[], Awaitable[T]], retries: Optional[int] = None) -> T:
+    """Async version of call for the ASGI app"""
+    retries = UPSTREAM_RETRIES if retries is None else retries
+    deadline = time.monotonic() + UPSTREAM_RETRY_DEADLINE
+    for attempt in range(retries + 1):
+        granted_at = await scheduler.acquire_async(provider)
+        try:
+            result = await request()
+        except Exception as e:
+            error = e
+        else:
+            scheduler.succeeded(provider)
+            return result
+        finally:
+            scheduler.release()
+        delay = scheduler.failed(provider, error, granted_at, attempt, retries, deadline)
+        if delay is None:
+            raise error
+        await asyncio.sleep(delay)
@@ -0,0 +1,179 @@
+"""
+Precomputed answers and audio for the questions we know will be asked.
+
+The anchor Q/A pairs in the persona and the fixed refusal line are
+known before any user shows up. They can be synthesized offline:
+
+    python warmup.py --out warm_answers
+
+or in a background thread at server start (WARMUP_ON_START). /api/chat
+looks questions up in the warm index first; matching ones are answered with
+the anchor text and its MP3 without calling the LLM or TTS. The refusal is
+not matched to questions, but its audio is put in the TTS cache so the LLM's
+refusals are spoken instantly.
+"""
+import os
+import json
+import logging
+import argparse
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+from config import WARMUP_DIR, WARMUP_ON_START, RESPONSE_CACHE_SIMILARITY
+from gtts_tts import _clean_text, google_tts, google_tts_cache_key
+from persona import ANCHORS, REFUSAL_LINE
+from response_cache import ResponseCache
+from tts_cache import tts_cache
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE = "index.json"
+
+
+class WarmAnswer(NamedTuple):
+    """A precomputed reply; audio is None until it has been synthesized"""
+    question: str
+    text: str
+    audio: Optional[bytes]
+
+
+def anchor_responses() -> List[Tuple[str, str]]:
+    """(question, answer) pairs for the anchor questions in the persona"""
+    return list(ANCHORS)
+
+
+class WarmIndex:
+    """Question lookup (same matching as the reply cache) plus audio per answer text"""
+
+    def __init__(self, similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self._questions = ResponseCache(max_entries=1024, ttl=float("inf"), similarity=similarity)
+        self._audio = {}
+        self._lock = threading.Lock()
+
+    def add(self, question: Optional[str], text: str, audio: Optional[bytes] = None) -> None:
+        if question:
+            self._questions.put(question, text)
+        if audio is not None:
+            with self._lock:
+                self._audio[text] = audio
+            # Also serve the same text from the TTS cache, e.g. when the LLM
+            # produces the refusal or quotes an anchor answer verbatim
+            tts_cache.put(google_tts_cache_key(_clean_text(text)), audio)
+
+    def lookup(self, question: str) -> Optional[WarmAnswer]:
+        text = self._questions.get(question)
+        if text is None:
+            return None
+        with self._lock:
+            audio = self._audio.get(text)
+        return WarmAnswer(question, text, audio)
+
+    def has_audio(self, text: str) -> bool:
+        with self._lock:
+            return text in self._audio
+
+    def stats(self) -> dict:
+        stats = self._questions.stats()
+        with self._lock:
+            stats["audio_entries"] = len(self._audio)
+        return stats
+
+
+warm_index = WarmIndex()
+
+
+def _entries() -> List[Tuple[Optional[str], str]]:
+    return anchor_responses() + [(None, REFUSAL_LINE)]
+
+
+def lookup(question: str) -> Optional[WarmAnswer]:
+    """Precomputed answer for an anchor question (or a near-duplicate of one)"""
+    return warm_index.lookup(question)
+
+
+def load(directory: str = WARMUP_DIR) -> int:
+    """
+    Load answers built by ``python warmup.py``; anchor texts are always indexed
+
+    Returns:
+        int: Number of audio files loaded
+    """
+    for question, text in _entries():
+        warm_index.add(question, text)
+
+    index_path = os.path.join(directory, _INDEX_FILE)
+    if not os.path.exists(index_path):
+        return 0
+
+    loaded = 0
+    with open(index_path, encoding="utf-8") as f:
+        index = json.load(f)
+    for entry in index.get("entries", []):
+        try:
+            with open(os.path.join(directory, entry["audio"]), "rb") as f:
+                audio = f.read()
+        except OSError as e:
+            logger.warning(f"Missing warm-up audio {entry['audio']}: {e}")
+            continue
+        warm_index.add(entry.get("question"), entry["text"], audio)
+        loaded += 1
+    logger.info(f"Loaded {loaded} warm answers from {directory}")
+    return loaded
+
+
+def warm_up() -> int:
+    """
+    Synthesize audio for every warm answer that does not have it yet
+
+    Returns:
+        int: Number of answers synthesized
+    """
+    synthesized = 0
+    for question, text in _entries():
+        if warm_index.has_audio(text):
+            continue
+        try:
+            audio = google_tts(text).getvalue()
+        except Exception as e:
+            logger.warning(f"Warm-up synthesis failed for '{text[:40]}...': {e}")
+            continue
+        warm_index.add(question, text, audio)
+        synthesized += 1
+    logger.info(f"Warm-up synthesized {synthesized} answers")
+    return synthesized
+
+
+def start() -> None:
+    """Load prebuilt answers, then synthesize any missing ones in the background if enabled"""
+    load()
+    if WARMUP_ON_START:
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+
+def build(directory: str) -> int:
+    """
+    Synthesize all warm answers and write them with an index to ``directory``
+
+    Returns:
+        int: Number of entries written
+    """
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for question, text in _entries():
+        audio = google_tts(text).getvalue()
+        name = f"{google_tts_cache_key(_clean_text(text))[:16]}.mp3"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(audio)
+        entries.append({"question": question, "text": text, "audio": name})
+
+    with open(os.path.join(directory, _INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump({"entries": entries}, f, indent=2, ensure_ascii=False)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build precomputed answers and audio for anchor questions")
+    parser.add_argument("--out", default=WARMUP_DIR, help="output directory (default: WARMUP_DIR)")
+    args = parser.parse_args()
+    count = build(args.out)
+    print(f"Wrote {count} warm answers to {args.out}")